@@ -27,6 +27,19 @@ class Settings(BaseSettings):
     # Google Gemini
     GEMINI_API_KEY: str
     GEMINI_MODEL: str = "gemini-2.5-flash"
+    LLM_MAX_CONCURRENCY: int = 4  # Gemini calls in flight at once
+    LLM_MAX_QUEUE: int = 32  # Requests waiting for a slot; more are rejected immediately
+    LLM_QUEUE_TIMEOUT: float = 15.0  # Seconds a request may wait for a slot
+    LLM_REQUEST_TIMEOUT: float = 60.0  # Seconds per Gemini call
+    LLM_MAX_RETRIES: int = 3  # Attempts on 503/429, with exponential backoff and jitter
+    LLM_USAGE_DB: bool = True  # Log token usage and latency of every Gemini call in the llm_calls table
+    REPORT_CACHE_TTL: int = 86400  # Seconds a generated report is reused for identical prompt data
+    REPORT_CACHE_MEMORY_ENTRIES: int = 2048  # Most recently used reports kept in memory
+    REPORT_CACHE_DB: bool = True  # Also keep reports in the llm_reports table (shared by all workers)
+    REPORT_SIMILARITY: bool = True  # Reuse a recent report when indicators barely changed (numbers patched)
+    REPORT_SIMILARITY_PRICE_TOLERANCE: float = 0.005  # Max relative price move from the reused report
+    REPORT_SIMILARITY_RSI_BAND: float = 10.0  # RSI must stay in the same band of this width
+    REPORT_SIMILARITY_TTL: int = 1800  # Seconds a report may be reused this way
     
     # Application
     ENVIRONMENT: str = "development"
@@ -39,6 +52,31 @@ class Settings(BaseSettings):
     MIDTRANS_IS_PRODUCTION: bool = False
     MIDTRANS_MERCHANT_ID: str = "G190200330"
     
+    # Market Data
+    MARKET_DATA_PROVIDER: str = "yfinance"  # yfinance | local
+    MARKET_DATA_FIXTURES_DIR: str = ""  # CSV/Parquet fixtures for the local provider
+    OHLCV_STORE_DIR: str = ""  # Defaults to <tmp>/ohlcv_store
+    OHLCV_CACHE_MAX_MB: int = 64
+    OHLCV_CACHE_SESSION_TTL: int = 60  # Seconds, during trading session
+    OHLCV_CACHE_MAX_STALE: int = 900  # Seconds an expired frame may still be served while refreshing
+    IDX_HOLIDAYS: List[str] = []  # ISO dates of exchange holidays, e.g. ["2026-03-20"]
+    
+    # Screener
+    SCREEN_UNIVERSE: List[str] = []  # Tickers to screen, e.g. ["BBCA", "BBRI"]
+    SCREEN_UNIVERSE_FILE: str = ""  # Text file with one ticker per line (full IDX listing)
+    SCREEN_REFRESH_TTL: int = 300  # Seconds a table built during the session stays fresh
+    SCREEN_WARMUP: bool = True  # Build the screener table on startup
+    
+    # Charts
+    CHART_STORE_DIR: str = ""  # Defaults to <tmp>/chart_store
+    CHART_STORE_MAX_MB: int = 256  # Disk budget, enforced on write and by the sweeper
+    CHART_CACHE_MEMORY_MB: int = 32  # Most recently used charts kept in memory
+    CHART_STORE_SWEEP_INTERVAL: int = 300  # Seconds between disk budget sweeps; 0 disables
+    
+    # Executors
+    IO_POOL_SIZE: int = 16  # Threads for blocking SDK calls (yfinance, disk, database)
+    CHART_POOL_SIZE: int = 2  # Processes for chart rendering; 0 renders in the I/O pool
+    
     # Vercel
     VERCEL_URL: str = ""
     
@@ -0,0 +1,107 @@
+"""
+Executor Pools
+Bounded thread/process pools that keep blocking work off the event loop
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+import logging
+from backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """
+    Lazily created pool with a fixed number of workers.
+
+    Tracks submitted and completed work so the queue depth (work waiting for a
+    free worker) can be reported.
+    """
+
+    def __init__(self, name: str, max_workers: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.processes = processes
+        self._pool: Optional[Executor] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.processes:
+                # spawn: forking a process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+            logger.info(f"Created {self.name} pool with {self.max_workers} workers")
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking callable in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        try:
+            return await loop.run_in_executor(self._get_pool(), partial(fn, *args, **kwargs))
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info(f"Shut down {self.name} pool")
+
+    def stats(self) -> Dict[str, int]:
+        in_flight = self.submitted - self.completed
+        return {
+            "workers": self.max_workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.max_workers),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Thread pool for I/O-bound SDK calls (yfinance, disk, database)
+io_executor = BoundedExecutor("io", max(1, settings.IO_POOL_SIZE))
+
+# Process pool for CPU-bound chart rendering; 0 workers falls back to the I/O pool
+chart_executor = (
+    BoundedExecutor("chart", settings.CHART_POOL_SIZE, processes=True)
+    if settings.CHART_POOL_SIZE > 0 else io_executor
+)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking I/O call in the shared thread pool"""
+    return await io_executor.run(fn, *args, **kwargs)
+
+
+async def run_chart(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run chart rendering in the chart pool (fn and args must be picklable)"""
+    return await chart_executor.run(fn, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Shut down all pools (call on application shutdown)"""
+    chart_executor.shutdown()
+    io_executor.shutdown()
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {executor.name: executor.stats() for executor in {io_executor, chart_executor}}
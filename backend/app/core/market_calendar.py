@@ -0,0 +1,91 @@
+"""
+IDX Market Calendar
+Trading sessions, weekends and exchange holidays for the Indonesia Stock Exchange
+"""
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Set
+from functools import lru_cache
+import pytz
+from backend.app.core.config import settings
+
+MARKET_TZ = pytz.timezone("Asia/Jakarta")
+
+# Regular market hours (WIB), including pre-closing and post-trading
+SESSION_OPEN = time(9, 0)
+SESSION_CLOSE = time(16, 0)
+
+# Quotes can still change after the close: post-trading runs to about 16:15 and
+# the provider's .JK quotes are delayed, so the day's bar is final only from here
+DATA_FINAL = time(16, 30)
+
+# Fixed-date holidays observed every year; moving holidays (Idul Fitri, Nyepi, etc.)
+# and collective leave days come from settings.IDX_HOLIDAYS
+FIXED_HOLIDAYS = {(1, 1), (8, 17), (12, 25)}
+
+
+@lru_cache()
+def _configured_holidays() -> Set[date]:
+    return {date.fromisoformat(d) for d in settings.IDX_HOLIDAYS}
+
+
+def now_wib() -> datetime:
+    """Current time in the market timezone"""
+    return datetime.now(MARKET_TZ)
+
+
+def _to_wib(moment: Optional[datetime]) -> datetime:
+    if moment is None:
+        return now_wib()
+    if moment.tzinfo is None:
+        return MARKET_TZ.localize(moment)
+    return moment.astimezone(MARKET_TZ)
+
+
+def is_trading_day(day: date) -> bool:
+    """Check if the exchange is open on a given calendar day"""
+    if day.weekday() >= 5:
+        return False
+    if (day.month, day.day) in FIXED_HOLIDAYS:
+        return False
+    return day not in _configured_holidays()
+
+
+def is_session_open(moment: Optional[datetime] = None) -> bool:
+    """Check if the market is in its trading session at a given moment"""
+    moment = _to_wib(moment)
+    if not is_trading_day(moment.date()):
+        return False
+    return SESSION_OPEN <= moment.time() < SESSION_CLOSE
+
+
+def is_data_live(moment: Optional[datetime] = None) -> bool:
+    """Check if the day's bar can still change at a given moment (session plus settling time)"""
+    moment = _to_wib(moment)
+    if not is_trading_day(moment.date()):
+        return False
+    return SESSION_OPEN <= moment.time() < DATA_FINAL
+
+
+def next_open(moment: Optional[datetime] = None) -> datetime:
+    """Start of the next trading session strictly after a given moment"""
+    moment = _to_wib(moment)
+    day = moment.date()
+    if moment.time() >= SESSION_OPEN:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return MARKET_TZ.localize(datetime.combine(day, SESSION_OPEN))
+
+
+def data_expiry(moment: Optional[datetime] = None, session_ttl: int = 60) -> datetime:
+    """
+    Time until which market data fetched at a given moment stays valid
+
+    During the session, and until DATA_FINAL after the close, data expires after
+    session_ttl seconds. Otherwise (evenings, weekends, holidays) it stays valid
+    until the next open.
+    """
+    moment = _to_wib(moment)
+    if is_data_live(moment):
+        return moment + timedelta(seconds=session_ttl)
+    return next_open(moment)
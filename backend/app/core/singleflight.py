@@ -0,0 +1,140 @@
+"""
+Single-Flight Request Coalescing
+Concurrent calls with the same key share one in-flight execution
+"""
+import asyncio
+from collections import Counter
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, TypeVar
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# All groups, for the metrics endpoint
+_groups: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent executions per key.
+
+    The first caller for a key starts the work as a task; callers arriving while
+    it runs await the same task. The work is shielded, so a cancelled caller
+    (e.g. a disconnected client) does not cancel it for the others. stream()
+    does the same for async iterators, fanning the chunks out to every caller.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._callers: Dict[Hashable, int] = {}
+        self._broadcasts: Dict[Hashable, "_Broadcast"] = {}
+        self.executions = 0
+        self.calls = 0
+        self.max_callers = 0
+        # callers served per execution -> number of executions
+        self.fanout: Counter = Counter()
+        _groups.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn for key, or join the execution already in flight for it"""
+        task = self._join(key, fn)
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[T]],
+                     join: Callable[[List[T]], T]) -> AsyncIterator[T]:
+        """
+        Like do() for a stream: yield fn's chunks for key, or those of the
+        stream already in flight for it
+
+        One leader task consumes fn() and fans its chunks out, so a caller
+        joining late first gets every chunk so far. The execution's result is
+        join(chunks), which is what do() callers for the same key receive;
+        a stream joining a do() execution gets its result as one chunk.
+        """
+        if key in self._inflight:
+            task, broadcast = self._join(key, None), self._broadcasts.get(key)
+        else:
+            broadcast = _Broadcast()
+            task = self._join(key, lambda: broadcast.run(fn(), join))
+            self._broadcasts[key] = broadcast
+
+        if broadcast is None:
+            yield await asyncio.shield(task)
+            return
+        sent = 0
+        while True:
+            changed = broadcast.changed
+            while sent < len(broadcast.chunks):
+                sent += 1
+                yield broadcast.chunks[sent - 1]
+            if broadcast.finished:
+                break
+            await changed.wait()
+        # Raises the leader's error, if any
+        await asyncio.shield(task)
+
+    def _join(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            self._callers[key] = 1
+            self.executions += 1
+            task.add_done_callback(lambda _t, k=key: self._finish(k))
+        else:
+            self._callers[key] += 1
+            logger.debug(f"[{self.name}] joined in-flight execution for {key}")
+        return task
+
+    def _finish(self, key: Hashable) -> None:
+        self._inflight.pop(key, None)
+        self._broadcasts.pop(key, None)
+        callers = self._callers.pop(key, 1)
+        self.fanout[callers] += 1
+        self.max_callers = max(self.max_callers, callers)
+        if callers > 1:
+            logger.info(f"[{self.name}] one execution served {callers} callers for {key}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executions": self.executions,
+            "calls": self.calls,
+            "coalesced": self.calls - self.executions,
+            "in_flight": len(self._inflight),
+            "max_callers": self.max_callers,
+            "callers_per_execution": {str(k): v for k, v in sorted(self.fanout.items())},
+        }
+
+
+class _Broadcast:
+    """Chunks of a stream in flight, replayed to every subscriber"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.finished = False
+        # Replaced after every wake-up, so each wait sees the next change
+        self.changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def run(self, chunks: AsyncIterator[Any], join: Callable[[List[Any]], Any]) -> Any:
+        try:
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    self.chunks.append(chunk)
+                    self._notify()
+            return join(self.chunks)
+        finally:
+            self.finished = True
+            self._notify()
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every single-flight group"""
+    return {group.name: group.stats() for group in _groups}
@@ -5,11 +5,16 @@ Main application configuration and CORS setup
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from backend.app.routers import analyze, quota, payment
+from backend.app.routers import analyze, quota, payment, metrics, screen, charts
 from backend.app.core.config import settings
 from backend.app.core.http_client import close_http_client
+from backend.app.core.executors import shutdown_executors
 from backend.app.core.rate_limit import RateLimitMiddleware
 from backend.app.models.database import init_db
+from backend.app.services.screener import screener_table
+from backend.app.services.chart_store import chart_store
+from backend.app.services.report_cache import report_cache
+from backend.app.services.llm import PROMPT_VERSION
 # Initialize logging
 import backend.app.core.logging_config
 import logging
@@ -32,11 +37,25 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Database initialization skipped: {e}")
     
+    # Precompute the screener table so /api/screen never waits on the provider
+    if settings.SCREEN_WARMUP:
+        screener_table.refresh_in_background()
+    
+    # Keep the chart store under its disk budget (shared by all workers)
+    if settings.CHART_STORE_SWEEP_INTERVAL > 0:
+        chart_store.start_sweeper(settings.CHART_STORE_SWEEP_INTERVAL)
+    
+    # Drop cached reports of expired entries and older prompt versions / models
+    if settings.REPORT_CACHE_DB:
+        report_cache.purge_in_background(settings.GEMINI_MODEL, PROMPT_VERSION)
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    chart_store.stop_sweeper()
     await close_http_client()
+    shutdown_executors()
 
 
 app = FastAPI(
@@ -47,6 +66,7 @@ app = FastAPI(
     
     ### Fitur Utama:
     * **Analyze**: Mengambil data OHLCV, menghitung indikator teknikal, dan menghasilkan laporan AI.
+    * **Screen**: Menyaring dan mengurutkan seluruh ticker berdasarkan indikator teknikal.
     * **Quota**: Manajemen kuota pengguna untuk membatasi penggunaan API.
     * **Payment**: Integrasi pembayaran Midtrans untuk top-up kuota.
     """,
@@ -82,6 +102,9 @@ app.add_middleware(
 app.include_router(analyze.router, prefix="/api", tags=["analysis"])
 app.include_router(quota.router, prefix="/quota", tags=["quota"])
 app.include_router(payment.router, prefix="/payment", tags=["payment"])
+app.include_router(screen.router, prefix="/api", tags=["screener"])
+app.include_router(charts.router, prefix="/api", tags=["charts"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
 
 
 @app.get("/")
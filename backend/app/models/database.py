@@ -2,7 +2,7 @@
 Database Models and Session Management
 SQLAlchemy ORM models and dependency injection for database sessions
 """
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, DateTime, Text
+from sqlalchemy import create_engine, Column, String, Integer, Boolean, Date, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.sql import func
@@ -50,6 +50,35 @@ class PaymentTransaction(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
 
+class LLMReport(Base):
+    """Cached AI report, keyed by a hash of everything that went into the prompt"""
+    __tablename__ = "llm_reports"
+    
+    cache_key = Column(String(64), primary_key=True)
+    ticker = Column(String(20), nullable=False, index=True)
+    bar_date = Column(Date, nullable=False)
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    report = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class LLMCall(Base):
+    """Token usage and latency of one Gemini call"""
+    __tablename__ = "llm_calls"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False, index=True)
+    ticker = Column(String(20), nullable=False, index=True)
+    model = Column(String(100), nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    output_tokens = Column(Integer, default=0, nullable=False)
+    latency_ms = Column(Integer, nullable=False)
+    first_chunk_ms = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 # Database engine and session factory
 engine = create_engine(
     settings.DATABASE_URL,
@@ -3,12 +3,27 @@ Pydantic Schemas
 Request and response models
 """
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
 
 
 class AnalyzeRequest(BaseModel):
     ticker: str = Field(..., description="Simbol ticker saham (contoh: BBCA, ASII, TLKM)", example="BBCA")
     user_id: str = Field(..., description="ID Telegram User untuk pelacakan kuota", example="12345678")
+    extra_indicators: List[str] = Field(
+        default_factory=list,
+        description="Indikator tambahan: bollinger, atr, stochastic, obv, vwap, adx",
+        example=["bollinger", "atr"]
+    )
+    interval: Literal["1d", "1wk", "1mo"] = Field(
+        "1d",
+        description="Timeframe terbesar yang dianalisis: 1d (harian), 1wk (harian + mingguan), 1mo (harian + mingguan + bulanan)",
+        example="1wk"
+    )
+    chart_profile: Literal["telegram", "web", "print"] = Field(
+        "web",
+        description="Profil gambar chart: telegram (JPEG ~1290px), web (WebP ~1400px), print (PNG 2800px)",
+        example="telegram"
+    )
 
     model_config = {
         "json_schema_extra": {
@@ -20,6 +35,12 @@ class AnalyzeRequest(BaseModel):
     }
 
 
+class PriceLevel(BaseModel):
+    """Support/resistance zone from clustered swing pivots"""
+    price: float = Field(..., example=9000.0)
+    touches: int = Field(..., description="Jumlah swing high/low di zona ini", example=3)
+
+
 class IndicatorsData(BaseModel):
     ema20: Optional[float] = Field(None, example=9500.5)
     ema50: Optional[float] = Field(None, example=9300.0)
@@ -29,16 +50,120 @@ class IndicatorsData(BaseModel):
     macd_histogram: Optional[float] = Field(None, example=5.2)
     support: Optional[float] = Field(None, example=9000.0)
     resistance: Optional[float] = Field(None, example=10000.0)
+    support_levels: List[PriceLevel] = Field(default_factory=list, description="Zona support, diurutkan dari yang terkuat")
+    resistance_levels: List[PriceLevel] = Field(default_factory=list, description="Zona resistance, diurutkan dari yang terkuat")
     volume_avg: Optional[float] = Field(None, example=1500000)
     current_price: Optional[float] = Field(None, example=9625.0)
     price_change_percent: Optional[float] = Field(None, example=1.5)
     price_change_7d: Optional[float] = Field(None, example=3.2)
     price_change_30d: Optional[float] = Field(None, example=-1.5)
+    # Extra indicators, only filled when requested
+    bb_upper: Optional[float] = Field(None, description="Bollinger Band atas (20, 2)", example=9900.0)
+    bb_middle: Optional[float] = Field(None, description="Bollinger Band tengah (SMA20)", example=9500.0)
+    bb_lower: Optional[float] = Field(None, description="Bollinger Band bawah (20, 2)", example=9100.0)
+    atr: Optional[float] = Field(None, description="Average True Range (14)", example=180.0)
+    stoch_k: Optional[float] = Field(None, description="Stochastic %K (14)", example=72.5)
+    stoch_d: Optional[float] = Field(None, description="Stochastic %D (3)", example=68.1)
+    obv: Optional[float] = Field(None, description="On-Balance Volume", example=125000000)
+    vwap: Optional[float] = Field(None, description="VWAP 20 hari", example=9550.0)
+    adx: Optional[float] = Field(None, description="Average Directional Index (14)", example=27.3)
 
 
 class AnalyzeResponse(BaseModel):
     ticker: str = Field(..., example="BBCA")
     ohlcv_days: int = Field(..., example=180)
+    interval: str = Field("1d", example="1wk")
     indicators: IndicatorsData
+    timeframes: Dict[str, IndicatorsData] = Field(
+        default_factory=dict,
+        description="Indikator per timeframe yang lebih besar (1wk, 1mo), dari bar harian yang di-resample"
+    )
     ai_report: str = Field(..., description="Laporan analisis teks dari Gemini AI")
-    chart_path: Optional[str] = Field(None, example="/tmp/BBCA_chart.png")
+    chart_id: Optional[str] = Field(None, description="ID chart di penyimpanan chart", example="3f2a9c0e5b7d41a68c1e2f4a9b0d7e6c")
+    chart_url: Optional[str] = Field(None, description="Path untuk mengambil chart PNG", example="/api/charts/3f2a9c0e5b7d41a68c1e2f4a9b0d7e6c")
+
+
+class BatchOHLCVRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=1000, description="Daftar ticker saham", example=["BBCA", "BBRI", "TLKM"])
+    days: int = Field(180, ge=1, le=1825, description="Jumlah hari data terakhir per ticker", example=180)
+
+
+class OHLCVSeries(BaseModel):
+    """Columnar OHLCV data for one ticker"""
+    date: List[str]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    volume: List[float]
+
+
+class BatchOHLCVResponse(BaseModel):
+    days: int = Field(..., example=180)
+    data: Dict[str, OHLCVSeries] = Field(..., description="Data OHLCV per ticker")
+    missing: List[str] = Field(default_factory=list, description="Ticker tanpa data")
+
+
+class DigestRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=20, description="Daftar ticker watchlist", example=["BBCA", "BBRI", "TLKM"])
+    user_id: str = Field(..., description="ID Telegram User untuk pelacakan kuota", example="12345678")
+
+
+# Also the response schema of the digest Gemini call (the docstring and
+# descriptions are sent to the model)
+class DigestEntry(BaseModel):
+    """Digest of one watchlist ticker"""
+    ticker: str = Field(..., example="BBCA")
+    trend: Literal["bullish", "bearish", "sideways"] = Field(..., example="bullish")
+    signal: Literal["Strong Buy", "Buy on Weakness", "Wait", "Sell"] = Field(..., example="Buy on Weakness")
+    summary: str = Field(..., description="Ringkasan 1-2 kalimat", example="Uptrend di atas EMA20, tunggu pullback ke 9.400.")
+
+
+class DigestItem(DigestEntry):
+    indicators: IndicatorsData
+
+
+class DigestResponse(BaseModel):
+    as_of: Optional[str] = Field(None, description="Tanggal bar terakhir", example="2026-10-16")
+    items: List[DigestItem]
+    missing: List[str] = Field(default_factory=list, description="Ticker tanpa data atau tanpa ringkasan AI")
+
+
+ScreenSortField = Literal[
+    "rsi", "volume_ratio", "support_distance", "resistance_distance",
+    "price_change_percent", "price_change_7d", "price_change_30d", "current_price", "volume_avg"
+]
+
+
+class ScreenRequest(BaseModel):
+    """Screener criteria; every filter is optional and filters are combined with AND"""
+    rsi_min: Optional[float] = Field(None, ge=0, le=100, description="RSI minimum")
+    rsi_max: Optional[float] = Field(None, ge=0, le=100, description="RSI maksimum", example=30)
+    trend: Optional[Literal["bullish", "bearish"]] = Field(None, description="EMA20 di atas (bullish) atau di bawah (bearish) EMA50")
+    cross: Optional[Literal["golden", "death"]] = Field(None, description="Persilangan EMA20/EMA50 dalam 3 bar terakhir")
+    support_within: Optional[float] = Field(None, ge=0, description="Jarak maksimum harga ke support (%)", example=3)
+    resistance_within: Optional[float] = Field(None, ge=0, description="Jarak maksimum harga ke resistance (%)")
+    volume_ratio_min: Optional[float] = Field(None, ge=0, description="Volume terakhir minimal sekian kali rata-rata", example=2)
+    change_7d_min: Optional[float] = Field(None, description="Perubahan 7 hari minimum (%)")
+    change_7d_max: Optional[float] = Field(None, description="Perubahan 7 hari maksimum (%)")
+    change_30d_min: Optional[float] = Field(None, description="Perubahan 30 hari minimum (%)")
+    change_30d_max: Optional[float] = Field(None, description="Perubahan 30 hari maksimum (%)")
+    sort_by: ScreenSortField = Field("volume_ratio", description="Kolom pengurutan")
+    order: Literal["asc", "desc"] = Field("desc", description="Arah pengurutan")
+    limit: int = Field(20, ge=1, le=100, description="Jumlah hasil maksimum")
+
+
+class ScreenResult(BaseModel):
+    ticker: str = Field(..., example="BBCA")
+    indicators: IndicatorsData
+    volume_ratio: Optional[float] = Field(None, description="Volume terakhir dibagi rata-rata volume", example=2.4)
+    support_distance: Optional[float] = Field(None, description="Jarak harga ke support (%)", example=1.8)
+    resistance_distance: Optional[float] = Field(None, description="Jarak harga ke resistance (%)", example=6.5)
+    ema_cross: Optional[Literal["golden", "death"]] = Field(None, description="Persilangan EMA20/EMA50 terbaru")
+
+
+class ScreenResponse(BaseModel):
+    as_of: Optional[str] = Field(None, description="Tanggal bar terakhir pada tabel indikator", example="2026-10-16")
+    universe: int = Field(..., description="Jumlah ticker yang dipindai", example=900)
+    matched: int = Field(..., description="Jumlah ticker yang lolos filter", example=12)
+    results: List[ScreenResult]
@@ -2,16 +2,39 @@
 Analysis Router
 Handles stock analysis requests
 """
+from contextlib import aclosing
+from typing import Optional, Tuple
+import asyncio
+import json
+import pandas as pd
 from fastapi import APIRouter, HTTPException, Depends
-from backend.app.models.schema import AnalyzeRequest, AnalyzeResponse
-from backend.app.services.fetch_data import get_ohlcv
-from backend.app.services.indicators import compute_indicators
-from backend.app.services.llm import generate_report
+from fastapi.responses import StreamingResponse
+from backend.app.models.schema import (
+    AnalyzeRequest, AnalyzeResponse, BatchOHLCVRequest, BatchOHLCVResponse, OHLCVSeries,
+    DigestRequest, DigestResponse, DigestItem
+)
+from backend.app.services.fetch_data import get_ohlcv, get_ohlcv_many, normalize_symbol, trim_to_days
+from backend.app.services.indicator_state import update_indicators
+from backend.app.services.llm import generate_report, stream_report, generate_digest
+from backend.app.services.llm_gateway import LLMBusy
 from backend.app.services.quota import check_quota, decrement_quota
-from backend.app.services.chart import generate_chart
+from backend.app.services.chart import render_chart
+from backend.app.services.analysis_context import AnalysisContext
+from backend.app.services import indicator_registry
+from backend.app.services.timeframes import HISTORY_DAYS, compute_timeframes, intervals_up_to
+from backend.app.core.singleflight import SingleFlight
+from backend.app.core.executors import run_io
 
 router = APIRouter()
 
+# Each pipeline stage is deduplicated separately across concurrent requests
+fetch_flight = SingleFlight("fetch")
+indicators_flight = SingleFlight("indicators")
+chart_flight = SingleFlight("chart")
+timeframes_flight = SingleFlight("timeframes")
+report_flight = SingleFlight("report")
+digest_flight = SingleFlight("digest")
+
 
 @router.post(
     "/analyze", 
@@ -19,8 +42,10 @@ router = APIRouter()
     summary="Menganalisis Saham",
     responses={
         200: {"description": "Analisis berhasil dihasilkan"},
+        400: {"description": "Nama indikator tambahan tidak dikenal"},
         404: {"description": "Ticker tidak ditemukan atau data kosong"},
-        500: {"description": "Kegagalan internal server atau API AI"}
+        500: {"description": "Kegagalan internal server atau API AI"},
+        503: {"description": "API AI sedang sibuk atau antrean penuh (lihat header Retry-After)"}
     }
 )
 async def analyze_stock(
@@ -29,49 +54,309 @@ async def analyze_stock(
     """
     Melakukan analisis mendalam terhadap sebuah ticker saham:
     - Mengambil data histori 6 bulan (OHLCV).
-    - Menghitung indikator (EMA, RSI, MACD, Support/Resistance).
-    - Membuat visualisasi chart.
+    - Menghitung indikator (EMA, RSI, MACD, Support/Resistance), plus indikator
+      tambahan yang diminta di `extra_indicators` (Bollinger, ATR, Stochastic, OBV, VWAP, ADX).
+    - Dengan `interval` 1wk/1mo: indikator mingguan/bulanan dari bar harian yang
+      di-resample secara lokal (tanpa fetch tambahan ke provider), digabung dalam satu laporan.
+    - Membuat visualisasi chart (diambil lewat `chart_url`, yaitu GET /api/charts/{chart_id}).
     - Menghasilkan narasi analisis menggunakan Google Gemini AI.
     """
     try:
         # Note: Quota check should be done by Telegram bot before calling this endpoint
         # This endpoint assumes quota has already been checked and decremented
+        analysis = await prepare_analysis(request)
         
-        # Fetch OHLCV data (6 months for plan_v2)
-        df = await get_ohlcv(request.ticker, days=180)
+        # Generate AI report (full report for plan_v2)
+        ai_report = await report_flight.do(
+            analysis.stage_key + (analysis.extras, request.interval),
+            lambda: generate_report(analysis.context)
+        )
         
-        if df is None or df.empty:
+        return analysis.response(ai_report)
+    
+    except HTTPException:
+        raise
+    except LLMBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saat menganalisis: {str(e)}"
+        )
+
+
+@router.post(
+    "/analyze/stream",
+    summary="Menganalisis Saham (Streaming)",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "Baris JSON (NDJSON): analysis, report (berulang), lalu done atau error", "content": {"application/x-ndjson": {}}},
+        400: {"description": "Nama indikator tambahan tidak dikenal"},
+        404: {"description": "Ticker tidak ditemukan atau data kosong"},
+        500: {"description": "Kegagalan internal server"}
+    }
+)
+async def analyze_stock_stream(
+    request: AnalyzeRequest
+):
+    """
+    Sama seperti POST /api/analyze, tetapi hasilnya dikirim bertahap sebagai NDJSON
+    (satu objek JSON per baris):
+    - `{"event": "analysis", "data": {...}}`: indikator, timeframe dan chart, segera setelah siap.
+    - `{"event": "report", "text": "..."}`: potongan laporan AI, langsung saat dihasilkan Gemini.
+    - `{"event": "done", "ai_report": "..."}`: laporan AI lengkap.
+    - `{"event": "error", "status": 503, "detail": "...", "retry_after": 5}`: bila laporan gagal dibuat.
+    
+    Laporan yang sudah ada di cache dikirim dalam satu potongan. Permintaan bersamaan
+    untuk analisa yang sama berbagi satu stream Gemini.
+    """
+    try:
+        analysis = await prepare_analysis(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saat menganalisis: {str(e)}"
+        )
+    
+    async def events():
+        yield _event(event="analysis", data=analysis.response("").model_dump(mode="json", exclude={"ai_report"}))
+        parts = []
+        try:
+            # Same key as /analyze: concurrent requests share one Gemini stream,
+            # which keeps going (and gets cached) if this client disconnects
+            chunks = report_flight.stream(
+                analysis.stage_key + (analysis.extras, request.interval),
+                lambda: stream_report(analysis.context),
+                join=lambda texts: "".join(texts).strip()
+            )
+            async with aclosing(chunks):
+                async for text in chunks:
+                    parts.append(text)
+                    yield _event(event="report", text=text)
+        except LLMBusy as e:
+            yield _event(event="error", status=503, detail=str(e), retry_after=e.retry_after)
+            return
+        except Exception as e:
+            yield _event(event="error", status=500, detail=f"Error saat menganalisis: {str(e)}")
+            return
+        yield _event(event="done", ai_report="".join(parts).strip())
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+def _event(**fields) -> str:
+    return json.dumps(fields, ensure_ascii=False) + "\n"
+
+
+class PreparedAnalysis:
+    """Everything of an analysis except the AI report"""
+
+    def __init__(self, request: AnalyzeRequest, context: AnalysisContext, stage_key: tuple,
+                 extras: tuple, chart_id: Optional[str]):
+        self.request = request
+        self.context = context
+        self.stage_key = stage_key
+        self.extras = extras
+        self.chart_id = chart_id
+
+    def response(self, ai_report: str) -> AnalyzeResponse:
+        return AnalyzeResponse(
+            ticker=self.request.ticker,
+            ohlcv_days=180,
+            interval=self.request.interval,
+            indicators=self.context.indicators,
+            timeframes=self.context.timeframes,
+            ai_report=ai_report,
+            chart_id=self.chart_id,
+            chart_url=f"/api/charts/{self.chart_id}" if self.chart_id else None
+        )
+
+
+async def prepare_analysis(request: AnalyzeRequest) -> PreparedAnalysis:
+    """
+    Fetch, indicators, timeframes and chart of an analysis request
+
+    Raises:
+        HTTPException: 400 for unknown extra indicators, 404 for unknown tickers
+    """
+    ticker = request.ticker.upper()
+    
+    extras = tuple(sorted(set(request.extra_indicators)))
+    unknown = [name for name in extras if name not in indicator_registry.available()]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Indikator tidak dikenal: {', '.join(unknown)}. "
+                   f"Pilihan: {', '.join(indicator_registry.available())}"
+        )
+    
+    # Fetch OHLCV data (6 months for plan_v2; longer daily history for weekly/monthly)
+    days = HISTORY_DAYS[request.interval]
+    history = await fetch_flight.do(
+        (ticker, days),
+        lambda: get_ohlcv(request.ticker, days=days)
+    )
+    
+    if history is None or history.empty:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Data untuk ticker {request.ticker} tidak ditemukan"
+        )
+    
+    # Daily analysis always covers the same 6 months as a 1d request, cut from the same history
+    df = history if days == 180 else trim_to_days(history, 180)
+    context, stage_key = await daily_context(request.ticker, df)
+    if extras:
+        # Only the requested extras (and their dependencies) are computed
+        context.indicators = context.with_extras(extras)
+    
+    # Weekly/monthly indicators, resampled from the daily history already fetched
+    intervals = intervals_up_to(request.interval)[1:]
+    if intervals:
+        context.timeframes = await timeframes_flight.do(
+            stage_key + (request.interval, extras),
+            lambda: run_io(compute_timeframes, history, intervals, extras)
+        )
+    
+    # Generate chart (rendered in the chart process pool unless already stored)
+    chart_id = await chart_flight.do(
+        stage_key + (request.chart_profile,),
+        lambda: render_chart(context, request.chart_profile)
+    )
+    
+    return PreparedAnalysis(request, context, stage_key, extras, chart_id)
+
+
+async def daily_context(ticker: str, df: pd.DataFrame) -> Tuple[AnalysisContext, tuple]:
+    """
+    Analysis context of 6 months of daily bars with its indicators, and the
+    stage key the later stages are deduplicated by
+    """
+    # Later stages are keyed by the last bar, so a new bar never joins a stale run
+    stage_key = (ticker.upper(), str(df['date'].iloc[-1]), len(df))
+    
+    # Shared by the stages that follow, so series and statistics are computed once
+    context = AnalysisContext(ticker, df)
+    
+    # Compute indicators (incrementally from the symbol's stored state)
+    context.indicators = await indicators_flight.do(
+        stage_key,
+        lambda: run_io(update_indicators, normalize_symbol(ticker.upper()), df)
+    )
+    return context, stage_key
+
+
+@router.post(
+    "/digest",
+    response_model=DigestResponse,
+    summary="Ringkasan Watchlist",
+    responses={
+        200: {"description": "Ringkasan AI per ticker"},
+        404: {"description": "Tidak ada ticker dengan data"},
+        500: {"description": "Kegagalan internal server atau API AI"},
+        503: {"description": "API AI sedang sibuk atau antrean penuh (lihat header Retry-After)"}
+    }
+)
+async def digest_watchlist(
+    request: DigestRequest
+):
+    """
+    Ringkasan singkat banyak ticker sekaligus (maksimal 20), misalnya untuk watchlist harian:
+    - Data OHLCV semua ticker diambil dalam satu round trip ke provider.
+    - Indikator harian dihitung per ticker.
+    - Semua ringkasan indikator dikirim dalam **satu** panggilan Gemini, dan Gemini
+      menjawab JSON terstruktur (tren, sinyal, ringkasan per ticker). Instruksi prompt
+      hanya dikirim sekali, jadi jauh lebih hemat token dan lebih cepat daripada
+      satu /api/analyze per ticker.
+    
+    Ticker tanpa data atau yang tidak diringkas oleh AI dicantumkan di `missing`.
+    """
+    try:
+        # Note: Quota check should be done by Telegram bot before calling this endpoint
+        tickers = list(dict.fromkeys(ticker.upper().strip() for ticker in request.tickers))
+        histories = await get_ohlcv_many(tickers, days=180)
+        prepared = await asyncio.gather(*[
+            daily_context(ticker, histories[ticker])
+            for ticker in tickers if ticker in histories and not histories[ticker].empty
+        ])
+        if not prepared:
             raise HTTPException(
                 status_code=404,
-                detail=f"Data untuk ticker {request.ticker} tidak ditemukan"
+                detail="Data untuk ticker watchlist tidak ditemukan"
             )
         
-        # Compute indicators
-        indicators = compute_indicators(df)
-        
-        # Generate chart
-        chart_path = generate_chart(
-            request.ticker,
-            df,
-            ema20=indicators.ema20,
-            ema50=indicators.ema50
+        contexts = [context for context, _ in prepared]
+        digest = await digest_flight.do(
+            tuple(stage_key for _, stage_key in prepared),
+            lambda: generate_digest(contexts)
         )
         
-        # Generate AI report (full report for plan_v2)
-        ai_report = await generate_report(request.ticker, df, indicators)
-        
-        return AnalyzeResponse(
-            ticker=request.ticker,
-            ohlcv_days=180,
-            indicators=indicators,
-            ai_report=ai_report,
-            chart_path=chart_path
+        return DigestResponse(
+            as_of=max(context.dates[-1] for context in contexts).strftime('%Y-%m-%d'),
+            items=[
+                DigestItem(**digest[context.ticker].model_dump(), indicators=context.indicators)
+                for context in contexts if context.ticker in digest
+            ],
+            missing=[ticker for ticker in tickers if ticker not in digest]
         )
     
     except HTTPException:
         raise
+    except LLMBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error saat menganalisis: {str(e)}"
+            detail=f"Error saat membuat ringkasan: {str(e)}"
+        )
+
+
+@router.post(
+    "/ohlcv/batch",
+    response_model=BatchOHLCVResponse,
+    summary="Data OHLCV Banyak Ticker",
+    responses={
+        200: {"description": "Data OHLCV per ticker"},
+        500: {"description": "Kegagalan internal server"}
+    }
+)
+async def batch_ohlcv(
+    request: BatchOHLCVRequest
+):
+    """
+    Mengambil data OHLCV banyak ticker sekaligus dalam satu round trip ke provider.
+    Cocok untuk refresh watchlist, screener dan warmup malam hari.
+    """
+    try:
+        frames = await get_ohlcv_many(request.tickers, days=request.days)
+        
+        data = {}
+        for ticker, df in frames.items():
+            # Frames cover the provider period for `days`; return just the last `days` bars
+            df = df.tail(request.days)
+            data[ticker] = OHLCVSeries(
+                date=df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                **{column: df[column].tolist() for column in ['open', 'high', 'low', 'close', 'volume']}
+            )
+        
+        return BatchOHLCVResponse(
+            days=request.days,
+            data=data,
+            missing=[ticker for ticker in dict.fromkeys(request.tickers) if ticker not in frames]
+        )
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saat mengambil data batch: {str(e)}"
         )
@@ -0,0 +1,44 @@
+"""
+Charts Router
+Serves rendered chart images from the chart store
+"""
+from fastapi import APIRouter, HTTPException, Request, Response
+from backend.app.core.executors import run_io
+from backend.app.services.chart_store import chart_store, is_chart_id, media_type
+
+router = APIRouter()
+
+# A chart id always maps to the same image, so clients may cache it indefinitely
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get(
+    "/charts/{chart_id}",
+    summary="Gambar Chart",
+    response_class=Response,
+    responses={
+        200: {"content": {"image/png": {}, "image/jpeg": {}, "image/webp": {}}, "description": "Gambar chart"},
+        304: {"description": "Chart tidak berubah (ETag cocok)"},
+        404: {"description": "Chart tidak ditemukan atau sudah dihapus dari penyimpanan"}
+    }
+)
+async def get_chart(chart_id: str, request: Request):
+    """
+    Mengambil gambar chart (PNG, JPEG atau WebP sesuai profil) yang dihasilkan oleh
+    /api/analyze berdasarkan `chart_id`.
+    Mendukung `If-None-Match`: chart yang sudah dimiliki klien dijawab 304 tanpa isi.
+    """
+    if not is_chart_id(chart_id):
+        raise HTTPException(status_code=404, detail="Chart tidak ditemukan")
+    
+    etag = f'"{chart_id}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        if await run_io(chart_store.exists, chart_id):
+            return Response(status_code=304, headers=headers)
+    
+    data = await run_io(chart_store.get, chart_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Chart tidak ditemukan")
+    return Response(content=data, media_type=media_type(data), headers=headers)
@@ -0,0 +1,53 @@
+"""
+Metrics Router
+Exposes in-process performance counters
+"""
+from typing import Optional
+from fastapi import APIRouter, Query
+from backend.app.core import singleflight, executors
+from backend.app.services.ohlcv_cache import ohlcv_cache
+from backend.app.services.screener import screener_table
+from backend.app.services.chart_store import chart_store
+from backend.app.services.llm_gateway import llm_gateway
+from backend.app.services.report_cache import report_cache
+from backend.app.services.report_similarity import similar_reports
+from backend.app.services.llm_usage import llm_usage
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    summary="Metrik Performa",
+    description="Statistik cache, penggabungan request (single-flight), antrean executor, tabel screener, penyimpanan chart, gateway AI, cache laporan AI dan pemakaian token AI pada proses ini."
+)
+async def get_metrics():
+    """
+    Return in-process cache, coalescing and executor metrics
+    """
+    return {
+        "executors": executors.stats(),
+        "ohlcv_cache": ohlcv_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "screener": screener_table.stats(),
+        "chart_store": chart_store.stats(),
+        "llm": llm_gateway.stats(),
+        "report_cache": report_cache.stats(),
+        "report_similarity": similar_reports.stats(),
+        "llm_usage": llm_usage.stats(),
+    }
+
+
+@router.get(
+    "/metrics/llm-usage",
+    summary="Pemakaian Token AI",
+    description="Jumlah panggilan Gemini, token prompt/output dan latensi per hari dan per ticker, untuk memantau tren biaya dan latensi."
+)
+async def get_llm_usage(
+    ticker: Optional[str] = Query(None, description="Filter satu ticker, misalnya BBCA"),
+    days: int = Query(7, ge=1, le=366, description="Jumlah hari terakhir")
+):
+    """
+    Return Gemini token usage and latency per day and ticker
+    """
+    return await llm_usage.summary(ticker=ticker, days=days)
@@ -0,0 +1,63 @@
+"""
+Screener Router
+Filters and ranks the IDX universe by indicator criteria
+"""
+from typing import Annotated
+from fastapi import APIRouter, HTTPException, Query
+from backend.app.models.schema import ScreenRequest, ScreenResponse, ScreenResult
+from backend.app.services.indicators import indicators_from_row, optional_float
+from backend.app.services.screener import screener_table, screen
+
+router = APIRouter()
+
+CROSS_LABELS = {1.0: "golden", -1.0: "death"}
+
+
+@router.get(
+    "/screen",
+    response_model=ScreenResponse,
+    summary="Screener Saham",
+    responses={
+        200: {"description": "Ticker yang lolos filter, sudah diurutkan"},
+        500: {"description": "Kegagalan internal server"}
+    }
+)
+async def screen_stocks(
+    criteria: Annotated[ScreenRequest, Query()]
+):
+    """
+    Menyaring dan mengurutkan seluruh ticker di universe berdasarkan indikator:
+    - Rentang RSI, tren dan persilangan EMA20/EMA50.
+    - Jarak harga ke support/resistance dan lonjakan volume.
+    - Perubahan harga 7 dan 30 hari.
+
+    Dibaca dari tabel indikator yang sudah dihitung dan di-cache, bukan diambil per request.
+    """
+    try:
+        table = await screener_table.get()
+        matched = screen(table, criteria)
+
+        results = [
+            ScreenResult(
+                ticker=ticker,
+                indicators=indicators_from_row(row),
+                volume_ratio=optional_float(row['volume_ratio']),
+                support_distance=optional_float(row['support_distance']),
+                resistance_distance=optional_float(row['resistance_distance']),
+                ema_cross=CROSS_LABELS.get(row['ema_cross'])
+            )
+            for ticker, row in matched.head(criteria.limit).iterrows()
+        ]
+
+        return ScreenResponse(
+            as_of=screener_table.as_of,
+            universe=len(table),
+            matched=len(matched),
+            results=results
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saat menjalankan screener: {str(e)}"
+        )
@@ -0,0 +1,102 @@
+"""
+Analysis Context
+Per-request view of one ticker's OHLCV frame with lazily computed, memoized derived data
+"""
+from functools import cached_property
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from backend.app.models.schema import IndicatorsData
+from backend.app.services.indicator_kernel import compute_kernel
+from backend.app.services import indicator_registry
+from backend.app.services.indicators import indicators_from_kernel, registry_inputs, with_extras
+
+
+class AnalysisContext:
+    """
+    Everything one analysis derives from a fetched OHLCV frame, computed at most once.
+
+    Indicators, chart and LLM formatting all read from the same context instead
+    of re-scanning the frame: the kernel runs once with full per-bar series, and
+    price/volume statistics are computed on first use. The frame is shared with
+    the OHLCV cache and is never copied or mutated.
+
+    `indicators` defaults to the kernel's values on this frame; the analyze
+    pipeline seeds it with the incremental per-symbol state instead. Contexts are
+    picklable (memoized values travel with them to the chart process pool).
+    `timeframes` holds indicators of coarser intervals (weekly/monthly) when the
+    analysis includes them.
+    """
+
+    def __init__(self, ticker: str, df: pd.DataFrame, rsi_wilder: bool = False):
+        self.ticker = ticker
+        self.df = df
+        self.rsi_wilder = rsi_wilder
+        self.timeframes: Dict[str, IndicatorsData] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @cached_property
+    def dates(self) -> pd.DatetimeIndex:
+        if 'date' in self.df.columns:
+            return pd.DatetimeIndex(self.df['date'])
+        if isinstance(self.df.index, pd.DatetimeIndex):
+            return self.df.index
+        return pd.date_range(end=pd.Timestamp.now(), periods=len(self.df), freq='D')
+
+    @cached_property
+    def open(self) -> np.ndarray:
+        return self.df['open'].to_numpy(dtype=np.float64) if 'open' in self.df.columns else self.close
+
+    @cached_property
+    def close(self) -> np.ndarray:
+        return self.df['close'].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def high(self) -> np.ndarray:
+        return self.df['high'].to_numpy(dtype=np.float64) if 'high' in self.df.columns else self.close
+
+    @cached_property
+    def low(self) -> np.ndarray:
+        return self.df['low'].to_numpy(dtype=np.float64) if 'low' in self.df.columns else self.close
+
+    @cached_property
+    def volume(self) -> Optional[np.ndarray]:
+        return self.df['volume'].to_numpy(dtype=np.float64) if 'volume' in self.df.columns else None
+
+    @cached_property
+    def kernel(self) -> Dict[str, Any]:
+        """Indicator kernel result, including the per-bar '<name>_series' arrays"""
+        return compute_kernel(self.close, self.high, self.low, wilder=self.rsi_wilder, series=True)
+
+    def series(self, name: str) -> np.ndarray:
+        """Per-bar indicator series (ema20, ema50, rsi, macd, macd_signal, macd_histogram)"""
+        return self.kernel[f"{name}_series"]
+
+    @cached_property
+    def indicators(self) -> IndicatorsData:
+        return indicators_from_kernel(self.close, self.volume, self.kernel)
+
+    @cached_property
+    def registry_values(self) -> Dict[str, Any]:
+        """Inputs and already evaluated indicator_registry values, shared across extras calls"""
+        return registry_inputs(self.close, self.high, self.low, self.volume)
+
+    def with_extras(self, extras: Sequence[str]) -> IndicatorsData:
+        """self.indicators with the requested extra indicators filled in"""
+        if not extras:
+            return self.indicators
+        values = indicator_registry.evaluate(self.registry_values, extras)
+        return with_extras(self.indicators, values, extras)
+
+    @cached_property
+    def price_summary(self) -> Dict[str, Any]:
+        """Range and volume statistics over the frame, as used in the LLM prompt"""
+        volume = self.volume if self.volume is not None else np.zeros(len(self.close))
+        return {
+            'highest': float(np.max(self.high)),
+            'lowest': float(np.min(self.low)),
+            'volume_current': float(volume[-1]),
+            'volume_rising': bool(len(volume) > 10 and volume[-5:].mean() > volume[:5].mean()),
+        }
@@ -1,142 +1,390 @@
 """
 Chart Generator Service
-Generates technical analysis charts using matplotlib
+Renders candlestick/volume/RSI/MACD charts with matplotlib's object-oriented API (Agg canvas, no pyplot)
 """
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
-from pathlib import Path
-import os
+import io
+import threading
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from PIL import Image, features
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from matplotlib.ticker import EngFormatter
+from matplotlib.transforms import blended_transform_factory
+from backend.app.services.analysis_context import AnalysisContext
+from backend.app.services.chart_store import chart_store, chart_id
+from backend.app.core.executors import run_chart, run_io
 
 logger = logging.getLogger(__name__)
 
-# Ensure tmp directory exists
-TMP_DIR = Path("/tmp")
-if not TMP_DIR.exists():
-    TMP_DIR = Path("./tmp")
-    TMP_DIR.mkdir(exist_ok=True)
+# Rendering options; part of the chart id, so changing them invalidates stored charts
+CHART_STYLE = {"version": 4, "highlight": 20, "max_points": 200}
+
+# Fixed margins instead of tight_layout / bbox_inches='tight' on every render
+FIGURE_SIZE = (14, 8)
+MARGINS = {"left": 0.07, "right": 0.98, "top": 0.92, "bottom": 0.08}
+
+# Price, volume, RSI and MACD panel heights
+PANEL_RATIOS = (5, 1.3, 1.4, 1.6)
+
+UP_COLOR = np.array([0.15, 0.65, 0.60, 1.0])  # #26A69A
+DOWN_COLOR = np.array([0.94, 0.33, 0.31, 1.0])  # #EF5350
+
+# Candle body width as a fraction of the bar spacing
+CANDLE_WIDTH = 0.7
+
+
+@dataclass(frozen=True)
+class ChartProfile:
+    """Output resolution and encoding; pixel size is FIGURE_SIZE * dpi"""
+    dpi: int
+    format: str  # 'jpeg', 'webp' or 'png'
+    options: Dict[str, Any]
+    colors: int = 0  # > 0: palette PNG with this many colors
+
+
+CHART_PROFILES = {
+    # Telegram recompresses photos to JPEG anyway: ~1290x740, fast JPEG encode
+    "telegram": ChartProfile(dpi=92, format="jpeg", options={"quality": 80, "optimize": True}),
+    # Browsers: ~1400x800 lossy WebP, the smallest file
+    "web": ChartProfile(dpi=100, format="webp", options={"quality": 80, "method": 4}),
+    # Printing / zooming: 2800x1600 lossless, palette-optimized PNG (flat colors, few shades)
+    "print": ChartProfile(dpi=200, format="png", options={"optimize": True}, colors=256),
+}
+
+DEFAULT_PROFILE = "web"
+
+
+def context_chart_id(context: AnalysisContext, profile: str = DEFAULT_PROFILE) -> str:
+    """Chart id for a context: ticker, last bar, rendering options and output profile"""
+    return chart_id(
+        context.ticker.upper(), str(context.dates[-1]), float(context.close[-1]), len(context),
+        CHART_STYLE, profile, CHART_PROFILES[profile]
+    )
+
+
+async def render_chart(context: AnalysisContext, profile: str = DEFAULT_PROFILE) -> Optional[str]:
+    """
+    Chart id for a context, rendering and storing the chart unless it is already stored
+    
+    The chart only changes with a new bar (or new options), so repeat requests
+    are served from the chart store without touching matplotlib.
+    
+    Returns:
+        Chart id, or None if rendering failed
+    """
+    chart = context_chart_id(context, profile)
+    if await run_io(chart_store.lookup, chart):
+        return chart
+    image = await run_chart(generate_chart, context, profile)
+    if image is None:
+        return None
+    await run_io(chart_store.put, chart, image)
+    return chart
+
+
+def encode(rgb: np.ndarray, profile: ChartProfile) -> bytes:
+    """Encode an (H, W, 3) uint8 image per profile (WebP falls back to palette PNG without libwebp)"""
+    image = Image.fromarray(rgb)
+    fmt, options, colors = profile.format, profile.options, profile.colors
+    if fmt == "webp" and not features.check("webp"):
+        fmt, options, colors = "png", {"optimize": True}, 256
+    if fmt == "png" and colors:
+        image = image.quantize(colors, method=Image.Quantize.FASTOCTREE)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line
+
+    Keeps the first and last points and, per bucket in between, the point that
+    forms the largest triangle with the previously kept point and the next
+    bucket's average, which preserves peaks and troughs. NaN points (indicator
+    warm-up) are skipped.
+
+    Returns:
+        Sorted indices of at most `threshold` points to plot
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if threshold < 3 or n <= threshold:
+        return valid
+    xs, ys = x[valid], y[valid]
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.append(np.linspace(1, n - 1, threshold - 1).astype(np.int64), n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = xs[edges[i + 1]:edges[i + 2]].mean()
+        next_y = ys[edges[i + 1]:edges[i + 2]].mean()
+        area = np.abs(
+            (xs[a] - next_x) * (ys[start:stop] - ys[a]) - (xs[a] - xs[start:stop]) * (next_y - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return valid[keep]
+
+
+def bucket_bars(n: int, max_bars: int) -> np.ndarray:
+    """
+    Start index of each candle bucket: groups of k consecutive bars aligned to
+    the last bar (the first bucket may be shorter), at most max_bars buckets
+    """
+    k = max(1, -(-n // max_bars))
+    remainder = n % k
+    starts = np.arange(remainder, n, k)
+    return np.concatenate([[0], starts]) if remainder else starts
+
+
+class ChartTemplate:
+    """
+    Pre-built multi-panel chart: candlesticks with EMA overlays, volume, RSI and
+    MACD panels. Figure, axes, styling, artists and legend are created once;
+    each render only swaps the artists' data, the title and the axis limits.
+
+    Built on Figure + FigureCanvasAgg without pyplot's global state, so
+    templates are independent of each other; one template must not be used by
+    two threads at once (see _template()).
+    """
+
+    def __init__(self):
+        self.figure = Figure(figsize=FIGURE_SIZE, facecolor='white')
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.figure.subplots_adjust(hspace=0.08, **MARGINS)
+        grid = self.figure.add_gridspec(4, 1, height_ratios=PANEL_RATIOS)
+        price = self.price_ax = self.figure.add_subplot(grid[0])
+        volume = self.volume_ax = self.figure.add_subplot(grid[1], sharex=price)
+        rsi = self.rsi_ax = self.figure.add_subplot(grid[2], sharex=price)
+        macd = self.macd_ax = self.figure.add_subplot(grid[3], sharex=price)
+
+        self.highlight = Rectangle(
+            (0, 0), 0, 1, transform=blended_transform_factory(price.transData, price.transAxes),
+            color='#F24236', alpha=0.08, linewidth=0, label=f'{CHART_STYLE["highlight"]} Hari Terakhir'
+        )
+        price.add_patch(self.highlight)
+        self.wicks = price.add_collection(LineCollection([], linewidths=0.8))
+        self.bodies = price.add_collection(PolyCollection([], linewidths=0))
+        self.ema20_line, = price.plot([], [], label='EMA20', color='#FF9500', linewidth=1.5, linestyle='--', alpha=0.9)
+        self.ema50_line, = price.plot([], [], label='EMA50', color='#9D4EDD', linewidth=1.5, linestyle='--', alpha=0.9)
+        self.title = price.set_title('', fontsize=16, fontweight='bold', pad=20)
+        price.set_ylabel('Harga (Rp)', fontsize=11)
+
+        self.volume_bars = volume.add_collection(PolyCollection([], linewidths=0, alpha=0.5))
+        volume.set_ylabel('Volume', fontsize=9)
+        volume.yaxis.set_major_formatter(EngFormatter(sep=''))
 
+        self.rsi_line, = rsi.plot([], [], color='#2E86AB', linewidth=1.2)
+        for level in (30, 70):
+            rsi.axhline(level, color='#888888', linewidth=0.8, linestyle=':')
+        rsi.set_ylim(0, 100)
+        rsi.set_yticks([30, 70])
+        rsi.set_ylabel('RSI', fontsize=9)
 
-def generate_chart(
-    ticker: str,
-    df: pd.DataFrame,
-    ema20: Optional[float] = None,
-    ema50: Optional[float] = None
-) -> Optional[str]:
+        self.macd_hist = macd.add_collection(PolyCollection([], linewidths=0, alpha=0.6))
+        self.macd_line, = macd.plot([], [], color='#2E86AB', linewidth=1.2, label='MACD')
+        self.signal_line, = macd.plot([], [], color='#FF9500', linewidth=1.2, label='Signal')
+        macd.axhline(0, color='#888888', linewidth=0.8)
+        macd.set_ylabel('MACD', fontsize=9)
+        macd.set_xlabel('Tanggal', fontsize=11)
+        # A fixed location: loc='best' searches the plotted data on every draw
+        macd.legend(loc='upper left', fontsize=8)
+
+        for ax in (price, volume, rsi, macd):
+            ax.grid(True, alpha=0.3, linestyle=':')
+        for ax in (price, volume, rsi):
+            ax.tick_params(labelbottom=False)
+
+        locator = mdates.AutoDateLocator()
+        macd.xaxis.set_major_locator(locator)
+        macd.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+        self._legend_handles: List = []
+
+    def _set_legend(self, handles: List) -> None:
+        if handles != self._legend_handles:
+            self.price_ax.legend(handles=handles, loc='upper left', fontsize=10)
+            self._legend_handles = handles
+
+    @staticmethod
+    def _boxes(x: np.ndarray, bottom: np.ndarray, top: np.ndarray, width: float) -> np.ndarray:
+        """(N, 4, 2) rectangle vertices centred on x"""
+        left, right = x - width / 2, x + width / 2
+        return np.stack([
+            np.column_stack([left, bottom]), np.column_stack([left, top]),
+            np.column_stack([right, top]), np.column_stack([right, bottom]),
+        ], axis=1)
+
+    def render(self, title: str, data: Dict[str, Any], profile: ChartProfile) -> bytes:
+        """
+        Render the chart to image bytes in the profile's resolution and format
+
+        Args:
+            title: Chart title
+            data: Plot-ready arrays from chart_data() (already downsampled)
+            profile: Output profile
+        """
+        x, o, h, l, c = data['x'], data['open'], data['high'], data['low'], data['close']
+        width = CANDLE_WIDTH * (float(np.median(np.diff(x))) if len(x) > 1 else 1.0)
+        up = c >= o
+        colors = np.where(up[:, None], UP_COLOR, DOWN_COLOR)
+
+        # Candles: wicks low-high, bodies open-close (dojis get a visible sliver)
+        self.wicks.set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        self.wicks.set_color(colors)
+        minimum = (np.nanmax(h) - np.nanmin(l)) * 0.002 if len(x) else 0.0
+        bottom = np.fmin(o, c)
+        self.bodies.set_verts(self._boxes(x, bottom, np.fmax(np.fmax(o, c), bottom + minimum), width))
+        self.bodies.set_facecolor(colors)
+
+        handles = []
+        highlight = CHART_STYLE["highlight"]
+        if data['bars'] >= highlight:
+            start = data['highlight_x']
+            self.highlight.set_x(start - width / 2)
+            self.highlight.set_width(x[-1] - start + width)
+            self.highlight.set_visible(True)
+            handles.append(self.highlight)
+        else:
+            self.highlight.set_visible(False)
+        for line, name in ((self.ema20_line, 'ema20'), (self.ema50_line, 'ema50')):
+            series = data.get(name)
+            line.set_visible(series is not None)
+            line.set_data(*(series if series is not None else ([], [])))
+            if series is not None:
+                handles.append(line)
+        self._set_legend(handles)
+
+        volume = data['volume']
+        self.volume_bars.set_verts(self._boxes(x, np.zeros(len(x)), np.nan_to_num(volume), width))
+        self.volume_bars.set_facecolor(colors)
+
+        self.rsi_line.set_data(*data['rsi'])
+        self.macd_line.set_data(*data['macd'])
+        self.signal_line.set_data(*data['macd_signal'])
+        hist_x, hist = data['macd_histogram']
+        self.macd_hist.set_verts(self._boxes(hist_x, np.zeros(len(hist)), np.nan_to_num(hist), width))
+        self.macd_hist.set_facecolor(np.where((hist >= 0)[:, None], UP_COLOR, DOWN_COLOR))
+
+        # Limits set directly: relim/autoscale ignore collections and cost a data scan
+        self.title.set_text(title)
+        if len(x):
+            self.price_ax.set_xlim(x[0] - width, x[-1] + width)
+            low, high = np.nanmin(l), np.nanmax(h)
+            for name in ('ema20', 'ema50'):
+                if data.get(name) is not None and np.isfinite(data[name][1]).any():
+                    low = min(low, np.nanmin(data[name][1]))
+                    high = max(high, np.nanmax(data[name][1]))
+            pad = (high - low) * 0.04 or abs(high) * 0.01 or 1.0
+            self.price_ax.set_ylim(low - pad, high + pad)
+        peak = np.nanmax(volume) if np.isfinite(volume).any() else 0.0
+        self.volume_ax.set_ylim(0, peak * 1.15 or 1.0)
+        spread = np.concatenate([data['macd'][1], data['macd_signal'][1], hist])
+        spread = np.nanmax(np.abs(spread)) if np.isfinite(spread).any() else 0.0
+        self.macd_ax.set_ylim(-spread * 1.15 or -1.0, spread * 1.15 or 1.0)
+
+        self.figure.set_dpi(profile.dpi)
+        self.canvas.draw()
+        return encode(np.asarray(self.canvas.buffer_rgba())[..., :3], profile)
+
+
+_templates = threading.local()
+
+
+def _template() -> ChartTemplate:
+    """This thread's chart template (each renderer process or thread builds its own once)"""
+    template = getattr(_templates, 'chart', None)
+    if template is None:
+        template = _templates.chart = ChartTemplate()
+    return template
+
+
+def date_numbers(dates: pd.DatetimeIndex) -> np.ndarray:
+    """Market-local bar dates as matplotlib date numbers"""
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return mdates.date2num(dates.to_numpy(dtype='datetime64[ns]'))
+
+
+def chart_data(context: AnalysisContext, max_points: int = 0) -> Dict[str, Any]:
     """
-    Generate price chart with EMA overlays
+    Plot-ready arrays for a context, downsampled to at most max_points per series
+
+    Candles are merged in buckets of consecutive bars (open of the first, high/low
+    extremes, close of the last, summed volume) since OHLC bars cannot be
+    thinned point-wise; indicator lines are thinned with LTTB. Either way the
+    number of plotted elements, and so the render time, is bounded.
+    """
+    max_points = max_points or CHART_STYLE["max_points"]
+    x = date_numbers(context.dates)
+    n = len(x)
+    volume = context.volume if context.volume is not None else np.full(n, np.nan)
+    starts = bucket_bars(n, max_points)
+    ends = np.append(starts[1:], n) - 1
+
+    data: Dict[str, Any] = {
+        'bars': n,
+        'x': (x[starts] + x[ends]) / 2,
+        'open': context.open[starts],
+        'high': np.fmax.reduceat(context.high, starts),
+        'low': np.fmin.reduceat(context.low, starts),
+        'close': context.close[ends],
+        'volume': np.add.reduceat(np.nan_to_num(volume), starts) if context.volume is not None else volume[starts],
+        'highlight_x': x[max(0, n - CHART_STYLE["highlight"])],
+    }
+
+    def line(name: str):
+        series = context.series(name)
+        keep = lttb(x, series, max_points)
+        return x[keep], series[keep]
+
+    # EMA overlays once their window is filled (computed once per analysis)
+    data['ema20'] = line('ema20') if n >= 20 else None
+    data['ema50'] = line('ema50') if n >= 50 else None
+    data['rsi'] = line('rsi')
+    data['macd'] = line('macd')
+    data['macd_signal'] = line('macd_signal')
+    data['macd_histogram'] = (data['x'], context.series('macd_histogram')[ends])
+    return data
+
+
+def generate_chart(context: AnalysisContext, profile: str = DEFAULT_PROFILE) -> Optional[bytes]:
+    """
+    Generate candlestick chart with EMA overlays, volume, RSI and MACD panels
     
     Args:
-        ticker: Stock ticker symbol
-        df: DataFrame with OHLCV data (must have 'date' or datetime index and 'close')
-        ema20: EMA20 value for the last period
-        ema50: EMA50 value for the last period
+        context: Analysis context of the ticker; indicator series come from its memoized kernel
+        profile: Output profile name (see CHART_PROFILES)
     
     Returns:
-        Path to saved chart file or None if error
+        Image bytes (rendered in memory) or None if error
     """
+    ticker = context.ticker
     try:
-        if df.empty or 'close' not in df.columns:
+        if context.df.empty or 'close' not in context.df.columns:
             logger.error("Invalid DataFrame for chart generation")
             return None
         
-        # Prepare date column
-        df_copy = df.copy()
-        
-        if isinstance(df.index, pd.DatetimeIndex):
-            dates = df.index
-        elif 'date' in df.columns:
-            dates = pd.to_datetime(df['date'])
-        elif 'Date' in df.columns:
-            dates = pd.to_datetime(df['Date'])
-        else:
-            # Create date range if no date available
-            dates = pd.date_range(end=pd.Timestamp.now(), periods=len(df), freq='D')
-        
-        # Get close prices
-        close_prices = df['close'].values
-        
-        # Calculate EMA20 and EMA50 series for overlay
-        if len(df_copy) >= 20:
-            from backend.app.services.indicators import calculate_ema
-            ema20_series = calculate_ema(df_copy, 20, 'close')
-            ema50_series = calculate_ema(df_copy, 50, 'close') if len(df_copy) >= 50 else None
-        else:
-            ema20_series = None
-            ema50_series = None
-        
-        # Create figure
-        fig, ax = plt.subplots(figsize=(14, 8))
-        
-        # Plot close price
-        ax.plot(dates, close_prices, label='Harga Penutupan', color='#2E86AB', linewidth=2)
-        
-        # Highlight last 20 candles
-        if len(df) >= 20:
-            highlight_start = len(df) - 20
-            ax.plot(
-                dates[highlight_start:],
-                close_prices[highlight_start:],
-                color='#F24236',
-                linewidth=2.5,
-                alpha=0.8,
-                label='20 Hari Terakhir'
-            )
-        
-        # Plot EMA20
-        if ema20_series is not None and not ema20_series.empty:
-            ax.plot(
-                dates,
-                ema20_series.values,
-                label='EMA20',
-                color='#FF9500',
-                linewidth=1.5,
-                linestyle='--',
-                alpha=0.8
-            )
-        
-        # Plot EMA50
-        if ema50_series is not None and not ema50_series.empty:
-            ax.plot(
-                dates,
-                ema50_series.values,
-                label='EMA50',
-                color='#9D4EDD',
-                linewidth=1.5,
-                linestyle='--',
-                alpha=0.8
-            )
-        
-        # Formatting
-        ax.set_title(f'Analisis Teknikal - {ticker}', fontsize=16, fontweight='bold', pad=20)
-        ax.set_xlabel('Tanggal', fontsize=12)
-        ax.set_ylabel('Harga (Rp)', fontsize=12)
-        ax.legend(loc='best', fontsize=10)
-        ax.grid(True, alpha=0.3, linestyle=':')
-        
-        # Format x-axis dates
-        if isinstance(dates, pd.DatetimeIndex):
-            fig.autofmt_xdate()
-        
-        # Set tight layout
-        plt.tight_layout()
-        
-        # Save chart
-        chart_filename = f"{ticker.replace('.', '_')}_chart.png"
-        chart_path = TMP_DIR / chart_filename
-        
-        plt.savefig(chart_path, dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close(fig)
+        image = _template().render(
+            f'Analisis Teknikal - {ticker}',
+            chart_data(context),
+            CHART_PROFILES[profile]
+        )
         
-        logger.info(f"Chart saved to {chart_path}")
-        return str(chart_path)
+        logger.info(f"Chart rendered for {ticker} ({profile}, {len(image)} bytes)")
+        return image
     
     except Exception as e:
         logger.error(f"Error generating chart for {ticker}: {str(e)}")
-        if 'fig' in locals():
-            plt.close(fig)
         return None
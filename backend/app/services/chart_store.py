@@ -0,0 +1,300 @@
+"""
+Chart Store
+Content-addressed render cache of chart images (PNG/JPEG/WebP): in-memory LRU in front of a size-bounded directory
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+import logging
+from backend.app.core.config import settings
+from backend.app.core.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+CHART_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Stored file suffix (the format is read from the image's signature, see media_type)
+SUFFIX = ".img"
+
+# Temporary files of interrupted writes older than this are removed by the sweeper
+STALE_TMP_SECONDS = 3600
+
+
+def chart_id(*parts: Any) -> str:
+    """
+    Stable id of a chart from everything that determines its pixels
+
+    (ticker, last bar, rendering options...): the same inputs always map to the
+    same id, so an id's content never changes and can be cached forever.
+    """
+    key = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def is_chart_id(value: str) -> bool:
+    return bool(CHART_ID_PATTERN.match(value))
+
+
+def media_type(data: bytes) -> str:
+    """Content type of a stored chart from its file signature"""
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+class ChartStore:
+    """
+    Image files named by chart id in one directory, with the most recently used
+    ones also kept in memory.
+
+    Both tiers are least recently used: memory is bounded by memory_bytes, the
+    directory by max_bytes. The directory index is built lazily, so charts
+    survive restarts and renderer processes importing this module pay nothing.
+    Writes are atomic (temporary file + rename) and disk hits refresh the file's
+    mtime, so the background sweeper can enforce the disk budget across every
+    process sharing the directory. Thread-safe: the lock only guards the
+    in-memory state, file I/O runs outside it. Blocking; call it through run_io
+    from the event loop.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, memory_bytes: int = 0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.sweeps = 0
+        self.swept = 0
+
+    def path(self, chart_id: str) -> Path:
+        return self.directory / f"{chart_id}{SUFFIX}"
+
+    def _load_index(self) -> None:
+        """Build the directory index on first use (the scan runs outside the lock)"""
+        if self._index is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = self._scan()
+        with self._lock:
+            if self._index is None:
+                self._index = OrderedDict((name, size) for _, name, size in files)
+                self._bytes = sum(self._index.values())
+
+    def _scan(self):
+        """(mtime, chart id, size) of stored charts, oldest first"""
+        files = []
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            if not is_chart_id(path.stem):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        return sorted(files)
+
+    def _remember(self, chart_id: str, data: bytes) -> None:
+        """Keep a chart in the memory tier (caller holds the lock)"""
+        if len(data) > self.memory_bytes:
+            return
+        self._memory_used += len(data) - len(self._memory.pop(chart_id, b""))
+        self._memory[chart_id] = data
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def exists(self, chart_id: str) -> bool:
+        self._load_index()
+        with self._lock:
+            if chart_id in self._memory:
+                return True
+            if chart_id not in self._index:
+                return False
+        return self.path(chart_id).exists()
+
+    def lookup(self, chart_id: str) -> bool:
+        """Whether a chart is stored, counted as a render cache hit or miss"""
+        found = self.exists(chart_id)
+        with self._lock:
+            if not found:
+                self.misses += 1
+            elif chart_id in self._memory:
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+        return found
+
+    def get(self, chart_id: str) -> Optional[bytes]:
+        """Image bytes of a chart, or None if unknown or evicted"""
+        if not is_chart_id(chart_id):
+            return None
+        with self._lock:
+            data = self._memory.get(chart_id)
+            if data is not None:
+                self._memory.move_to_end(chart_id)
+                self.memory_hits += 1
+                return data
+
+        self._load_index()
+        path = self.path(chart_id)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            data = None
+
+        with self._lock:
+            index = self._index
+            if data is None:
+                if chart_id in index:
+                    self._bytes -= index.pop(chart_id)
+                self.misses += 1
+                return None
+            if chart_id not in index:
+                # Written by another process sharing the directory
+                index[chart_id] = len(data)
+                self._bytes += len(data)
+            index.move_to_end(chart_id)
+            self._remember(chart_id, data)
+            self.disk_hits += 1
+            return data
+
+    def put(self, chart_id: str, data: bytes) -> None:
+        """Store a chart, evicting least recently used ones past the size budget"""
+        if not is_chart_id(chart_id):
+            raise ValueError(f"Invalid chart id '{chart_id}'")
+        with self._lock:
+            self._remember(chart_id, data)
+        if len(data) > self.max_bytes:
+            return
+
+        self._load_index()
+        fd, tmp_name = tempfile.mkstemp(dir=str(self.directory), prefix=f".{chart_id}.")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, self.path(chart_id))
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        evicted = []
+        with self._lock:
+            index = self._index
+            self._bytes += len(data) - index.pop(chart_id, 0)
+            index[chart_id] = len(data)
+            self.writes += 1
+
+            while self._bytes > self.max_bytes and len(index) > 1:
+                oldest, size = index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                evicted.append(oldest)
+
+        for oldest in evicted:
+            try:
+                self.path(oldest).unlink()
+            except OSError:
+                pass
+
+    def sweep(self) -> int:
+        """
+        Enforce the disk budget over the whole directory, including charts
+        written by other processes, and drop leftovers of interrupted writes
+
+        Returns:
+            Number of files removed
+        """
+        # Scanning and unlinking run without the lock, so serving charts never waits on a sweep
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = self._scan()
+        total = sum(size for _, _, size in files)
+        removed = 0
+        for _, name, size in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                self.path(name).unlink()
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for path in self.directory.glob(".*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+
+        files = self._scan()
+        with self._lock:
+            self._index = OrderedDict((name, size) for _, name, size in files)
+            self._bytes = sum(self._index.values())
+            self.sweeps += 1
+            self.swept += removed
+        if removed:
+            logger.info(f"Chart store sweep removed {removed} files, {total} bytes kept")
+        return removed
+
+    def start_sweeper(self, interval: float) -> None:
+        """Run sweep() in the background every `interval` seconds"""
+        task = asyncio.create_task(self._sweep_forever(interval))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stop_sweeper(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _sweep_forever(self, interval: float) -> None:
+        while True:
+            try:
+                await run_io(self.sweep)
+            except Exception as e:
+                logger.warning(f"Chart store sweep failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": 0 if self._index is None else len(self._index),
+            "bytes": self._bytes,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "sweeps": self.sweeps,
+            "swept": self.swept,
+        }
+
+
+chart_store = ChartStore(
+    Path(settings.CHART_STORE_DIR) if settings.CHART_STORE_DIR else Path(tempfile.gettempdir()) / "chart_store",
+    max_bytes=settings.CHART_STORE_MAX_MB * 1024 * 1024,
+    memory_bytes=settings.CHART_CACHE_MEMORY_MB * 1024 * 1024,
+)
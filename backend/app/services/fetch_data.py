@@ -1,57 +1,246 @@
 """
 Data Fetching Service
-Fetches OHLCV data from Yahoo Finance
+Fetches OHLCV data from the configured market data provider, backed by the incremental on-disk OHLCV store
 """
-import yfinance as yf
 import pandas as pd
-from typing import Optional
+from typing import Dict, List, Optional
 import logging
+from backend.app.services import ohlcv_store
+from backend.app.services.ohlcv_cache import ohlcv_cache
+from backend.app.services.market_data import PERIOD_DAYS, get_provider
+from backend.app.core.executors import run_io
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_symbol(ticker: str) -> str:
+    """Add .JK suffix for Indonesian stocks if not present"""
+    if not ticker.endswith('.JK') and not ticker.endswith('.ID'):
+        return f"{ticker}.JK"
+    return ticker
+
+
+def period_for_days(days: int) -> str:
+    """Pick the provider history period that covers the requested number of days"""
+    if days <= 180:
+        return "6mo"
+    if days <= 365:
+        return "1y"
+    if days <= 730:
+        return "2y"
+    if days <= 1825:
+        return "5y"
+    return "max"
+
+
+def _cutoff(last: pd.Timestamp, days: int) -> Optional[pd.Timestamp]:
+    """First date of the window for `days` ending at the last bar (None for "max")"""
+    period = period_for_days(days)
+    return None if period == "max" else last - pd.Timedelta(days=PERIOD_DAYS[period])
+
+
+def _window(bars, days: int) -> pd.DataFrame:
+    """
+    Frame of the stored bars within the provider period for `days`, counted
+    back from the last bar in calendar days like the backfill itself, so the
+    result doesn't depend on how long the store has been growing
+    """
+    if len(bars) > 0:
+        cutoff = _cutoff(ohlcv_store.last_bar_date(bars), days)
+        if cutoff is not None:
+            bars = bars[bars['date'] >= cutoff.value]
+    return ohlcv_store.bars_to_frame(bars)
+
+
+def trim_to_days(df: pd.DataFrame, days: int) -> pd.DataFrame:
+    """
+    Cut a longer OHLCV frame to the window get_ohlcv(days=days) would return
+    for the same last bar
+    """
+    if df.empty:
+        return df
+    cutoff = _cutoff(df['date'].iloc[-1], days)
+    if cutoff is None:
+        return df
+    return df[df['date'] >= cutoff].reset_index(drop=True)
+
+
 async def get_ohlcv(ticker: str, days: int = 180) -> Optional[pd.DataFrame]:
     """
-    Fetch OHLCV data from Yahoo Finance
+    Fetch OHLCV data, served from the in-process cache when possible
+    
+    An expired but recent cached frame is returned immediately while a
+    background refresh runs. Returned frames are shared and must not be mutated.
+    
+    Args:
+        ticker: Stock ticker symbol (e.g., MDLA.JK for Jakarta, or MDLA)
+        days: Days of history wanted; the frame covers the whole provider
+            period for it (see period_for_days and _window), so it can hold
+            more than `days` bars
+    
+    Returns:
+        DataFrame with OHLCV data or None if error
+    """
+    key = (normalize_symbol(ticker), days)
+    cached = ohlcv_cache.get(key)
+    if cached is not None:
+        df, fresh = cached
+        if not fresh:
+            ohlcv_cache.revalidate(key, lambda: _load_ohlcv(ticker, days))
+        return df
+    
+    df = await _load_ohlcv(ticker, days)
+    if df is not None:
+        ohlcv_cache.put(key, df)
+    return df
+
+
+async def _load_ohlcv(ticker: str, days: int = 180) -> Optional[pd.DataFrame]:
+    """Run the blocking store/provider fetch in the I/O thread pool"""
+    return await run_io(_load_ohlcv_sync, ticker, days)
+
+
+def _load_ohlcv_sync(ticker: str, days: int = 180) -> Optional[pd.DataFrame]:
+    """
+    Fetch OHLCV data from the market data provider
+    
+    The first request for a symbol backfills the whole period into the local store.
+    Later requests only ask the provider for bars since the last completed
+    stored bar; if that overlap shows the history was re-adjusted (split or
+    dividend), the whole period is backfilled again.
     
     Args:
         ticker: Stock ticker symbol (e.g., MDLA.JK for Jakarta, or MDLA)
-        days: Number of days to fetch
+        days: Days of history wanted; the frame covers the whole provider
+            period for it (see period_for_days and _window), so it can hold
+            more than `days` bars
     
     Returns:
         DataFrame with OHLCV data or None if error
     """
     try:
-        # Add .JK suffix for Indonesian stocks if not present
-        if not ticker.endswith('.JK') and not ticker.endswith('.ID'):
-            ticker_symbol = f"{ticker}.JK"
-        else:
-            ticker_symbol = ticker
-        
-        # Fetch data
-        stock = yf.Ticker(ticker_symbol)
+        ticker_symbol = normalize_symbol(ticker)
         
-        # Get historical data (minimum 6 months for plan_v2)
-        period = "6mo" if days <= 180 else "1y" if days <= 365 else "max"
-        df = stock.history(period=period)
+        provider = get_provider()
+        period = period_for_days(days)
+        stored = ohlcv_store.load_bars(ticker_symbol)
         
-        if df.empty:
-            logger.warning(f"No data found for ticker: {ticker_symbol}")
-            return None
-        
-        # Keep only requested days
-        if len(df) > days:
-            df = df.tail(days)
-        
-        # Reset index to make Date a column
-        df.reset_index(inplace=True)
-        
-        # Ensure proper column names
-        df.columns = df.columns.str.lower()
+        if stored is not None and ohlcv_store.covers_period(ticker_symbol, period):
+            # Incremental: refetch from the last completed bar (the last one may have been partial)
+            start = ohlcv_store.refresh_start(stored)
+            try:
+                fresh = provider.history(ticker_symbol, start=start.strftime('%Y-%m-%d'))
+                bars = stored
+                if not fresh.empty and ohlcv_store.history_adjusted(stored, fresh):
+                    logger.info(f"History of {ticker_symbol} was re-adjusted, backfilling {period}")
+                    fresh = provider.history(ticker_symbol, period=period)
+                    bars = ohlcv_store.merge_bars(ticker_symbol, fresh, period=period)
+                elif not fresh.empty:
+                    bars = ohlcv_store.merge_bars(ticker_symbol, fresh)
+            except Exception as e:
+                # Stored history is still usable, just not updated (as in the batch path)
+                logger.error(f"Error updating {ticker_symbol}, serving stored bars: {str(e)}")
+                return _window(stored, days)
+            logger.info(f"Incremental fetch for {ticker_symbol}: {len(fresh)} new/updated bars")
+        else:
+            # Full backfill (minimum 6 months for plan_v2)
+            fresh = provider.history(ticker_symbol, period=period)
+            if fresh.empty:
+                logger.warning(f"No data found for ticker: {ticker_symbol}")
+                return None
+            bars = ohlcv_store.merge_bars(ticker_symbol, fresh, period=period)
         
+        df = _window(bars, days)
         logger.info(f"Successfully fetched {len(df)} days of data for {ticker_symbol}")
         return df
     
     except Exception as e:
         logger.error(f"Error fetching data for {ticker}: {str(e)}")
         return None
+
+
+async def get_ohlcv_many(tickers: List[str], days: int = 180) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch OHLCV data for many tickers in one provider round trip
+    
+    Fresh cached frames are served directly; the rest are downloaded together.
+    
+    Args:
+        tickers: Stock ticker symbols (with or without .JK suffix)
+        days: Days of history wanted, windowed as in get_ohlcv
+    
+    Returns:
+        Dict of ticker (as given) to DataFrame; tickers without data are omitted
+    """
+    results: Dict[str, pd.DataFrame] = {}
+    to_fetch: Dict[str, str] = {}
+    
+    for ticker in dict.fromkeys(tickers):
+        symbol = normalize_symbol(ticker)
+        cached = ohlcv_cache.get((symbol, days))
+        if cached is not None and cached[1]:
+            results[ticker] = cached[0]
+        else:
+            to_fetch[symbol] = ticker
+    
+    if to_fetch:
+        fetched = await run_io(_load_ohlcv_many_sync, list(to_fetch), days)
+        for symbol, df in fetched.items():
+            ohlcv_cache.put((symbol, days), df)
+            results[to_fetch[symbol]] = df
+    
+    return results
+
+
+def _load_ohlcv_many_sync(symbols: List[str], days: int = 180) -> Dict[str, pd.DataFrame]:
+    """
+    Batch variant of the store-backed fetch
+    
+    Symbols already backfilled share one incremental download starting at the
+    oldest of their last completed stored dates; the rest, and symbols whose
+    history was re-adjusted since, share one full-period download.
+    """
+    provider = get_provider()
+    period = period_for_days(days)
+    stored = {}
+    backfill = []
+    for symbol in symbols:
+        bars = ohlcv_store.load_bars(symbol)
+        if bars is not None and ohlcv_store.covers_period(symbol, period):
+            stored[symbol] = bars
+        else:
+            backfill.append(symbol)
+    
+    results = {}
+    readjusted = {}
+    if stored:
+        try:
+            start = min(ohlcv_store.refresh_start(bars) for bars in stored.values())
+            fresh = provider.history_many(list(stored), start=start.strftime('%Y-%m-%d'))
+        except Exception as e:
+            # Stored history is still usable, just not updated
+            logger.error(f"Error batch updating {len(stored)} tickers: {str(e)}")
+            fresh = {}
+        for symbol, bars in stored.items():
+            if symbol in fresh and ohlcv_store.history_adjusted(bars, fresh[symbol]):
+                logger.info(f"History of {symbol} was re-adjusted, backfilling {period}")
+                readjusted[symbol] = bars
+                backfill.append(symbol)
+                continue
+            if symbol in fresh:
+                bars = ohlcv_store.merge_bars(symbol, fresh[symbol])
+            results[symbol] = _window(bars, days)
+    
+    if backfill:
+        try:
+            for symbol, fresh_df in provider.history_many(backfill, period=period).items():
+                bars = ohlcv_store.merge_bars(symbol, fresh_df, period=period)
+                results[symbol] = _window(bars, days)
+        except Exception as e:
+            logger.error(f"Error batch fetching {len(backfill)} tickers: {str(e)}")
+        for symbol, bars in readjusted.items():
+            # Backfill failed: serve the stored history until the next attempt
+            results.setdefault(symbol, _window(bars, days))
+    
+    logger.info(f"Batch fetched {len(results)}/{len(symbols)} tickers")
+    return results
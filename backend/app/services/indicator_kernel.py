@@ -0,0 +1,341 @@
+"""
+Indicator Kernel
+Vectorized NumPy implementation of the technical indicators.
+
+Works on contiguous float arrays shaped (T,) for one ticker or (N, T) for many
+tickers on aligned dates, with no intermediate DataFrames. Rows may be padded
+with leading NaNs (tickers with shorter history); each row's indicators start
+at its first valid bar. Results match the pandas helpers in indicators.py
+(ewm(adjust=False), rolling-mean RSI) to floating point tolerance.
+Support/resistance come from swing pivots clustered into price zones.
+"""
+import warnings
+import numpy as np
+from typing import Dict, Optional
+
+EMA_SPANS = (12, 20, 26, 50)
+RSI_PERIOD = 14
+SIGNAL_SPAN = 9
+SR_WINDOW = 20
+PIVOT_STRENGTH = 3
+LEVEL_TOLERANCE = 0.015
+MAX_LEVELS = 3
+
+# Largest weight used inside one scan block; keeps the blocked cumsum well conditioned
+_MAX_BLOCK_GAIN = 1e3
+
+
+def _scan(u: np.ndarray, b: float) -> np.ndarray:
+    """
+    Solve y[t] = b * y[t-1] + u[t] (y[-1] = 0) along the last axis without a per-bar loop.
+
+    The series is cut into blocks short enough that b ** -L stays small; within a
+    block the recurrence is a weighted cumulative sum, and only one value per
+    block is carried forward.
+    """
+    T = u.shape[-1]
+    if T == 0:
+        return u.copy()
+
+    L = int(min(64, max(1, 1 + np.log(_MAX_BLOCK_GAIN) / -np.log(b)))) if 0 < b < 1 else 1
+    n_blocks = -(-T // L)
+    pad = n_blocks * L - T
+    lead = u.shape[:-1]
+
+    blocks = np.concatenate([u, np.zeros(lead + (pad,))], axis=-1) if pad else u
+    blocks = blocks.reshape(lead + (n_blocks, L))
+
+    powers = b ** np.arange(L + 1)
+    local = np.cumsum(blocks / powers[:L], axis=-1) * powers[:L]
+
+    ends = local[..., -1]
+    carry = np.empty_like(ends)
+    c = np.zeros(lead)
+    for m in range(n_blocks):
+        carry[..., m] = c
+        c = powers[L] * c + ends[..., m]
+
+    y = local + powers[1:] * carry[..., None]
+    return y.reshape(lead + (n_blocks * L,))[..., :T]
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """Index of the first non-NaN value in each row (T for all-NaN rows)"""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=-1), valid.argmax(axis=-1), x.shape[-1])
+
+
+def ema(x: np.ndarray, span: int, start: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Exponential moving average, equal to pandas ewm(span=span, adjust=False).mean()
+
+    Each row is seeded with its value at `start` (default: first valid value);
+    earlier positions are NaN.
+    """
+    x = np.atleast_2d(x)
+    if start is None:
+        start = _first_valid(x)
+    alpha = 2.0 / (span + 1)
+    t = np.arange(x.shape[-1])
+    seed = t == start[:, None]
+    before = t < start[:, None]
+
+    clean = np.where(np.isnan(x), 0.0, x)
+    u = np.where(seed, clean, alpha * clean)
+    u[before] = 0.0
+    y = _scan(u, 1.0 - alpha)
+    y[before] = np.nan
+    return y
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD, wilder: bool = False) -> np.ndarray:
+    """
+    Relative Strength Index per bar
+
+    Default smoothing is a simple rolling mean of gains and losses (as in
+    calculate_rsi). With wilder=True the averages are seeded with the first
+    `period` bars' mean and then smoothed with alpha = 1 / period.
+    """
+    close = np.atleast_2d(close)
+    start = _first_valid(close)
+    delta = np.diff(close, axis=-1, prepend=np.nan)
+    delta = np.where(np.isnan(delta), 0.0, delta)
+    gain = np.maximum(delta, 0.0)
+    loss = np.maximum(-delta, 0.0)
+    t = np.arange(close.shape[-1])
+    first = start[:, None] + (period if wilder else period - 1)
+
+    if wilder:
+        csum_gain = np.cumsum(gain, axis=-1)
+        csum_loss = np.cumsum(loss, axis=-1)
+        seed_idx = np.minimum(first, close.shape[-1] - 1)
+        base_idx = np.minimum(start[:, None], close.shape[-1] - 1)
+        seed_gain = (np.take_along_axis(csum_gain, seed_idx, -1) - np.take_along_axis(csum_gain, base_idx, -1)) / period
+        seed_loss = (np.take_along_axis(csum_loss, seed_idx, -1) - np.take_along_axis(csum_loss, base_idx, -1)) / period
+        seed = t == first
+        before = t < first
+        b = 1.0 - 1.0 / period
+        u_gain = np.where(seed, seed_gain, gain / period)
+        u_loss = np.where(seed, seed_loss, loss / period)
+        u_gain[before] = 0.0
+        u_loss[before] = 0.0
+        avg_gain = _scan(u_gain, b)
+        avg_loss = _scan(u_loss, b)
+    else:
+        # Rolling sums via cumulative sums; the first bar's (undefined) change counts as 0
+        csum_gain = np.cumsum(gain, axis=-1)
+        csum_loss = np.cumsum(loss, axis=-1)
+        avg_gain = csum_gain.copy()
+        avg_loss = csum_loss.copy()
+        avg_gain[..., period:] -= csum_gain[..., :-period]
+        avg_loss[..., period:] -= csum_loss[..., :-period]
+        avg_gain /= period
+        avg_loss /= period
+        before = t < first
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        out = 100.0 - 100.0 / (1.0 + rs)
+    out[before] = np.nan
+    return out
+
+
+def macd(close: np.ndarray, ema12: Optional[np.ndarray] = None, ema26: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """MACD line, signal line and histogram per bar"""
+    close = np.atleast_2d(close)
+    start = _first_valid(close)
+    ema12 = ema(close, 12, start) if ema12 is None else ema12
+    ema26 = ema(close, 26, start) if ema26 is None else ema26
+    line = ema12 - ema26
+    signal = ema(line, SIGNAL_SPAN, start)
+    return {'macd': line, 'signal': signal, 'histogram': line - signal}
+
+
+def _rolling_extreme(x: np.ndarray, window: int, op: np.ufunc) -> np.ndarray:
+    """
+    Max (op=np.maximum) or min (op=np.minimum) of every full window along the last axis
+
+    Van Herk/Gil-Werman: prefix and suffix extremes within fixed blocks give each
+    window's extreme from two lookups, so the cost is linear in T whatever the
+    window. Element i of the result covers x[..., i:i + window].
+    """
+    T = x.shape[-1]
+    if T < window:
+        return x[..., :0].copy()
+    fill = -np.inf if op is np.maximum else np.inf
+    n_blocks = -(-T // window)
+    pad = n_blocks * window - T
+    lead = x.shape[:-1]
+
+    blocks = np.concatenate([x, np.full(lead + (pad,), fill)], axis=-1) if pad else x
+    blocks = blocks.reshape(lead + (n_blocks, window))
+    prefix = op.accumulate(blocks, axis=-1).reshape(lead + (n_blocks * window,))
+    suffix = op.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(lead + (n_blocks * window,))
+    return op(suffix[..., :T - window + 1], prefix[..., window - 1:T])
+
+
+def pivots(high: np.ndarray, low: np.ndarray, strength: int = PIVOT_STRENGTH) -> Dict[str, np.ndarray]:
+    """
+    Swing highs and lows: bars whose high (low) is the extreme of the
+    `strength` bars on each side. The last `strength` bars cannot be confirmed yet.
+
+    Returns:
+        Boolean masks 'high' and 'low' shaped like the input
+    """
+    high, low = np.atleast_2d(high), np.atleast_2d(low)
+    width = 2 * strength + 1
+    is_high = np.zeros(high.shape, dtype=bool)
+    is_low = np.zeros(low.shape, dtype=bool)
+    if high.shape[-1] < width:
+        return {'high': is_high, 'low': is_low}
+
+    T = high.shape[-1]
+    centre = slice(strength, T - strength)
+    clean_high = np.where(np.isnan(high), -np.inf, high)
+    clean_low = np.where(np.isnan(low), np.inf, low)
+    is_high[..., centre] = clean_high[..., centre] >= _rolling_extreme(clean_high, width, np.maximum)
+    is_low[..., centre] = clean_low[..., centre] <= _rolling_extreme(clean_low, width, np.minimum)
+    # A pivot needs `strength` real bars on its left too (rows may be NaN-padded)
+    confirmed = np.arange(T) >= (_first_valid(high) + strength)[:, None]
+    is_high &= confirmed & ~np.isnan(high)
+    is_low &= confirmed & ~np.isnan(low)
+    return {'high': is_high, 'low': is_low}
+
+
+def pivot_levels(
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    strength: int = PIVOT_STRENGTH,
+    tolerance: float = LEVEL_TOLERANCE,
+    max_levels: int = MAX_LEVELS,
+    window: int = SR_WINDOW
+) -> Dict[str, np.ndarray]:
+    """
+    Support and resistance zones from clustered swing pivots, per row
+
+    Swing highs and lows are pooled and sorted by price; starting from the
+    lowest, pivots within `tolerance` (relative) above a zone's first pivot join it. A zone's price is the mean of its
+    pivots, its touches the pivot count, and its strength the touches weighted
+    towards recent bars. Zones below the last close are supports, zones above
+    are resistances; each side keeps its `max_levels` strongest zones, ranked
+    by strength. The headline support/resistance is the nearest of those. A
+    side without zones falls back to the recent low/high (last 2 * `window`
+    bars), or 5% from the close when that is on the wrong side.
+
+    Returns:
+        'support' and 'resistance' shaped (N,), plus '<side>_levels' and
+        '<side>_touches' shaped (N, max_levels) (NaN / 0 where there are fewer zones)
+    """
+    close, high, low = np.atleast_2d(close), np.atleast_2d(high), np.atleast_2d(low)
+    N, T = close.shape
+    current = close[:, -1]
+    levels: Dict[str, np.ndarray] = {}
+
+    marks = pivots(high, low, strength)
+    prices = np.concatenate([np.where(marks['high'], high, np.nan), np.where(marks['low'], low, np.nan)], axis=1)
+    # Recent touches count fully, the oldest bar half
+    age_weight = np.tile(0.5 + 0.5 * np.arange(T) / max(T - 1, 1), 2)
+
+    # NaNs sort last, so only the first M columns (the most pivots in any row) matter
+    M = max(1, int(np.count_nonzero(~np.isnan(prices), axis=1).max(initial=0)))
+    order = np.argsort(prices, axis=1)[:, :M]
+    sorted_prices = np.take_along_axis(prices, order, axis=1)
+    valid = ~np.isnan(sorted_prices)
+
+    # A zone spans at most `tolerance` above its lowest pivot. The loop runs over
+    # pivot ranks (a few dozen), each step vectorized across rows.
+    cluster = np.zeros(sorted_prices.shape, dtype=np.int64)
+    anchor = sorted_prices[:, 0].copy()
+    current_id = np.zeros(N, dtype=np.int64)
+    for j in range(1, M):
+        price = sorted_prices[:, j]
+        new = price > anchor * (1 + tolerance)
+        anchor = np.where(new, price, anchor)
+        current_id += new
+        cluster[:, j] = current_id
+
+    # One bincount over all rows: cluster ids are offset by row
+    ids = (cluster + np.arange(N)[:, None] * M)[valid]
+    touches = np.bincount(ids, minlength=N * M).reshape(N, M)
+    price_sum = np.bincount(ids, weights=sorted_prices[valid], minlength=N * M).reshape(N, M)
+    strength_sum = np.bincount(ids, weights=age_weight[order[valid]], minlength=N * M).reshape(N, M)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zone_price = price_sum / touches
+
+    width = min(window * 2, T)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        recent_low = np.nanmin(low[:, -width:], axis=1) if T else np.full(N, np.nan)
+        recent_high = np.nanmax(high[:, -width:], axis=1) if T else np.full(N, np.nan)
+
+    k = max_levels
+    for side, on_side, fallback in (
+        ('support', zone_price < current[:, None], np.where(recent_low < current, recent_low, current * 0.95)),
+        ('resistance', zone_price > current[:, None], np.where(recent_high > current, recent_high, current * 1.05)),
+    ):
+        score = np.where(on_side & (touches > 0), strength_sum, -np.inf)
+        # Strongest k zones without sorting every zone
+        top = np.argpartition(-score, k - 1, axis=1)[:, :k] if k < score.shape[1] else np.indices(score.shape)[1]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(score, top, axis=1), axis=1, kind='stable'), axis=1)
+        found = np.isfinite(np.take_along_axis(score, top, axis=1))
+        side_levels = np.where(found, np.take_along_axis(zone_price, top, axis=1), np.nan)
+        side_touches = np.where(found, np.take_along_axis(touches, top, axis=1), 0)
+        if side_levels.shape[1] < k:
+            fill = k - side_levels.shape[1]
+            side_levels = np.concatenate([side_levels, np.full((N, fill), np.nan)], axis=1)
+            side_touches = np.concatenate([side_touches, np.zeros((N, fill), dtype=side_touches.dtype)], axis=1)
+
+        distance = np.where(np.isnan(side_levels), np.inf, np.abs(side_levels - current[:, None]))
+        nearest = np.take_along_axis(side_levels, distance.argmin(axis=1)[:, None], axis=1)[:, 0]
+        levels[side] = np.where(np.isnan(nearest), fallback, nearest)
+        levels[f'{side}_levels'] = side_levels
+        levels[f'{side}_touches'] = side_touches
+    return levels
+
+
+def compute_kernel(
+    close: np.ndarray,
+    high: Optional[np.ndarray] = None,
+    low: Optional[np.ndarray] = None,
+    wilder: bool = False,
+    series: bool = False
+) -> Dict[str, np.ndarray]:
+    """
+    EMA20/50, RSI, MACD/signal/histogram and support/resistance zones in one call
+
+    Args:
+        close: Close prices, (T,) or (N, T)
+        high: High prices (defaults to close)
+        low: Low prices (defaults to close)
+        wilder: Use Wilder smoothing for RSI
+        series: Also return the full per-bar series under '<name>_series'
+
+    Returns:
+        Dict of last values, scalars for 1-D input or (N,) arrays for 2-D input
+    """
+    one_d = np.ndim(close) == 1
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    high = close if high is None else np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = close if low is None else np.atleast_2d(np.asarray(low, dtype=np.float64))
+
+    start = _first_valid(close)
+    emas = {span: ema(close, span, start) for span in EMA_SPANS}
+    macd_data = macd(close, emas[12], emas[26])
+    full = {
+        'ema20': emas[20],
+        'ema50': emas[50],
+        'rsi': rsi(close, RSI_PERIOD, wilder),
+        'macd': macd_data['macd'],
+        'macd_signal': macd_data['signal'],
+        'macd_histogram': macd_data['histogram'],
+    }
+
+    result = {name: values[..., -1] for name, values in full.items()}
+    result.update(pivot_levels(close, high, low))
+    if series:
+        result.update({f"{name}_series": values for name, values in full.items()})
+
+    if one_d:
+        result = {name: values[0] for name, values in result.items()}
+    return result
@@ -0,0 +1,269 @@
+"""
+Indicator Registry
+Named indicators with declared dependencies, evaluated lazily on demand
+
+Each indicator is a NumPy function of its dependencies, working along the last
+axis of (T,) or (N, T) arrays like the kernel (leading NaNs allowed). Asking for
+an indicator computes only it and what it depends on, each once: ATR and ADX
+share the true range, MACD reuses the EMAs, and so on. New indicators plug in
+with @register; outputs named like an IndicatorsData field are filled in by
+compute_indicators when requested.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import warnings
+import numpy as np
+from backend.app.models.schema import IndicatorsData
+from backend.app.services import indicator_kernel
+
+# Raw arrays every evaluation starts from
+INPUTS = ('close', 'high', 'low', 'volume')
+
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0
+ATR_PERIOD = 14
+STOCH_PERIOD = 14
+STOCH_SMOOTH = 3
+VWAP_PERIOD = 20
+ADX_PERIOD = 14
+
+
+@dataclass(frozen=True)
+class Indicator:
+    name: str
+    fn: Callable[..., Any]
+    depends: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    extra: bool
+
+
+REGISTRY: Dict[str, Indicator] = {}
+
+
+def register(name: str, *depends: str, outputs: Optional[Tuple[str, ...]] = None, extra: bool = True):
+    """
+    Register an indicator computed from its dependencies (inputs or other indicators)
+
+    The function receives the dependencies' values positionally and returns one
+    array (output named `name`) or a dict of arrays keyed by `outputs`.
+    `extra` marks optional indicators callers opt into; core ones are always
+    computed by the kernel.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        REGISTRY[name] = Indicator(name, fn, tuple(depends), outputs or (name,), extra)
+        return fn
+    return decorator
+
+
+def available(extra_only: bool = True) -> List[str]:
+    """Names of registered indicators"""
+    return [name for name, indicator in REGISTRY.items() if indicator.extra or not extra_only]
+
+
+def extra_fields() -> List[str]:
+    """IndicatorsData fields filled by extra indicators"""
+    return [
+        output for indicator in REGISTRY.values() if indicator.extra
+        for output in indicator.outputs if output in IndicatorsData.model_fields
+    ]
+
+
+def evaluate(values: Dict[str, Any], names: Iterable[str]) -> Dict[str, Any]:
+    """
+    Compute the named indicators and their dependencies
+
+    Args:
+        values: Known values, at least the INPUTS needed; updated in place with
+            everything computed, so it can be reused as a cache across calls
+        names: Indicators to compute
+
+    Returns:
+        The updated values dict
+
+    Raises:
+        ValueError: Unknown indicator, missing input or dependency cycle
+    """
+    resolving = set()
+
+    def resolve(name: str) -> Any:
+        if name in values:
+            return values[name]
+        if name in INPUTS:
+            raise ValueError(f"Missing input '{name}'")
+        indicator = REGISTRY.get(name)
+        if indicator is None:
+            raise ValueError(f"Unknown indicator '{name}'")
+        if name in resolving:
+            raise ValueError(f"Dependency cycle at '{name}'")
+        resolving.add(name)
+        args = [resolve(dependency) for dependency in indicator.depends]
+        resolving.discard(name)
+        values[name] = indicator.fn(*args)
+        return values[name]
+
+    for name in names:
+        resolve(name)
+    return values
+
+
+def last_values(values: Dict[str, Any], names: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Last bar of every output of the named indicators, keyed by output name"""
+    result = {}
+    for name in names:
+        value = values[name]
+        outputs = value if isinstance(value, dict) else {name: value}
+        for output, series in outputs.items():
+            result[output] = np.asarray(series)[..., -1]
+    return result
+
+
+# --- Array helpers (leading-NaN aware, along the last axis) ---
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the last `window` bars; NaN until the window holds only valid bars"""
+    x = np.atleast_2d(x)
+    valid = ~np.isnan(x)
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=-1)
+    ccount = np.cumsum(valid, axis=-1)
+    out = csum.copy()
+    count = ccount.copy()
+    out[..., window:] -= csum[..., :-window]
+    count[..., window:] -= ccount[..., :-window]
+    return np.where(count == window, out, np.nan)
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_sum(x, window) / window
+
+
+def _rolling_extreme(x: np.ndarray, window: int, op: np.ufunc) -> np.ndarray:
+    """Rolling max/min aligned to the window's last bar; NaN until the window is full"""
+    x = np.atleast_2d(x)
+    fill = -np.inf if op is np.maximum else np.inf
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = indicator_kernel._rolling_extreme(np.where(np.isnan(x), fill, x), window, op)
+    return np.where(np.isnan(_rolling_sum(x, window)), np.nan, out)
+
+
+def _wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder smoothing: seeded with the mean of the first `period` values, then alpha = 1 / period"""
+    x = np.atleast_2d(x)
+    T = x.shape[-1]
+    start = indicator_kernel._first_valid(x)
+    seed_at = start + period - 1
+    t = np.arange(T)
+    before = t < seed_at[:, None]
+
+    clean = np.where(np.isnan(x), 0.0, x)
+    csum = np.cumsum(clean, axis=-1)
+    end = np.minimum(seed_at, T - 1)[:, None]
+    base = np.where(start > 0, np.take_along_axis(csum, np.maximum(start - 1, 0)[:, None], -1)[:, 0], 0.0)
+    seed = (np.take_along_axis(csum, end, -1)[:, 0] - base) / period
+
+    u = np.where(t == seed_at[:, None], seed[:, None], clean / period)
+    u[before] = 0.0
+    y = indicator_kernel._scan(u, 1.0 - 1.0 / period)
+    y[before] = np.nan
+    return y
+
+
+# --- Core indicators (also computed by the kernel; registered for dependencies) ---
+
+for _span in indicator_kernel.EMA_SPANS:
+    register(f"ema{_span}", "close", extra=False)(lambda close, span=_span: indicator_kernel.ema(close, span))
+
+
+@register("macd", "close", "ema12", "ema26", outputs=("macd", "macd_signal", "macd_histogram"), extra=False)
+def _macd(close, ema12, ema26):
+    result = indicator_kernel.macd(close, ema12, ema26)
+    return {'macd': result['macd'], 'macd_signal': result['signal'], 'macd_histogram': result['histogram']}
+
+
+@register("rsi", "close", extra=False)
+def _rsi(close):
+    return indicator_kernel.rsi(close)
+
+
+# --- Shared building blocks ---
+
+@register("true_range", "high", "low", "close", extra=False)
+def _true_range(high, low, close):
+    high, low, close = np.atleast_2d(high), np.atleast_2d(low), np.atleast_2d(close)
+    prev_close = np.concatenate([np.full(close.shape[:-1] + (1,), np.nan), close[..., :-1]], axis=-1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        gaps = np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    return np.where(np.isnan(high - low), np.nan, np.fmax(high - low, gaps))
+
+
+@register("typical_price", "high", "low", "close", extra=False)
+def _typical_price(high, low, close):
+    return (np.atleast_2d(high) + np.atleast_2d(low) + np.atleast_2d(close)) / 3.0
+
+
+@register("sma20", "close", extra=False)
+def _sma20(close):
+    return _rolling_mean(close, BOLLINGER_PERIOD)
+
+
+# --- Extra indicators ---
+
+@register("bollinger", "close", "sma20", outputs=("bb_upper", "bb_middle", "bb_lower"))
+def _bollinger(close, sma20):
+    close = np.atleast_2d(close)
+    variance = np.maximum(_rolling_mean(close * close, BOLLINGER_PERIOD) - sma20 * sma20, 0.0)
+    width = BOLLINGER_WIDTH * np.sqrt(variance)
+    return {'bb_upper': sma20 + width, 'bb_middle': sma20, 'bb_lower': sma20 - width}
+
+
+@register("atr", "true_range")
+def _atr(true_range):
+    return _wilder(true_range, ATR_PERIOD)
+
+
+@register("stochastic", "high", "low", "close", outputs=("stoch_k", "stoch_d"))
+def _stochastic(high, low, close):
+    highest = _rolling_extreme(high, STOCH_PERIOD, np.maximum)
+    lowest = _rolling_extreme(low, STOCH_PERIOD, np.minimum)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = 100.0 * (np.atleast_2d(close) - lowest) / (highest - lowest)
+    k = np.where(highest == lowest, 50.0, k)
+    k = np.where(np.isnan(highest), np.nan, k)
+    return {'stoch_k': k, 'stoch_d': _rolling_mean(k, STOCH_SMOOTH)}
+
+
+@register("obv", "close", "volume")
+def _obv(close, volume):
+    close, volume = np.atleast_2d(close), np.atleast_2d(volume)
+    direction = np.sign(np.diff(close, axis=-1, prepend=np.nan))
+    flow = np.where(np.isnan(direction) | np.isnan(volume), 0.0, direction * volume)
+    return np.where(np.isnan(close), np.nan, np.cumsum(flow, axis=-1))
+
+
+@register("vwap", "typical_price", "volume")
+def _vwap(typical_price, volume):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _rolling_sum(typical_price * volume, VWAP_PERIOD) / _rolling_sum(volume, VWAP_PERIOD)
+
+
+@register("adx", "high", "low", "true_range", outputs=("adx", "plus_di", "minus_di"))
+def _adx(high, low, true_range):
+    high, low = np.atleast_2d(high), np.atleast_2d(low)
+    nan_col = np.full(high.shape[:-1] + (1,), np.nan)
+    up = np.diff(high, axis=-1, prepend=nan_col)
+    down = -np.diff(low, axis=-1, prepend=nan_col)
+    with np.errstate(invalid='ignore'):
+        plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+        minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    # Directional movement starts at the second bar
+    plus_dm = np.where(np.isnan(up), np.nan, plus_dm)
+    minus_dm = np.where(np.isnan(up), np.nan, minus_dm)
+    tr = np.where(np.isnan(up), np.nan, true_range)
+
+    atr = _wilder(tr, ADX_PERIOD)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_di = 100.0 * _wilder(plus_dm, ADX_PERIOD) / atr
+        minus_di = 100.0 * _wilder(minus_dm, ADX_PERIOD) / atr
+        dx = 100.0 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    return {'adx': _wilder(dx, ADX_PERIOD), 'plus_di': plus_di, 'minus_di': minus_di}
@@ -0,0 +1,256 @@
+"""
+Incremental Indicator State
+Per-symbol indicator state persisted next to the stored OHLCV, updated in constant time per new bar
+"""
+from collections import deque
+from typing import Any, Dict, Optional
+import logging
+import numpy as np
+import pandas as pd
+from backend.app.models.schema import IndicatorsData
+from backend.app.services import ohlcv_store
+from backend.app.services import indicator_kernel
+from backend.app.services.indicators import price_levels
+
+logger = logging.getLogger(__name__)
+
+STATE_SUFFIX = ".state.json"
+STATE_VERSION = 2
+
+
+def _advance(scalars: Dict[str, Any], close: float) -> Dict[str, Any]:
+    """
+    Apply one close to the recursive indicator state (EMAs, MACD signal, Wilder averages)
+
+    Returns a new dict; the input is left untouched so the latest (possibly
+    partial) bar can be previewed without committing it.
+    """
+    s = dict(scalars)
+    s['ema'] = dict(scalars['ema'])
+    period = indicator_kernel.RSI_PERIOD
+
+    if s['prev_close'] is None:
+        # First bar seeds every EMA (ewm adjust=False); the MACD line starts at 0
+        s['ema'] = {str(span): close for span in indicator_kernel.EMA_SPANS}
+        s['signal'] = 0.0
+    else:
+        for span in indicator_kernel.EMA_SPANS:
+            key = str(span)
+            s['ema'][key] += 2.0 / (span + 1) * (close - s['ema'][key])
+        macd_line = s['ema']['12'] - s['ema']['26']
+        s['signal'] += 2.0 / (indicator_kernel.SIGNAL_SPAN + 1) * (macd_line - s['signal'])
+
+        delta = close - s['prev_close']
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        s['diffs'] += 1
+        if s['diffs'] <= period:
+            s['gain_sum'] += gain
+            s['loss_sum'] += loss
+            if s['diffs'] == period:
+                s['avg_gain'] = s['gain_sum'] / period
+                s['avg_loss'] = s['loss_sum'] / period
+        else:
+            s['avg_gain'] = (s['avg_gain'] * (period - 1) + gain) / period
+            s['avg_loss'] = (s['avg_loss'] * (period - 1) + loss) / period
+
+    s['prev_close'] = close
+    return s
+
+
+class IndicatorState:
+    """
+    Running indicator state for one symbol.
+
+    Bars are committed once a newer bar arrives; the latest bar stays pending so a
+    partial intraday bar can be revised without rebuilding. EMAs, the MACD signal
+    and Wilder RSI averages are O(1) recurrences over the whole stored history;
+    windowed values (rolling RSI, S/R, price changes, average volume) come from a
+    bounded ring of the last `days` bars, cut to the analysed frame's first date so
+    they match compute_indicators on that frame.
+    The state belongs to one backfill generation of the stored history.
+    """
+
+    def __init__(self, days: int = 180, generation: int = 0):
+        self.days = days
+        self.generation = generation
+        self.committed_date: Optional[int] = None
+        self.pending: Optional[list] = None  # [date_ns, close, high, low, volume]
+        self.scalars: Dict[str, Any] = {
+            'ema': {}, 'signal': None, 'prev_close': None,
+            'diffs': 0, 'gain_sum': 0.0, 'loss_sum': 0.0, 'avg_gain': None, 'avg_loss': None,
+        }
+        # Committed bars as (date_ns, close, high, low, volume)
+        self.window: deque = deque(maxlen=max(1, days - 1))
+
+    @property
+    def last_date(self) -> Optional[int]:
+        return self.pending[0] if self.pending else self.committed_date
+
+    def update(self, date_ns: int, close: float, high: float, low: float, volume: float) -> bool:
+        """
+        Apply a bar; a bar with the pending bar's date replaces it, older bars are ignored
+
+        Returns:
+            True if the state changed
+        """
+        bar = [int(date_ns), float(close), float(high), float(low), float(volume)]
+        if self.pending is None or bar[0] == self.pending[0]:
+            if bar != self.pending and (self.committed_date is None or bar[0] > self.committed_date):
+                self.pending = bar
+                return True
+            return False
+        if bar[0] < self.pending[0]:
+            return False
+
+        # Commit the pending bar
+        self.scalars = _advance(self.scalars, self.pending[1])
+        self.window.append(tuple(self.pending))
+        self.committed_date = self.pending[0]
+        self.pending = bar
+        return True
+
+    def apply_frame(self, df: pd.DataFrame) -> int:
+        """Apply every bar of an OHLCV frame newer than the committed bars; returns bars that changed the state"""
+        dates = pd.DatetimeIndex(pd.to_datetime(df['date'], utc=True)).asi8
+        start = 0 if self.committed_date is None else int(np.searchsorted(dates, self.committed_date, side='right'))
+        close = df['close'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64) if 'high' in df.columns else close
+        low = df['low'].to_numpy(dtype=np.float64) if 'low' in df.columns else close
+        volume = df['volume'].to_numpy(dtype=np.float64) if 'volume' in df.columns else np.zeros(len(df))
+        return sum(
+            self.update(dates[i], close[i], high[i], low[i], volume[i])
+            for i in range(start, len(df))
+        )
+
+    def snapshot(self, rsi_wilder: bool = False, since: Optional[int] = None) -> IndicatorsData:
+        """
+        Indicators as of the latest (pending) bar
+
+        Args:
+            rsi_wilder: Use Wilder smoothing for RSI
+            since: Leave committed bars older than this date (ns) out of the windowed values
+        """
+        if self.pending is None:
+            return IndicatorsData()
+
+        s = _advance(self.scalars, self.pending[1])
+        window = [bar[1:] for bar in self.window if since is None or bar[0] >= since]
+        bars = np.array(window + [tuple(self.pending[1:])], dtype=np.float64)
+        close, high, low, volume = bars[:, 0], bars[:, 1], bars[:, 2], bars[:, 3]
+        current_price = float(close[-1])
+
+        def change(lookback: int) -> Optional[float]:
+            if len(close) < lookback:
+                return None
+            return (current_price - close[-lookback]) / close[-lookback] * 100
+
+        if rsi_wilder:
+            if s['avg_loss'] is None:
+                rsi = None
+            elif s['avg_loss'] == 0:
+                rsi = 100.0 if s['avg_gain'] > 0 else None
+            else:
+                rsi = 100.0 - 100.0 / (1.0 + s['avg_gain'] / s['avg_loss'])
+        else:
+            rsi = float(indicator_kernel.rsi(close[-(indicator_kernel.RSI_PERIOD + 1):])[0, -1])
+            rsi = None if np.isnan(rsi) else rsi
+
+        levels = indicator_kernel.pivot_levels(close, high, low)
+        macd_line = s['ema']['12'] - s['ema']['26']
+        support, resistance = float(levels['support'][0]), float(levels['resistance'][0])
+
+        return IndicatorsData(
+            ema20=s['ema']['20'],
+            ema50=s['ema']['50'],
+            rsi=rsi,
+            macd=macd_line,
+            macd_signal=s['signal'],
+            macd_histogram=macd_line - s['signal'],
+            support=None if np.isnan(support) else support,
+            resistance=None if np.isnan(resistance) else resistance,
+            support_levels=price_levels(levels['support_levels'][0], levels['support_touches'][0]),
+            resistance_levels=price_levels(levels['resistance_levels'][0], levels['resistance_touches'][0]),
+            volume_avg=float(volume.mean()),
+            current_price=current_price,
+            price_change_percent=change(2) if len(close) > 1 else 0.0,
+            price_change_7d=change(7),
+            price_change_30d=change(30)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': STATE_VERSION,
+            'days': self.days,
+            'generation': self.generation,
+            'committed_date': self.committed_date,
+            'pending': self.pending,
+            'scalars': self.scalars,
+            'window': [list(bar) for bar in self.window],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorState":
+        state = cls(days=data['days'], generation=data['generation'])
+        state.committed_date = data['committed_date']
+        state.pending = data['pending']
+        state.scalars = data['scalars']
+        state.window.extend(tuple(bar) for bar in data['window'])
+        return state
+
+
+def load_state(symbol: str, days: int = 180) -> Optional[IndicatorState]:
+    """
+    Load a symbol's persisted state, or None if missing, built for another
+    window or built before the stored history was last backfilled (e.g.
+    re-adjusted after a split)
+    """
+    data = ohlcv_store.load_json(symbol, STATE_SUFFIX)
+    if not data or data.get('version') != STATE_VERSION or data.get('days') != days:
+        return None
+    if data.get('generation') != ohlcv_store.backfill_generation(symbol):
+        logger.info(f"Stored history of {symbol} was backfilled again, rebuilding indicator state")
+        return None
+    try:
+        return IndicatorState.from_dict(data)
+    except Exception as e:
+        logger.warning(f"Discarding unreadable indicator state for {symbol}: {str(e)}")
+        return None
+
+
+def update_indicators(symbol: str, df: pd.DataFrame, days: int = 180, rsi_wilder: bool = False) -> IndicatorsData:
+    """
+    Bring a symbol's persisted indicator state up to date with an OHLCV frame and return its indicators
+
+    Only bars newer than the last committed bar are applied, so a repeat analysis
+    costs O(1) per new bar. The state is rebuilt from the frame when it is missing,
+    the frame does not reach back to the committed bar (a gap), or the store's
+    history was backfilled again since (re-adjusted prices).
+
+    Args:
+        symbol: Provider symbol (e.g., BBCA.JK)
+        df: OHLCV DataFrame with a 'date' column, oldest first
+        days: Window length the state's windowed indicators cover
+        rsi_wilder: Use Wilder smoothing for RSI
+
+    Returns:
+        IndicatorsData as of the frame's last bar
+    """
+    if df.empty or 'close' not in df.columns:
+        return IndicatorsData()
+
+    first = pd.Timestamp(df['date'].iloc[0]).value
+    state = load_state(symbol, days)
+    if state is not None and state.committed_date is not None:
+        if first > state.committed_date:
+            logger.info(f"Indicator state for {symbol} has a gap, rebuilding")
+            state = None
+    if state is None:
+        state = IndicatorState(days=days, generation=ohlcv_store.backfill_generation(symbol))
+
+    applied = state.apply_frame(df)
+    if applied:
+        # Repeat analyses on unchanged data skip the write
+        ohlcv_store.save_json(symbol, STATE_SUFFIX, state.to_dict())
+        logger.debug(f"Indicator state for {symbol} updated with {applied} bars")
+    # Windowed values cover the frame, which can start after the ring's oldest bar
+    return state.snapshot(rsi_wilder=rsi_wilder, since=first)
@@ -2,10 +2,13 @@
 Technical Indicators Service
 Computes technical analysis indicators
 """
+import warnings
 import pandas as pd
 import numpy as np
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from backend.app.models.schema import IndicatorsData
+from backend.app.services.indicator_kernel import compute_kernel, pivot_levels
+from backend.app.services import indicator_registry
 
 def calculate_ema(df: pd.DataFrame, period: int, column: str = 'close') -> pd.Series:
     """Calculate Exponential Moving Average"""
@@ -35,61 +38,55 @@ def calculate_macd(df: pd.DataFrame, column: str = 'close') -> Dict[str, pd.Seri
         'histogram': histogram
     }
 
-def find_support_resistance(df: pd.DataFrame, window: int = 20) -> Dict[str, Optional[float]]:
+def find_support_resistance(df: pd.DataFrame, window: int = 20) -> Dict[str, Any]:
     """
-    Find support and resistance levels using recent price action
+    Find support and resistance levels from clustered swing pivots
     
-    Support: Lowest low in recent period (last 50 days, or last 30% of data)
-    Resistance: Highest high in recent period (last 50 days, or last 30% of data)
+    Swing highs/lows within 1.5% of each other form a zone; the nearest of the
+    strongest zones below and above the last close are support and resistance.
+    Without a zone on a side, the recent low/high (last 2 * window bars) is used.
+    
+    Returns:
+        'support' and 'resistance' (floats or None), plus 'support_levels' and
+        'resistance_levels': lists of {'price', 'touches'} ranked by strength
     """
     if df.empty or 'close' not in df.columns:
-        return {'support': None, 'resistance': None}
-    
-    close = df['close']
-    high = df['high'] if 'high' in df.columns else close
-    low = df['low'] if 'low' in df.columns else close
-    
-    # Use recent data for more relevant levels (last 50 days or 30% of data, whichever is smaller)
-    recent_window = min(window * 2, max(int(len(df) * 0.3), window))
-    recent_df = df.tail(recent_window)
-    
-    # Support: lowest low in recent period
-    support = float(recent_df['low'].min()) if 'low' in recent_df.columns else float(recent_df['close'].min())
-    
-    # Resistance: highest high in recent period
-    resistance = float(recent_df['high'].max()) if 'high' in recent_df.columns else float(recent_df['close'].max())
-    
-    # If resistance is equal to current price or very close, use a more conservative approach
-    current_price = float(close.iloc[-1])
-    
-    # If resistance is current price, look for previous resistance level
-    if abs(resistance - current_price) < current_price * 0.01:  # Within 1%
-        # Use second highest as resistance
-        recent_highs = recent_df['high'].sort_values(ascending=False) if 'high' in recent_df.columns else recent_df['close'].sort_values(ascending=False)
-        if len(recent_highs) > 1:
-            resistance = float(recent_highs.iloc[1])
-        else:
-            resistance = current_price * 1.05  # 5% above current as default
-    
-    # Ensure support is below current price and resistance is above
-    if support >= current_price:
-        # Use recent low or EMA as fallback
-        support = float(recent_df['low'].quantile(0.2)) if 'low' in recent_df.columns else current_price * 0.95
+        return {'support': None, 'resistance': None, 'support_levels': [], 'resistance_levels': []}
     
-    if resistance <= current_price:
-        resistance = current_price * 1.05  # Default 5% above
+    close = df['close'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64) if 'high' in df.columns else close
+    low = df['low'].to_numpy(dtype=np.float64) if 'low' in df.columns else close
+    levels = pivot_levels(close, high, low, window=window)
     
     return {
-        'support': float(support) if not np.isnan(support) else None,
-        'resistance': float(resistance) if not np.isnan(resistance) else None
+        'support': optional_float(levels['support'][0]),
+        'resistance': optional_float(levels['resistance'][0]),
+        'support_levels': price_levels(levels['support_levels'][0], levels['support_touches'][0]),
+        'resistance_levels': price_levels(levels['resistance_levels'][0], levels['resistance_touches'][0]),
     }
 
-def compute_indicators(df: pd.DataFrame) -> IndicatorsData:
+def price_levels(prices: np.ndarray, touches: np.ndarray) -> List[Dict[str, Any]]:
+    """Ranked zone arrays from the kernel as a list of {'price', 'touches'}"""
+    return [
+        {'price': float(price), 'touches': int(count)}
+        for price, count in zip(prices, touches) if not np.isnan(price)
+    ]
+
+def optional_float(value) -> Optional[float]:
+    """Convert a kernel scalar to float, mapping NaN to None"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+def compute_indicators(df: pd.DataFrame, rsi_wilder: bool = False, extras: Sequence[str] = ()) -> IndicatorsData:
     """
     Compute all technical indicators from OHLCV data
     
+    Uses the vectorized NumPy kernel; results match the pandas helpers above.
+    
     Args:
         df: DataFrame with OHLCV data (must have columns: open, high, low, close, volume)
+        rsi_wilder: Use Wilder smoothing for RSI instead of a simple rolling mean
+        extras: Extra registry indicators to fill in (e.g. 'bollinger', 'atr')
     
     Returns:
         IndicatorsData object with computed indicators
@@ -97,13 +94,51 @@ def compute_indicators(df: pd.DataFrame) -> IndicatorsData:
     if df.empty or 'close' not in df.columns:
         return IndicatorsData()
     
-    # Get latest values
-    latest = df.iloc[-1]
-    current_price = float(latest['close'])
+    close = df['close'].to_numpy(dtype=np.float64)
+    high = df['high'].to_numpy(dtype=np.float64) if 'high' in df.columns else close
+    low = df['low'].to_numpy(dtype=np.float64) if 'low' in df.columns else close
+    volume = df['volume'].to_numpy(dtype=np.float64) if 'volume' in df.columns else None
+    
+    # EMAs, RSI, MACD and Support/Resistance in one kernel call
+    kernel = compute_kernel(close, high, low, wilder=rsi_wilder)
+    indicators = indicators_from_kernel(close, volume, kernel)
+    if extras:
+        inputs = registry_inputs(close, high, low, volume)
+        indicators = with_extras(indicators, indicator_registry.evaluate(inputs, extras), extras)
+    return indicators
+
+def registry_inputs(close: np.ndarray, high: np.ndarray, low: np.ndarray, volume: Optional[np.ndarray]) -> Dict[str, Any]:
+    """Raw arrays for indicator_registry.evaluate (missing volume becomes NaN)"""
+    return {
+        'close': close,
+        'high': high,
+        'low': low,
+        'volume': volume if volume is not None else np.full(close.shape, np.nan),
+    }
+
+def with_extras(indicators: IndicatorsData, values: Dict[str, Any], extras: Sequence[str]) -> IndicatorsData:
+    """Copy of indicators with the fields of evaluated extra indicators filled in (single ticker)"""
+    update = {
+        name: optional_float(np.asarray(value).reshape(-1)[0])
+        for name, value in indicator_registry.last_values(values, extras).items()
+        if name in IndicatorsData.model_fields
+    }
+    return indicators.model_copy(update=update)
+
+def indicators_from_kernel(close: np.ndarray, volume: Optional[np.ndarray], kernel: Dict[str, Any]) -> IndicatorsData:
+    """
+    Build IndicatorsData from a single-ticker kernel result plus price changes and average volume
+    
+    Args:
+        close: Close prices (T,), T >= 1
+        volume: Volumes (T,), or None if unavailable
+        kernel: compute_kernel result for the same bars
+    """
+    current_price = float(close[-1])
     
     # Calculate price change percent (daily change)
-    if len(df) > 1:
-        previous_close = float(df.iloc[-2]['close'])
+    if len(close) > 1:
+        previous_close = float(close[-2])
         price_change_percent = ((current_price - previous_close) / previous_close) * 100
     else:
         price_change_percent = 0.0
@@ -111,50 +146,201 @@ def compute_indicators(df: pd.DataFrame) -> IndicatorsData:
     # Calculate period change (7d and 30d if available)
     price_change_7d = None
     price_change_30d = None
-    if len(df) >= 7:
-        price_7d_ago = float(df.iloc[-7]['close'])
+    if len(close) >= 7:
+        price_7d_ago = float(close[-7])
         price_change_7d = ((current_price - price_7d_ago) / price_7d_ago) * 100
-    if len(df) >= 30:
-        price_30d_ago = float(df.iloc[-30]['close'])
+    if len(close) >= 30:
+        price_30d_ago = float(close[-30])
         price_change_30d = ((current_price - price_30d_ago) / price_30d_ago) * 100
     
-    # Calculate EMAs
-    ema20_series = calculate_ema(df, 20)
-    ema50_series = calculate_ema(df, 50)
-    ema20 = float(ema20_series.iloc[-1]) if not ema20_series.empty else None
-    ema50 = float(ema50_series.iloc[-1]) if not ema50_series.empty else None
-    
-    # Calculate RSI
-    rsi_series = calculate_rsi(df, 14)
-    rsi = float(rsi_series.iloc[-1]) if not rsi_series.empty and not np.isnan(rsi_series.iloc[-1]) else None
-    
-    # Calculate MACD
-    macd_data = calculate_macd(df)
-    macd = float(macd_data['macd'].iloc[-1]) if not macd_data['macd'].empty else None
-    macd_signal = float(macd_data['signal'].iloc[-1]) if not macd_data['signal'].empty else None
-    macd_histogram = float(macd_data['histogram'].iloc[-1]) if not macd_data['histogram'].empty else None
-    
-    # Find Support/Resistance
-    sr_levels = find_support_resistance(df, window=20)
-    
     # Calculate average volume
-    if 'volume' in df.columns:
-        volume_avg = float(df['volume'].mean()) if not df['volume'].empty else None
-    else:
-        volume_avg = None
+    volume_avg = float(np.mean(volume)) if volume is not None and len(volume) else None
     
     return IndicatorsData(
-        ema20=ema20,
-        ema50=ema50,
-        rsi=rsi,
-        macd=macd,
-        macd_signal=macd_signal,
-        macd_histogram=macd_histogram,
-        support=sr_levels['support'],
-        resistance=sr_levels['resistance'],
+        ema20=optional_float(kernel['ema20']),
+        ema50=optional_float(kernel['ema50']),
+        rsi=optional_float(kernel['rsi']),
+        macd=optional_float(kernel['macd']),
+        macd_signal=optional_float(kernel['macd_signal']),
+        macd_histogram=optional_float(kernel['macd_histogram']),
+        support=optional_float(kernel['support']),
+        resistance=optional_float(kernel['resistance']),
+        support_levels=price_levels(kernel['support_levels'], kernel['support_touches']),
+        resistance_levels=price_levels(kernel['resistance_levels'], kernel['resistance_touches']),
         volume_avg=volume_avg,
         current_price=current_price,
         price_change_percent=price_change_percent,
         price_change_7d=price_change_7d,
         price_change_30d=price_change_30d
     )
+
+# Columns of the batch indicator table: the scalar IndicatorsData fields, in order
+INDICATOR_FIELDS = [
+    name for name, field in IndicatorsData.model_fields.items() if field.annotation == Optional[float]
+]
+
+def align_frames(frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], pd.DatetimeIndex, Dict[str, np.ndarray]]:
+    """
+    Align per-ticker OHLCV frames on the union of their dates
+    
+    Rows are padded with leading NaNs before each ticker's first bar. Prices on
+    dates a ticker did not trade (e.g. suspensions) carry the last close forward;
+    volume stays NaN there so it does not count towards the average.
+    
+    Args:
+        frames: OHLCV DataFrames (with a 'date' column) keyed by ticker
+    
+    Returns:
+        (tickers, dates, arrays) where arrays maps close/high/low/volume to (N, T) float arrays
+    """
+    tickers = [ticker for ticker, df in frames.items() if not df.empty and 'close' in df.columns]
+    if not tickers:
+        return tickers, pd.DatetimeIndex([]), {name: np.empty((0, 0)) for name in ('close', 'high', 'low', 'volume')}
+
+    stamps = [pd.DatetimeIndex(frames[ticker]['date']) for ticker in tickers]
+    tz = stamps[0].tz
+    dates = np.unique(np.concatenate([index.asi8 for index in stamps]))
+    shape = (len(tickers), len(dates))
+    arrays = {name: np.full(shape, np.nan) for name in ('close', 'high', 'low', 'volume')}
+    for row, (ticker, index) in enumerate(zip(tickers, stamps)):
+        df = frames[ticker]
+        cols = np.searchsorted(dates, index.asi8)
+        close = df['close'].to_numpy(dtype=np.float64)
+        arrays['close'][row, cols] = close
+        for name in ('high', 'low', 'volume'):
+            if name in df.columns:
+                arrays[name][row, cols] = df[name].to_numpy(dtype=np.float64)
+            elif name != 'volume':
+                arrays[name][row, cols] = close
+
+    # Carry the last close forward over non-trading dates; high and low follow it
+    traded = ~np.isnan(arrays['close'])
+    last = np.where(traded, np.arange(shape[1]), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    carried = np.take_along_axis(arrays['close'], last, axis=1)
+    started = np.maximum.accumulate(traded, axis=1)
+    arrays['close'] = np.where(started, carried, np.nan)
+    for name in ('high', 'low'):
+        arrays[name] = np.where(traded, arrays[name], arrays['close'])
+
+    dates = pd.to_datetime(dates, utc=True)
+    return tickers, dates.tz_convert(tz) if tz is not None else dates.tz_localize(None), arrays
+
+def ema_cross(spread: np.ndarray, lookback: int) -> np.ndarray:
+    """
+    EMA20/EMA50 crossovers from a tickers × days spread (EMA20 - EMA50)
+    
+    Returns:
+        +1.0 for a golden cross within the last `lookback` bars, -1.0 for a
+        death cross, 0.0 otherwise (including rows without enough EMA values)
+    """
+    spread = np.atleast_2d(spread)
+    width = min(spread.shape[1], lookback + 1)
+    if width < 2:
+        return np.zeros(spread.shape[0])
+    window = spread[:, -width:]
+    # fmin/fmax skip NaNs like nanmin/nanmax, but give NaN for all-NaN rows without a RuntimeWarning
+    golden = (window[:, -1] > 0) & (np.fmin.reduce(window, axis=1) <= 0)
+    death = (window[:, -1] < 0) & (np.fmax.reduce(window, axis=1) >= 0)
+    return np.where(golden, 1.0, np.where(death, -1.0, 0.0))
+
+def compute_indicators_batch(
+    close: np.ndarray,
+    high: Optional[np.ndarray] = None,
+    low: Optional[np.ndarray] = None,
+    volume: Optional[np.ndarray] = None,
+    tickers: Optional[List[str]] = None,
+    rsi_wilder: bool = False,
+    extras: Sequence[str] = (),
+    cross_lookback: int = 0
+) -> pd.DataFrame:
+    """
+    Compute indicators for many tickers at once from a tickers × days matrix
+    
+    Every indicator is computed with vectorized operations along the time axis,
+    so screening the whole universe costs a handful of array passes instead of
+    one compute_indicators call per ticker. Each row matches compute_indicators
+    on that ticker's bars (from its first non-NaN close).
+    
+    Args:
+        close: Close prices shaped (N, T) on aligned dates, leading NaNs for shorter histories
+        high: High prices (defaults to close)
+        low: Low prices (defaults to close)
+        volume: Volumes (NaN entries are ignored in the average)
+        tickers: Row labels (defaults to 0..N-1)
+        rsi_wilder: Use Wilder smoothing for RSI
+        extras: Extra registry indicators to fill in (their columns are NaN otherwise)
+        cross_lookback: Also add an 'ema_cross' column (see ema_cross) over this many bars
+    
+    Returns:
+        DataFrame indexed by ticker with one float column per IndicatorsData field (NaN for None)
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    n_tickers, n_bars = close.shape
+    table = pd.DataFrame(np.nan, index=tickers if tickers is not None else range(n_tickers), columns=INDICATOR_FIELDS)
+    if n_bars == 0:
+        return table
+
+    kernel = compute_kernel(close, high, low, wilder=rsi_wilder, series=cross_lookback > 0)
+    for name in ('ema20', 'ema50', 'rsi', 'macd', 'macd_signal', 'macd_histogram', 'support', 'resistance'):
+        table[name] = kernel[name]
+    if cross_lookback > 0:
+        table['ema_cross'] = ema_cross(kernel['ema20_series'] - kernel['ema50_series'], cross_lookback)
+
+    current = close[:, -1]
+    n_valid = np.count_nonzero(~np.isnan(close), axis=1)
+
+    def change(lookback: int) -> np.ndarray:
+        if n_bars < lookback:
+            return np.full(n_tickers, np.nan)
+        past = close[:, -lookback]
+        return (current - past) / past * 100
+
+    table['current_price'] = current
+    table['price_change_percent'] = np.where(n_valid > 1, change(2), np.where(n_valid == 1, 0.0, np.nan))
+    table['price_change_7d'] = change(7)
+    table['price_change_30d'] = change(30)
+
+    if volume is not None:
+        with warnings.catch_warnings():
+            # Tickers without any volume just get NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            table['volume_avg'] = np.nanmean(np.atleast_2d(np.asarray(volume, dtype=np.float64)), axis=1)
+
+    if extras:
+        high = close if high is None else np.atleast_2d(np.asarray(high, dtype=np.float64))
+        low = close if low is None else np.atleast_2d(np.asarray(low, dtype=np.float64))
+        volume = None if volume is None else np.atleast_2d(np.asarray(volume, dtype=np.float64))
+        values = indicator_registry.evaluate(registry_inputs(close, high, low, volume), extras)
+        for name, last in indicator_registry.last_values(values, extras).items():
+            if name in table.columns:
+                table[name] = last
+    return table
+
+def compute_indicators_many(
+    frames: Dict[str, pd.DataFrame],
+    rsi_wilder: bool = False,
+    extras: Sequence[str] = ()
+) -> pd.DataFrame:
+    """
+    Compute the batch indicator table for per-ticker OHLCV frames
+    
+    Args:
+        frames: OHLCV DataFrames (with a 'date' column) keyed by ticker
+        rsi_wilder: Use Wilder smoothing for RSI
+        extras: Extra registry indicators to fill in
+    
+    Returns:
+        DataFrame indexed by ticker, see compute_indicators_batch
+    """
+    tickers, _, arrays = align_frames(frames)
+    if not tickers:
+        return pd.DataFrame(columns=INDICATOR_FIELDS, dtype=np.float64)
+    return compute_indicators_batch(
+        arrays['close'], arrays['high'], arrays['low'], arrays['volume'],
+        tickers=tickers, rsi_wilder=rsi_wilder, extras=extras
+    )
+
+def indicators_from_row(row: pd.Series) -> IndicatorsData:
+    """Convert one row of the batch indicator table back to IndicatorsData"""
+    return IndicatorsData(**{name: optional_float(row[name]) for name in INDICATOR_FIELDS})
@@ -3,19 +3,33 @@
 LLM Service
 Generates AI analysis reports using Google Gemini
 """
-from google import genai
 from google.genai import types
 from backend.app.core.config import settings
-import pandas as pd
-from backend.app.models.schema import IndicatorsData
+from backend.app.services.llm_gateway import LLMBusy, llm_gateway
+from backend.app.services.report_cache import report_cache, report_key
+from backend.app.services.report_similarity import similar_reports
+from backend.app.services.llm_usage import llm_usage
+from backend.app.services.analysis_context import AnalysisContext
+from backend.app.services import indicator_registry
+from backend.app.services.timeframes import INTERVAL_LABELS
+from backend.app.models.schema import DigestEntry, IndicatorsData
+from contextlib import aclosing
+from pydantic import TypeAdapter, ValidationError
+from typing import Any, AsyncIterator, Dict, List, Optional
+import hashlib
 import json
 import logging
-import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+SYSTEM_INSTRUCTION = "You are a professional financial analyst specializing in Indonesian stock market analysis."
+
+GENERATION_CONFIG = {"temperature": 0.5, "max_output_tokens": 2000}
+
+# Decimals kept for floats in the prompt data; prices, percentages and
+# indicator values don't need more, and every digit costs input tokens
+PROMPT_DECIMALS = 2
 
 PROMPT_TEMPLATE = """You are StockAnalysisGPT, an expert technical analyst.
 
@@ -27,7 +41,7 @@ STRICT CONSTRAINTS:
 - **No Intro/Outro:** START DIRECTLY with the first bullet point. Do not say "Berikut ringkasan..." or "Semoga membantu".
 - **No Fluff:** Do not explain what RSI or MACD is. Just interpret the values.
 - **Structure:**
-  1. **Tren & Struktur:** (Bullish/Bearish/Sideways, Key levels)
+  1. **Tren & Struktur:** (Bullish/Bearish/Sideways, Key levels; if weekly/monthly timeframes are given, say whether they confirm the daily trend)
   2. **Indikator:** (Konfirmasi sinyal dari RSI/MACD/Volume)
   3. **Skenario:** (Jika breakout X, potensi ke Y. Jika breakdown A, support di B)
   4. **Kesimpulan:** (Strong Buy / Buy on Weakness / Wait / Sell)
@@ -36,26 +50,90 @@ INPUT DATA:
 {data}
 """
 
-def format_data_for_llm(ticker: str, df: pd.DataFrame, indicators: IndicatorsData) -> str:
+DIGEST_TEMPLATE = """You are StockAnalysisGPT, an expert technical analyst.
+
+Your job: Summarize every stock of the watchlist below in one entry each.
+
+STRICT CONSTRAINTS:
+- **Entries:** Exactly one per input ticker, in input order, ticker written as given.
+- **trend:** bullish / bearish / sideways (EMA20 vs EMA50, price vs key levels; weekly/monthly if given).
+- **signal:** Strong Buy / Buy on Weakness / Wait / Sell.
+- **summary:** 1-2 sentences, max 40 words, direct professional Indonesian, naming the key level to watch. No fluff.
+
+INPUT DATA (one object per ticker):
+{data}
+"""
+
+# Output budget of a digest call: 256 tokens plus this much per ticker
+DIGEST_TOKENS_PER_TICKER = 120
+
+# Ticker recorded for digest calls in the report cache and usage log
+DIGEST_TICKER = "DIGEST"
+
+# Error for a response without report text; empty reports are never cached
+EMPTY_REPORT = "Gemini tidak mengembalikan teks laporan"
+
+# Part of every report cache key: editing the prompts, their data encoding or
+# the generation settings invalidates all cached reports
+PROMPT_VERSION = hashlib.sha256(
+    json.dumps(
+        [SYSTEM_INSTRUCTION, PROMPT_TEMPLATE, GENERATION_CONFIG, PROMPT_DECIMALS, DIGEST_TEMPLATE, DIGEST_TOKENS_PER_TICKER],
+        sort_keys=True
+    ).encode('utf-8')
+).hexdigest()[:16]
+
+_digest_entries = TypeAdapter(List[DigestEntry])
+
+def _compact(value: Any) -> Any:
+    """Prompt value with floats rounded (whole floats as ints) and None fields dropped"""
+    if isinstance(value, float):
+        value = round(value, PROMPT_DECIMALS)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _timeframe_summary(indicators: IndicatorsData) -> dict:
+    """Compact view of a coarser timeframe's indicators"""
+    trend = None
+    if indicators.ema20 is not None and indicators.ema50 is not None:
+        trend = 'bullish' if indicators.ema20 > indicators.ema50 else 'bearish'
+    return {
+        'trend': trend,
+        'change_percent': indicators.price_change_percent,
+        'EMA20': indicators.ema20,
+        'EMA50': indicators.ema50,
+        'RSI': indicators.rsi,
+        'MACD': indicators.macd,
+        'Support': indicators.support,
+        'Resistance': indicators.resistance
+    }
+
+
+def prompt_data(context: AnalysisContext) -> dict:
     """
-    Format OHLCV data and indicators into a concise string for LLM
+    OHLCV summary and indicators the report is written from
     """
-    latest = df.iloc[-1]
-    period_days = len(df)
+    indicators = context.indicators
+    summary = context.price_summary
+    period_days = len(context)
     price_range = {
-        f'highest_{period_days}d': float(df['high'].max()),
-        f'lowest_{period_days}d': float(df['low'].min()),
+        f'highest_{period_days}d': summary['highest'],
+        f'lowest_{period_days}d': summary['lowest'],
         'current': indicators.current_price,
         'change_percent': indicators.price_change_percent
     }
     volume_analysis = {
         'average': indicators.volume_avg,
-        'current': float(latest.get('volume', 0)),
-        'trend': 'naik' if len(df) > 10 and df['volume'].tail(5).mean() > df['volume'].head(5).mean() else 'turun'
+        'current': summary['volume_current'],
+        'trend': 'naik' if summary['volume_rising'] else 'turun'
     }
     data_summary = {
-        'ticker': ticker,
-        'period_days': len(df),
+        'ticker': context.ticker,
+        'period_days': period_days,
         'price': price_range,
         'price_changes': {
             'daily': indicators.price_change_percent,
@@ -70,48 +148,252 @@ def format_data_for_llm(ticker: str, df: pd.DataFrame, indicators: IndicatorsDat
             'Support': indicators.support,
             'Resistance': indicators.resistance
         },
+        # Ranked zones from swing pivots; touches = how often price turned there
+        'levels': {
+            'support': [level.model_dump() for level in indicators.support_levels],
+            'resistance': [level.model_dump() for level in indicators.resistance_levels]
+        },
         'volume': volume_analysis
     }
-    return json.dumps(data_summary, indent=2, ensure_ascii=False)
+    if context.timeframes:
+        data_summary['timeframes'] = {
+            INTERVAL_LABELS[interval]: _timeframe_summary(data)
+            for interval, data in context.timeframes.items()
+        }
+    extras = indicators.model_dump(include=set(indicator_registry.extra_fields()), exclude_none=True)
+    if extras:
+        data_summary['extra_indicators'] = extras
+    return data_summary
 
 
-async def generate_report(ticker: str, df: pd.DataFrame, indicators: IndicatorsData) -> str:
+def format_data_for_llm(context: AnalysisContext) -> str:
     """
-    Generate AI analysis report using Google Gemini with retry logic
+    Format OHLCV data and indicators into a concise string for LLM
+
+    Single-line JSON without whitespace, floats rounded to PROMPT_DECIMALS and
+    missing values left out: the same facts in far fewer input tokens than
+    indented JSON (see benchmarks/bench_prompt.py).
     """
-    formatted_data = format_data_for_llm(ticker, df, indicators)
-    system_instruction = "You are a professional financial analyst specializing in Indonesian stock market analysis."
-    user_prompt = PROMPT_TEMPLATE.format(data=formatted_data)
-    full_prompt = f"{system_instruction}\n\n{user_prompt}"
+    return json.dumps(_compact(prompt_data(context)), separators=(',', ':'), ensure_ascii=False)
+
+
+class ReportRequest:
+    """Prompt and cache keys of one report, derived once from the context"""
+
+    def __init__(self, context: AnalysisContext):
+        self.context = context
+        self.ticker = context.ticker
+        self.data = format_data_for_llm(context)
+        self.bar_date = context.dates[-1].date()
+        self.key = report_key(self.ticker, self.bar_date, self.data, settings.GEMINI_MODEL, PROMPT_VERSION)
+        indicators = context.indicators
+        extras = tuple(field for field in indicator_registry.extra_fields() if getattr(indicators, field) is not None)
+        self.similar_key = similar_reports.key(
+            self.ticker, (self.bar_date, settings.GEMINI_MODEL, PROMPT_VERSION, extras), indicators, context.timeframes
+        )
+
+    @property
+    def prompt(self) -> str:
+        return PROMPT_TEMPLATE.format(data=self.data)
+
+    @property
+    def config(self) -> types.GenerateContentConfig:
+        # The system instruction goes in its own field instead of being
+        # repeated in the user prompt
+        return types.GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION, **GENERATION_CONFIG)
+
+    async def cached(self) -> Optional[str]:
+        """Exact cached report, else a similar recent one with its numbers patched"""
+        cached = await report_cache.get(self.key)
+        if cached is not None:
+            logger.info(f"Serving cached report for {self.ticker}")
+            return cached
+        if settings.REPORT_SIMILARITY:
+            reused = similar_reports.get(self.similar_key, self.context.indicators)
+            if reused is not None:
+                logger.info(f"Reusing a similar report for {self.ticker}")
+                return reused
+        return None
+
+    async def remember(self, report: str) -> None:
+        logger.info(f"Successfully generated report for {self.ticker}")
+        await report_cache.put(self.key, self.ticker, self.bar_date, settings.GEMINI_MODEL, PROMPT_VERSION, report)
+        similar_reports.put(self.similar_key, report, self.context.indicators)
+
+    def record_usage(self, usage: Any, started: float, first_chunk: Optional[float] = None) -> None:
+        """Log token usage and latency of the Gemini call (queue wait included)"""
+        now = time.perf_counter()
+        llm_usage.record(
+            self.ticker, settings.GEMINI_MODEL, usage, latency=now - started,
+            first_chunk=None if first_chunk is None else first_chunk - started,
+        )
 
-    max_retries = 3
-    retry_delay = 2
+    def failed(self, error: Exception) -> Exception:
+        error_str = str(error)
+        logger.error(f"Error generating report for {self.ticker}: {error_str}")
+        return Exception(f"Gagal menghasilkan laporan AI: {error_str[:200]}")
 
-    for attempt in range(max_retries):
+
+async def generate_report(context: AnalysisContext) -> str:
+    """
+    Generate AI analysis report using Google Gemini through the LLM gateway
+
+    Reports are cached by ticker, last bar date, formatted data, model and
+    prompt version, so identical inputs are answered without calling Gemini.
+    Failing that, a recent report for the same day whose indicators barely
+    differ is reused with its numbers patched (see report_similarity).
+
+    Raises:
+        LLMBusy: Gemini or the gateway queue is saturated (retry later)
+    """
+    request = ReportRequest(context)
+    cached = await request.cached()
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    try:
+        response = await llm_gateway.generate(
+            model=settings.GEMINI_MODEL,
+            contents=request.prompt,
+            config=request.config
+        )
+    except LLMBusy:
+        raise
+    except Exception as e:
+        raise request.failed(e)
+
+    request.record_usage(response.usage_metadata, started)
+    # text is None when the response has no text part (e.g. blocked by safety filters)
+    report = (response.text or '').strip()
+    if not report:
+        raise request.failed(Exception(EMPTY_REPORT))
+    await request.remember(report)
+    return report
+
+
+async def stream_report(context: AnalysisContext) -> AsyncIterator[str]:
+    """
+    generate_report() as text chunks, yielded as Gemini produces them
+
+    A cached or reused report is yielded as one chunk. The full report is
+    cached once the stream completes, unless it is empty.
+
+    Raises:
+        LLMBusy: Gemini or the gateway queue is saturated (retry later)
+    """
+    request = ReportRequest(context)
+    cached = await request.cached()
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    usage = first_chunk = None
+    started = time.perf_counter()
+    chunks = llm_gateway.stream(
+        model=settings.GEMINI_MODEL,
+        contents=request.prompt,
+        config=request.config
+    )
+    try:
+        # Closed right away if the consumer stops early, freeing the gateway slot
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                # Usage is cumulative; the last chunk carries the totals
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter()
+                    parts.append(chunk.text)
+                    yield chunk.text
+    except LLMBusy:
+        raise
+    except Exception as e:
+        raise request.failed(e)
+
+    request.record_usage(usage, started, first_chunk)
+    report = ''.join(parts).strip()
+    if not report:
+        raise request.failed(Exception(EMPTY_REPORT))
+    await request.remember(report)
+
+
+def format_digest_data(contexts: List[AnalysisContext]) -> str:
+    """
+    Prompt data of a digest: each ticker's format_data_for_llm() object
+    without the ranked level zones, as one compact JSON array
+    """
+    items = []
+    for context in contexts:
+        data = prompt_data(context)
+        del data['levels']
+        items.append(_compact(data))
+    return json.dumps(items, separators=(',', ':'), ensure_ascii=False)
+
+
+def _parse_digest(text: str) -> List[DigestEntry]:
+    try:
+        return _digest_entries.validate_json(text)
+    except ValidationError as e:
+        raise Exception(f"Format ringkasan AI tidak valid: {str(e)[:200]}")
+
+
+async def generate_digest(contexts: List[AnalysisContext]) -> Dict[str, DigestEntry]:
+    """
+    Summarize many tickers (a watchlist) in one Gemini call
+
+    The indicator summaries of all tickers go into one prompt, and Gemini
+    answers with a JSON array following the DigestEntry schema. Compared with
+    one generate_report() per ticker, the instructions are sent once and the
+    digest takes a single round trip. Digests are cached like reports, keyed
+    by the prompt data of all tickers together.
+
+    Returns:
+        Entries by ticker (upper case); tickers the model left out are absent
+
+    Raises:
+        LLMBusy: Gemini or the gateway queue is saturated (retry later)
+    """
+    data = format_digest_data(contexts)
+    bar_date = max(context.dates[-1].date() for context in contexts)
+    key = report_key(DIGEST_TICKER, bar_date, data, settings.GEMINI_MODEL, PROMPT_VERSION)
+
+    text = await report_cache.get(key)
+    if text is not None:
+        logger.info(f"Serving cached digest of {len(contexts)} tickers")
+        entries = _parse_digest(text)
+    else:
+        config = types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            temperature=GENERATION_CONFIG["temperature"],
+            max_output_tokens=256 + DIGEST_TOKENS_PER_TICKER * len(contexts),
+            response_mime_type="application/json",
+            response_schema=list[DigestEntry],
+        )
+        started = time.perf_counter()
         try:
-            response = client.models.generate_content(
+            response = await llm_gateway.generate(
                 model=settings.GEMINI_MODEL,
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.5,
-                    max_output_tokens=2000
-                )
+                contents=DIGEST_TEMPLATE.format(data=data),
+                config=config
             )
-            report = response.text.strip()
-            logger.info(f"Successfully generated report for {ticker}")
-            return report
+            llm_usage.record(DIGEST_TICKER, settings.GEMINI_MODEL, response.usage_metadata, latency=time.perf_counter() - started)
+            text = response.text
+            entries = _parse_digest(text)
+        except LLMBusy:
+            raise
         except Exception as e:
-            error_str = str(e)
-            if ('503' in error_str or 'UNAVAILABLE' in error_str or 'overloaded' in error_str.lower()) and attempt < max_retries - 1:
-                wait_time = retry_delay * (attempt + 1)
-                logger.warning(f"Gemini API overloaded, retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})")
-                await asyncio.sleep(wait_time)
-                continue
-            logger.error(f"Error generating report for {ticker}: {error_str}")
-            if '503' in error_str or 'overloaded' in error_str.lower():
-                raise Exception("Model Gemini sedang sibuk. Silakan coba lagi dalam beberapa detik.")
-            else:
-                raise Exception(f"Gagal menghasilkan laporan AI: {error_str[:200]}")
-    
-    # This line is reached if all retries fail
-    raise Exception("Model Gemini sedang sibuk setelah beberapa kali percobaan.")
+            logger.error(f"Error generating digest of {len(contexts)} tickers: {str(e)}")
+            raise Exception(f"Gagal menghasilkan ringkasan AI: {str(e)[:200]}")
+        await report_cache.put(key, DIGEST_TICKER, bar_date, settings.GEMINI_MODEL, PROMPT_VERSION, text)
+
+    wanted = {context.ticker.upper() for context in contexts}
+    digest: Dict[str, DigestEntry] = {}
+    for entry in entries:
+        ticker = entry.ticker.upper().removesuffix('.JK')
+        if ticker in wanted and ticker not in digest:
+            digest[ticker] = entry.model_copy(update={'ticker': ticker})
+    if len(digest) < len(wanted):
+        logger.warning(f"Digest left out {', '.join(sorted(wanted - set(digest)))}")
+    return digest
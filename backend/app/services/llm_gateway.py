@@ -0,0 +1,240 @@
+"""
+LLM Gateway
+Async Gemini client behind a concurrency limit and a bounded admission queue
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+import logging
+from backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per metric for the percentiles in stats()
+SAMPLES = 512
+
+
+class LLMBusy(Exception):
+    """
+    The gateway is saturated: the wait queue is full, the wait timed out, or
+    Gemini stayed overloaded after the retries. `retry_after` is a hint in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_overloaded(error: Exception) -> bool:
+    """Whether a Gemini error means 'try again later' (503 / UNAVAILABLE / 429)"""
+    text = str(error)
+    return any(marker in text for marker in ('503', 'UNAVAILABLE', '429', 'RESOURCE_EXHAUSTED')) \
+        or 'overloaded' in text.lower()
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+class LLMGateway:
+    """
+    Bounds concurrent Gemini calls and the number of requests waiting for one.
+
+    At most max_concurrency calls run at once; up to max_queue more wait for a
+    slot, each for at most queue_timeout seconds. Past that, generate() fails
+    immediately with LLMBusy instead of piling more load onto an already
+    overloaded API. Overload errors are retried with exponential backoff and
+    jitter while keeping the slot, so a 503 storm also slows this process down.
+
+    The async client is created on first use. Queue wait and call latency are
+    recorded per request for the metrics endpoint.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float,
+                 request_timeout: float, max_retries: int = 3, retry_delay: float = 1.0,
+                 client: Any = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self._client = client
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.queue_wait: Deque[float] = deque(maxlen=SAMPLES)
+        self.latency: Deque[float] = deque(maxlen=SAMPLES)
+
+    @property
+    def client(self) -> Any:
+        """Async Gemini client (google.genai Client.aio)"""
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=settings.GEMINI_API_KEY).aio
+        return self._client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _acquire(self) -> asyncio.Semaphore:
+        """Wait for a slot, or raise LLMBusy if the queue is full or the wait times out"""
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"LLM queue full ({self.waiting} waiting), rejecting request")
+            raise LLMBusy("Antrean AI penuh. Silakan coba lagi dalam beberapa detik.", retry_after=self._retry_after())
+
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"LLM request waited {self.queue_timeout}s for a slot, giving up")
+            raise LLMBusy("Model Gemini sedang sibuk. Silakan coba lagi dalam beberapa detik.", retry_after=self._retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.admitted += 1
+        self.active += 1
+        self.queue_wait.append(time.perf_counter() - queued_at)
+        return semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore, started: float) -> None:
+        self.latency.append(time.perf_counter() - started)
+        self.active -= 1
+        semaphore.release()
+
+    async def generate(self, model: str, contents: Any, config: Any = None) -> Any:
+        """
+        Call models.generate_content through the limiter
+
+        Raises:
+            LLMBusy: Queue full, queue wait timed out, or still overloaded after retries
+            Exception: Any other Gemini error, unchanged
+        """
+        semaphore = await self._acquire()
+        started = time.perf_counter()
+        try:
+            response = await self._call(model, contents, config)
+            self.completed += 1
+            return response
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release(semaphore, started)
+
+    async def stream(self, model: str, contents: Any, config: Any = None) -> AsyncIterator[Any]:
+        """
+        Response chunks of models.generate_content_stream, through the limiter
+
+        The slot is held until the stream ends or the consumer stops iterating.
+        Overload errors are retried only until a chunk with text has been
+        yielded; after that they are raised to the consumer, which already
+        holds partial output.
+
+        Raises:
+            LLMBusy: As generate()
+            Exception: Any other Gemini error, unchanged
+        """
+        semaphore = await self._acquire()
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries):
+                streamed = False
+                try:
+                    chunks = await asyncio.wait_for(
+                        self.client.models.generate_content_stream(model=model, contents=contents, config=config),
+                        timeout=self.request_timeout
+                    )
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.request_timeout)
+                        except StopAsyncIteration:
+                            break
+                        streamed = streamed or bool(chunk.text)
+                        yield chunk
+                    break
+                except Exception as e:
+                    if streamed:
+                        raise
+                    await self._retry_or_raise(attempt, e)
+            self.completed += 1
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release(semaphore, started)
+
+    async def _call(self, model: str, contents: Any, config: Any) -> Any:
+        for attempt in range(self.max_retries):
+            try:
+                return await asyncio.wait_for(
+                    self.client.models.generate_content(model=model, contents=contents, config=config),
+                    timeout=self.request_timeout
+                )
+            except Exception as e:
+                await self._retry_or_raise(attempt, e)
+
+    async def _retry_or_raise(self, attempt: int, error: Exception) -> None:
+        """Back off before the next attempt on overload errors, raise anything else"""
+        if not (is_overloaded(error) or isinstance(error, asyncio.TimeoutError)):
+            raise error
+        if attempt == self.max_retries - 1:
+            raise LLMBusy("Model Gemini sedang sibuk setelah beberapa kali percobaan.", retry_after=self._retry_after()) from error
+        # Full jitter: concurrent callers don't retry in lockstep
+        wait_time = random.uniform(0, self.retry_delay * 2 ** attempt)
+        self.retries += 1
+        logger.warning(f"Gemini API overloaded, retrying in {wait_time:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        await asyncio.sleep(wait_time)
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead times the median call latency"""
+        p50 = _percentiles(self.latency)["p50_ms"] / 1000 or 1.0
+        rounds = (self.waiting + self.active) / self.max_concurrency
+        return max(1, round(rounds * p50))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "queue_wait": _percentiles(self.queue_wait),
+            "latency": _percentiles(self.latency),
+        }
+
+
+llm_gateway = LLMGateway(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+    request_timeout=settings.LLM_REQUEST_TIMEOUT,
+    max_retries=settings.LLM_MAX_RETRIES,
+)
@@ -0,0 +1,194 @@
+"""
+LLM Usage
+Token usage and latency of every Gemini call, aggregated per ticker and day
+"""
+import asyncio
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import logging
+from sqlalchemy import func
+from backend.app.core.config import settings
+from backend.app.core.executors import run_io
+from backend.app.core.market_calendar import now_wib
+from backend.app.models.database import LLMCall, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Days of per-ticker totals kept in memory (served when the database is off or down)
+MEMORY_DAYS = 31
+
+# Seconds the database is skipped after an error, as in report_cache
+DB_RETRY_SECONDS = 60
+
+
+def _count(value: Any) -> int:
+    # usage_metadata fields are None when Gemini didn't report them
+    return value if isinstance(value, int) else 0
+
+
+def token_counts(usage: Any) -> Tuple[int, int]:
+    """
+    (prompt, output) tokens from a response's usage_metadata; output includes
+    thinking tokens, which are billed as output
+    """
+    if usage is None:
+        return 0, 0
+    output = _count(getattr(usage, 'candidates_token_count', None)) + _count(getattr(usage, 'thoughts_token_count', None))
+    return _count(getattr(usage, 'prompt_token_count', None)), output
+
+
+class _Totals:
+    __slots__ = ('calls', 'prompt_tokens', 'output_tokens', 'latency_ms', 'max_latency_ms')
+
+    def __init__(self):
+        self.calls = self.prompt_tokens = self.output_tokens = self.latency_ms = self.max_latency_ms = 0
+
+    def add(self, prompt_tokens: int, output_tokens: int, latency_ms: int) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+        self.latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+
+def _row(day: date, ticker: str, calls: int, prompt_tokens: int, output_tokens: int,
+         avg_latency_ms: float, max_latency_ms: int) -> Dict[str, Any]:
+    return {
+        "day": day.isoformat(),
+        "ticker": ticker,
+        "calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": prompt_tokens + output_tokens,
+        "avg_latency_ms": round(avg_latency_ms, 1),
+        "max_latency_ms": max_latency_ms,
+    }
+
+
+class UsageLog:
+    """
+    One llm_calls row per Gemini call, plus in-memory totals per (day, ticker).
+
+    record() is cheap: it updates the in-memory totals and writes the row in
+    the background, so accounting never delays a report. Days are trading
+    calendar days (WIB). summary() aggregates the table, so the figures cover
+    every worker; without a database it falls back to this process's totals
+    for the last MEMORY_DAYS days.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None):
+        self.session_factory = session_factory
+        self._totals: Dict[Tuple[date, str], _Totals] = {}
+        self._lock = threading.Lock()
+        self._db_down_until = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self.db_errors = 0
+
+    def _db_available(self) -> bool:
+        return self.session_factory is not None and time.monotonic() >= self._db_down_until
+
+    def _db_failed(self, action: str, error: Exception) -> None:
+        self.db_errors += 1
+        self._db_down_until = time.monotonic() + DB_RETRY_SECONDS
+        logger.warning(f"LLM usage {action} failed, skipping database for {DB_RETRY_SECONDS}s: {str(error)}")
+
+    def record(self, ticker: str, model: str, usage: Any, latency: float, first_chunk: Optional[float] = None) -> None:
+        """
+        Account one completed call
+
+        Args:
+            usage: The response's usage_metadata (last chunk of a stream)
+            latency: Seconds from the request to the full response
+            first_chunk: Seconds to the first streamed text, for streams
+        """
+        prompt_tokens, output_tokens = token_counts(usage)
+        latency_ms = round(latency * 1000)
+        day = now_wib().date()
+        ticker = ticker.upper()
+        with self._lock:
+            self._totals.setdefault((day, ticker), _Totals()).add(prompt_tokens, output_tokens, latency_ms)
+            oldest = day - timedelta(days=MEMORY_DAYS)
+            for key in [key for key in self._totals if key[0] < oldest]:
+                del self._totals[key]
+
+        if self._db_available():
+            row = LLMCall(
+                day=day, ticker=ticker, model=model, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                latency_ms=latency_ms, first_chunk_ms=None if first_chunk is None else round(first_chunk * 1000)
+            )
+            task = asyncio.create_task(self._store(row))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _store(self, row: LLMCall) -> None:
+        def insert():
+            with self.session_factory() as db:
+                db.add(row)
+                db.commit()
+
+        try:
+            await run_io(insert)
+        except Exception as e:
+            self._db_failed("write", e)
+
+    def _query(self, since: date, ticker: Optional[str]) -> List[Dict[str, Any]]:
+        with self.session_factory() as db:
+            query = db.query(
+                LLMCall.day, LLMCall.ticker, func.count(LLMCall.id),
+                func.sum(LLMCall.prompt_tokens), func.sum(LLMCall.output_tokens),
+                func.avg(LLMCall.latency_ms), func.max(LLMCall.latency_ms)
+            ).filter(LLMCall.day >= since)
+            if ticker:
+                query = query.filter(LLMCall.ticker == ticker)
+            rows = query.group_by(LLMCall.day, LLMCall.ticker).all()
+        return [
+            _row(day, row_ticker, calls, int(prompt or 0), int(output or 0), float(avg or 0), int(peak or 0))
+            for day, row_ticker, calls, prompt, output, avg, peak in rows
+        ]
+
+    def _memory_summary(self, since: date, ticker: Optional[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, totals) for key, totals in self._totals.items()
+                     if key[0] >= since and (not ticker or key[1] == ticker)]
+            return [
+                _row(day, row_ticker, totals.calls, totals.prompt_tokens, totals.output_tokens,
+                     totals.latency_ms / totals.calls, totals.max_latency_ms)
+                for (day, row_ticker), totals in items
+            ]
+
+    async def summary(self, ticker: Optional[str] = None, days: int = 7) -> Dict[str, Any]:
+        """
+        Calls, tokens and latency per day and ticker for the last `days` days
+
+        Returns:
+            {"source": "database" | "memory", "days": [...]} with the newest day
+            first and, within a day, the tickers using the most tokens first
+        """
+        since = now_wib().date() - timedelta(days=max(1, days) - 1)
+        ticker = ticker.upper() if ticker else None
+        rows, source = None, "memory"
+        if self._db_available():
+            try:
+                rows, source = await run_io(self._query, since, ticker), "database"
+            except Exception as e:
+                self._db_failed("query", e)
+        if rows is None:
+            rows = self._memory_summary(since, ticker)
+        rows.sort(key=lambda row: (row["day"], row["total_tokens"]), reverse=True)
+        return {"source": source, "days": rows}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = list(self._totals.values())
+        return {
+            "calls": sum(item.calls for item in totals),
+            "prompt_tokens": sum(item.prompt_tokens for item in totals),
+            "output_tokens": sum(item.output_tokens for item in totals),
+            "db_errors": self.db_errors,
+            "database": self.session_factory is not None,
+        }
+
+
+llm_usage = UsageLog(session_factory=SessionLocal if settings.LLM_USAGE_DB else None)
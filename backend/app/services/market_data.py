@@ -0,0 +1,225 @@
+"""
+Market Data Providers
+Pluggable sources of daily OHLCV history, selected by settings.MARKET_DATA_PROVIDER
+"""
+from abc import ABC, abstractmethod
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+import zlib
+import logging
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from backend.app.core.config import settings
+from backend.app.core import market_calendar
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Calendar span of each provider period
+PERIOD_DAYS = {"6mo": 182, "1y": 365, "2y": 730, "5y": 1826, "max": 3652}
+
+
+def normalize_history(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn a provider history frame into lowercase columns with Date as a column"""
+    df = df.reset_index()
+    df.columns = df.columns.str.lower()
+    return df
+
+
+def split_download(raw: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Split a multi-ticker yf.download result into normalized per-symbol frames
+
+    Symbols the provider returned no rows for are left out.
+    """
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+
+    if isinstance(raw.columns, pd.MultiIndex):
+        available = set(raw.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            sub = raw[symbol].dropna(how='all')
+            if not sub.empty:
+                frames[symbol] = normalize_history(sub)
+    elif len(symbols) == 1:
+        sub = raw.dropna(how='all')
+        if not sub.empty:
+            frames[symbols[0]] = normalize_history(sub)
+    return frames
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of daily OHLCV bars.
+
+    Implementations return normalized frames: a 'date' column plus lowercase
+    open/high/low/close/volume columns, oldest bar first. Calls are blocking and
+    are run in the I/O pool by the fetch service.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[str] = None) -> pd.DataFrame:
+        """
+        Daily history for one symbol, either a whole period or from a start date (inclusive)
+
+        Returns:
+            Normalized DataFrame, empty if the symbol has no data
+        """
+
+    def history_many(
+        self,
+        symbols: List[str],
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """Daily history for many symbols; symbols without data are left out"""
+        frames = {}
+        for symbol in symbols:
+            df = self.history(symbol, period=period, start=start)
+            if not df.empty:
+                frames[symbol] = df
+        return frames
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance via yfinance"""
+
+    name = "yfinance"
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[str] = None) -> pd.DataFrame:
+        stock = yf.Ticker(symbol)
+        if start is not None:
+            df = stock.history(start=start)
+        else:
+            df = stock.history(period=period or "6mo")
+        if df.empty:
+            return df
+        return normalize_history(df)
+
+    def history_many(
+        self,
+        symbols: List[str],
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Dict[str, pd.DataFrame]:
+        kwargs = {"start": start} if start is not None else {"period": period or "6mo"}
+        raw = yf.download(
+            symbols,
+            group_by='ticker',
+            auto_adjust=True,
+            progress=False,
+            threads=True,
+            **kwargs
+        )
+        return split_download(raw, symbols)
+
+
+class LocalProvider(MarketDataProvider):
+    """
+    Offline provider for load tests and benchmarks.
+
+    Reads `<SYMBOL>.parquet` or `<SYMBOL>.csv` fixtures (with or without the .JK
+    suffix) from a directory. Symbols without a fixture get a deterministic
+    synthetic random walk, so any ticker works without network access.
+    """
+
+    name = "local"
+
+    # Synthetic series start here so they stay stable from day to day
+    SYNTHETIC_EPOCH = date(2015, 1, 1)
+    SYNTHETIC_SAMPLES = 5000
+
+    def __init__(self, fixtures_dir: Optional[str] = None, synthetic: bool = True):
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.synthetic = synthetic
+
+    def history(self, symbol: str, period: Optional[str] = None, start: Optional[str] = None) -> pd.DataFrame:
+        df = self._load_fixture(symbol)
+        if df is None:
+            if not self.synthetic:
+                return pd.DataFrame()
+            df = self.synthetic_history(symbol, market_calendar.now_wib().date())
+
+        if start is not None:
+            since = pd.Timestamp(start, tz=market_calendar.MARKET_TZ.zone)
+        else:
+            since = pd.Timestamp(market_calendar.now_wib().date(), tz=market_calendar.MARKET_TZ.zone)
+            since -= pd.Timedelta(days=PERIOD_DAYS.get(period or "6mo", PERIOD_DAYS["max"]))
+        return df[df['date'] >= since].reset_index(drop=True)
+
+    def _load_fixture(self, symbol: str) -> Optional[pd.DataFrame]:
+        if self.fixtures_dir is None:
+            return None
+        base = symbol.split('.')[0]
+        for name in (symbol, base):
+            for suffix, reader in ((".parquet", pd.read_parquet), (".csv", pd.read_csv)):
+                path = self.fixtures_dir / f"{name}{suffix}"
+                if not path.exists():
+                    continue
+                try:
+                    df = reader(path)
+                    if 'date' not in df.columns.str.lower():
+                        df = df.reset_index()
+                    df.columns = df.columns.str.lower()
+                    dates = pd.to_datetime(df['date'])
+                    if dates.dt.tz is None:
+                        dates = dates.dt.tz_localize(market_calendar.MARKET_TZ.zone)
+                    df['date'] = dates.dt.tz_convert(market_calendar.MARKET_TZ.zone)
+                    return df[['date'] + OHLCV_COLUMNS].sort_values('date').reset_index(drop=True)
+                except Exception as e:
+                    logger.warning(f"Unreadable fixture {path}: {str(e)}")
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def synthetic_history(symbol: str, end: date) -> pd.DataFrame:
+        """Deterministic random-walk daily bars from SYNTHETIC_EPOCH through end"""
+        days = pd.date_range(LocalProvider.SYNTHETIC_EPOCH, end, freq='B')
+        days = [d for d in days if market_calendar.is_trading_day(d.date())]
+        n = len(days)
+
+        # Draw a fixed number of samples so earlier bars do not change as the series grows
+        size = max(n, LocalProvider.SYNTHETIC_SAMPLES)
+        rng = np.random.default_rng(zlib.crc32(symbol.upper().encode()))
+        start_price = rng.uniform(200, 10000)
+        returns = rng.normal(0.0003, 0.02, size)[:n]
+        open_noise = rng.normal(0, 0.005, size)[:n]
+        wick_up = np.abs(rng.normal(0, 0.01, size))[:n]
+        wick_down = np.abs(rng.normal(0, 0.01, size))[:n]
+        volume = np.round(rng.lognormal(15, 0.6, size))[:n]
+
+        close = np.maximum(np.round(start_price * np.exp(np.cumsum(returns))), 1.0)
+        open_ = np.maximum(np.round(np.concatenate([[start_price], close[:-1]]) * (1 + open_noise)), 1.0)
+        high = np.maximum(open_, close) * (1 + wick_up)
+        low = np.minimum(open_, close) * (1 - wick_down)
+
+        df = pd.DataFrame({
+            'date': pd.DatetimeIndex(days).tz_localize(market_calendar.MARKET_TZ.zone),
+            'open': open_,
+            'high': np.round(high),
+            'low': np.maximum(np.round(low), 1.0),
+            'close': close,
+            'volume': volume,
+        })
+        # Read-only: the frame is shared through lru_cache
+        return df
+
+
+@lru_cache()
+def get_provider() -> MarketDataProvider:
+    """Provider selected by settings.MARKET_DATA_PROVIDER"""
+    name = settings.MARKET_DATA_PROVIDER.lower()
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "local":
+        return LocalProvider(settings.MARKET_DATA_FIXTURES_DIR or None)
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {settings.MARKET_DATA_PROVIDER}")
@@ -0,0 +1,138 @@
+"""
+OHLCV Cache
+In-process LRU cache of OHLCV frames with market-hours-aware expiry
+"""
+import asyncio
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+import logging
+from backend.app.core.config import settings
+from backend.app.core import market_calendar
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("frame", "size", "expires_at")
+
+    def __init__(self, frame: pd.DataFrame, size: int, expires_at: datetime):
+        self.frame = frame
+        self.size = size
+        self.expires_at = expires_at
+
+
+class OHLCVCache:
+    """
+    LRU cache keyed by (symbol, period), bounded by total frame memory.
+
+    Entries expire per the IDX calendar: after a short TTL during the trading
+    session (until the day's bar is final), and at the next open otherwise. Expired entries younger than
+    max_stale seconds are still served while a background refresh runs
+    (stale-while-revalidate). Cached frames are shared; callers must not mutate them.
+    """
+
+    def __init__(self, max_bytes: int, session_ttl: int = 60, max_stale: int = 900):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.max_stale = max_stale
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, now: Optional[datetime] = None) -> Optional[Tuple[pd.DataFrame, bool]]:
+        """
+        Look up a frame
+
+        Returns:
+            (frame, is_fresh) or None on a miss (including entries too stale to serve)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = now or market_calendar.now_wib()
+        if now < entry.expires_at:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.frame, True
+
+        if now < entry.expires_at + timedelta(seconds=self.max_stale):
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return entry.frame, False
+
+        self._remove(key)
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, frame: pd.DataFrame, now: Optional[datetime] = None) -> None:
+        """Store a frame, evicting least recently used entries past the memory budget"""
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        expires_at = market_calendar.data_expiry(now, self.session_ttl)
+        self._entries[key] = _Entry(frame, size, expires_at)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def revalidate(self, key: Hashable, loader: Callable[[], Awaitable[Optional[pd.DataFrame]]]) -> None:
+        """Refresh an entry in the background, at most one refresh per key at a time"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def _refresh():
+            try:
+                frame = await loader()
+                if frame is not None and not frame.empty:
+                    self.put(key, frame)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {str(e)}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(_refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshing": len(self._refreshing),
+        }
+
+
+ohlcv_cache = OHLCVCache(
+    max_bytes=settings.OHLCV_CACHE_MAX_MB * 1024 * 1024,
+    session_ttl=settings.OHLCV_CACHE_SESSION_TTL,
+    max_stale=settings.OHLCV_CACHE_MAX_STALE,
+)
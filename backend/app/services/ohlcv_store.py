@@ -0,0 +1,212 @@
+"""
+OHLCV Store
+Incremental on-disk storage of daily OHLCV bars, one memory-mapped NumPy file per symbol
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional
+import tempfile
+import json
+import os
+import re
+import logging
+from backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = "Asia/Jakarta"
+
+# One record per daily bar; dates are stored as UTC epoch nanoseconds
+BAR_DTYPE = np.dtype([
+    ('date', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Provider periods ordered from shortest to longest backfill
+PERIOD_RANK = {"6mo": 0, "1y": 1, "2y": 2, "5y": 3, "max": 4}
+
+# Relative close difference on a completed bar that means the provider has
+# re-adjusted its history (split or dividend)
+ADJUSTMENT_TOLERANCE = 0.001
+
+STORE_DIR = Path(settings.OHLCV_STORE_DIR) if settings.OHLCV_STORE_DIR else Path(tempfile.gettempdir()) / "ohlcv_store"
+STORE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def _safe_name(symbol: str) -> str:
+    """Turn a ticker symbol into a safe file name"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', symbol.upper())
+
+
+def symbol_path(symbol: str, suffix: str = ".npy") -> Path:
+    """Path of a symbol's file in the store"""
+    return STORE_DIR / f"{_safe_name(symbol)}{suffix}"
+
+
+def _write_atomic(path: Path, write) -> None:
+    """Write a file via a temporary sibling and rename, so readers never see partial data"""
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_name, path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def load_bars(symbol: str) -> Optional[np.ndarray]:
+    """
+    Load stored bars for a symbol as a read-only memory-mapped record array
+
+    Returns:
+        Array of BAR_DTYPE records sorted by date, or None if nothing is stored
+    """
+    path = symbol_path(symbol)
+    if not path.exists():
+        return None
+    try:
+        bars = np.load(path, mmap_mode='r')
+        if bars.dtype != BAR_DTYPE or len(bars) == 0:
+            return None
+        return bars
+    except Exception as e:
+        logger.warning(f"Unreadable OHLCV store file for {symbol}: {str(e)}")
+        return None
+
+
+def load_json(symbol: str, suffix: str) -> Optional[dict]:
+    """Load a JSON sidecar file stored next to a symbol's bars"""
+    path = symbol_path(symbol, suffix)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except Exception:
+        return None
+
+
+def save_json(symbol: str, suffix: str, payload: dict) -> None:
+    """Persist a JSON sidecar file next to a symbol's bars"""
+    data = json.dumps(payload).encode()
+    _write_atomic(symbol_path(symbol, suffix), lambda f: f.write(data))
+
+
+def load_meta(symbol: str) -> dict:
+    """Load store metadata for a symbol (e.g. the longest period already backfilled)"""
+    return load_json(symbol, ".json") or {}
+
+
+def save_meta(symbol: str, meta: dict) -> None:
+    """Persist store metadata for a symbol"""
+    save_json(symbol, ".json", meta)
+
+
+def covers_period(symbol: str, period: str) -> bool:
+    """Check whether the stored history has already been backfilled for a provider period"""
+    stored_period = load_meta(symbol).get("period")
+    if stored_period not in PERIOD_RANK:
+        return False
+    return PERIOD_RANK[stored_period] >= PERIOD_RANK.get(period, PERIOD_RANK["max"])
+
+
+def backfill_generation(symbol: str) -> int:
+    """Number of full-period backfills that replaced a symbol's stored history"""
+    return load_meta(symbol).get("generation", 0)
+
+
+def last_bar_date(bars: np.ndarray) -> pd.Timestamp:
+    """Market-local timestamp of the most recent stored bar"""
+    return pd.Timestamp(int(bars['date'][-1]), tz="UTC").tz_convert(MARKET_TZ)
+
+
+def refresh_start(bars: np.ndarray) -> pd.Timestamp:
+    """
+    Date an incremental fetch starts from: the last completed stored bar, so
+    the fetch overlaps one bar that can no longer change (the last stored bar
+    may still be partial) and re-adjusted history can be detected
+    """
+    return last_bar_date(bars[:-1] if len(bars) > 1 else bars)
+
+
+def history_adjusted(stored: np.ndarray, df: pd.DataFrame, tolerance: float = ADJUSTMENT_TOLERANCE) -> bool:
+    """
+    Whether fetched bars disagree with completed stored bars of the same dates
+
+    Provider history is split/dividend adjusted, so after a corporate action
+    every older price changes; the stored bars then no longer join the new
+    ones and the symbol must be backfilled again.
+    """
+    completed = stored[:-1]
+    fresh = frame_to_bars(df)
+    _, stored_idx, fresh_idx = np.intersect1d(completed['date'], fresh['date'], return_indices=True)
+    if len(stored_idx) == 0:
+        return False
+    old, new = completed['close'][stored_idx], fresh['close'][fresh_idx]
+    return bool(np.any(np.abs(new - old) > tolerance * np.abs(old)))
+
+
+def frame_to_bars(df: pd.DataFrame) -> np.ndarray:
+    """
+    Convert a normalized OHLCV DataFrame (lowercase columns with a 'date' column) to store records
+    """
+    dates = pd.to_datetime(df['date'], utc=True)
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = pd.DatetimeIndex(dates).asi8
+    for column in OHLCV_COLUMNS:
+        bars[column] = df[column].to_numpy(dtype=np.float64) if column in df.columns else np.nan
+    return bars
+
+
+def bars_to_frame(bars: np.ndarray) -> pd.DataFrame:
+    """Convert store records to an OHLCV DataFrame with a market-local 'date' column"""
+    df = pd.DataFrame({column: np.asarray(bars[column]) for column in OHLCV_COLUMNS})
+    df.insert(0, 'date', pd.to_datetime(np.asarray(bars['date']), utc=True).tz_convert(MARKET_TZ))
+    return df
+
+
+def merge_bars(symbol: str, df: pd.DataFrame, period: Optional[str] = None) -> np.ndarray:
+    """
+    Merge freshly fetched bars into the store and persist the result
+
+    Stored bars dated on or after the first fetched bar are replaced, so a partial
+    bar fetched during the trading session is overwritten on the next refresh.
+
+    Args:
+        symbol: Provider symbol (e.g., BBCA.JK)
+        df: Normalized OHLCV DataFrame of new bars
+        period: Provider period the fetch covered, when it was a full backfill
+
+    Returns:
+        The merged record array
+    """
+    new_bars = frame_to_bars(df)
+    new_bars.sort(order='date')
+    stored = load_bars(symbol)
+
+    if stored is not None and len(new_bars) > 0 and period is None:
+        keep = np.asarray(stored[stored['date'] < new_bars['date'][0]])
+        merged = np.concatenate([keep, new_bars])
+    elif len(new_bars) > 0:
+        merged = new_bars
+    else:
+        return stored
+
+    _write_atomic(symbol_path(symbol), lambda f: np.save(f, merged))
+
+    if period is not None:
+        meta = load_meta(symbol)
+        meta["period"] = period
+        # The stored history was replaced (possibly re-adjusted): state derived from it is stale
+        meta["generation"] = meta.get("generation", 0) + 1
+        save_meta(symbol, meta)
+
+    return merged
@@ -0,0 +1,182 @@
+"""
+Report Cache
+AI reports cached by everything that went into the prompt: in-memory LRU in front of Postgres
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+import logging
+from sqlalchemy import or_
+from backend.app.core.config import settings
+from backend.app.core.executors import run_io
+from backend.app.models.database import LLMReport, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Seconds the database tier is skipped after an error, so an outage costs one
+# failed query per interval instead of one per request
+DB_RETRY_SECONDS = 60
+
+
+def report_key(ticker: str, bar_date: date, data: str, model: str, prompt_version: str) -> str:
+    """
+    Cache key of a report: ticker, last bar date, hash of the formatted prompt
+    data, model and prompt version. Identical prompt inputs map to the same key.
+    """
+    data_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()
+    key = '|'.join([ticker.upper(), bar_date.isoformat(), data_hash, model, prompt_version])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """
+    Reports by report_key(), each valid for `ttl` seconds.
+
+    Lookups try the in-memory LRU (max_entries), then the llm_reports table;
+    database hits are promoted to memory, so every worker serves repeat
+    reports without a query. The database tier is best effort: errors are
+    logged and treated as misses. A new model or prompt version changes every
+    key, and purge() drops the rows written for other versions.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, session_factory: Optional[Callable[[], Any]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_down_until = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.db_errors = 0
+
+    def _remember(self, key: str, report: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (report, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _db_available(self) -> bool:
+        return self.session_factory is not None and time.monotonic() >= self._db_down_until
+
+    def _db_failed(self, action: str, error: Exception) -> None:
+        self.db_errors += 1
+        self._db_down_until = time.monotonic() + DB_RETRY_SECONDS
+        logger.warning(f"Report cache {action} failed, skipping database for {DB_RETRY_SECONDS}s: {str(error)}")
+
+    def _load(self, key: str) -> Optional[Tuple[str, datetime]]:
+        with self.session_factory() as db:
+            row = db.query(LLMReport.report, LLMReport.expires_at).filter(
+                LLMReport.cache_key == key,
+                LLMReport.expires_at > datetime.now(timezone.utc)
+            ).first()
+            return (row.report, row.expires_at) if row else None
+
+    def _store(self, key: str, ticker: str, bar_date: date, model: str, prompt_version: str,
+               report: str, expires_at: datetime) -> None:
+        with self.session_factory() as db:
+            db.merge(LLMReport(
+                cache_key=key, ticker=ticker.upper(), bar_date=bar_date, model=model,
+                prompt_version=prompt_version, report=report, expires_at=expires_at
+            ))
+            db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached report for a key, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self._db_available():
+            try:
+                row = await run_io(self._load, key)
+            except Exception as e:
+                self._db_failed("lookup", e)
+                row = None
+            if row is not None:
+                report, expires_at = row
+                if expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=timezone.utc)
+                self._remember(key, report, expires_at.timestamp())
+                self.db_hits += 1
+                return report
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, ticker: str, bar_date: date, model: str, prompt_version: str, report: str) -> None:
+        """Cache a freshly generated report in both tiers"""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        self._remember(key, report, expires_at.timestamp())
+        self.writes += 1
+        if self._db_available():
+            try:
+                await run_io(self._store, key, ticker, bar_date, model, prompt_version, report, expires_at)
+            except Exception as e:
+                self._db_failed("write", e)
+
+    def purge(self, model: str, prompt_version: str) -> int:
+        """
+        Delete expired rows and rows of other models or prompt versions
+
+        Returns:
+            Number of rows deleted
+        """
+        if self.session_factory is None:
+            return 0
+        with self.session_factory() as db:
+            deleted = db.query(LLMReport).filter(or_(
+                LLMReport.expires_at <= datetime.now(timezone.utc),
+                LLMReport.model != model,
+                LLMReport.prompt_version != prompt_version
+            )).delete(synchronize_session=False)
+            db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} cached reports")
+        return deleted
+
+    def purge_in_background(self, model: str, prompt_version: str) -> None:
+        task = asyncio.create_task(self._purge_quietly(model, prompt_version))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _purge_quietly(self, model: str, prompt_version: str) -> None:
+        try:
+            await run_io(self.purge, model, prompt_version)
+        except Exception as e:
+            logger.warning(f"Report cache purge failed: {str(e)}")
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "db_errors": self.db_errors,
+            "database": self.session_factory is not None,
+        }
+
+
+report_cache = ReportCache(
+    ttl=settings.REPORT_CACHE_TTL,
+    max_entries=settings.REPORT_CACHE_MEMORY_ENTRIES,
+    session_factory=SessionLocal if settings.REPORT_CACHE_DB else None,
+)
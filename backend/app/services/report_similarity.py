@@ -0,0 +1,191 @@
+"""
+Report Similarity
+Reuse of a recent AI report when a ticker's indicators barely changed since it was generated
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import logging
+from backend.app.core.config import settings
+from backend.app.models.schema import IndicatorsData
+
+logger = logging.getLogger(__name__)
+
+# Values a reused report may quote, in matching priority (price-like first)
+PATCHED_FIELDS = (
+    'current_price', 'ema20', 'ema50', 'vwap', 'bb_upper', 'bb_middle', 'bb_lower',
+    'price_change_percent', 'rsi', 'stoch_k', 'stoch_d', 'adx', 'macd', 'macd_signal',
+    'macd_histogram', 'atr',
+)
+
+# Numbers in a report: digits with '.'/',' separators, and a sign when it
+# isn't a range dash ("9.000-9.250")
+NUMBER = re.compile(r'((?<![\w.,])[-+])?(?<![\d.,])(\d+(?:[.,]\d+)*)')
+
+
+def _sign(value: Optional[float]) -> Optional[int]:
+    if value is None or math.isnan(value):
+        return None
+    return (value > 0) - (value < 0)
+
+
+def _shape(indicators: IndicatorsData, rsi_band: float) -> Tuple:
+    """What the narrative is built on: RSI band, EMA relation, MACD sign and key levels"""
+    ema_relation = None
+    if indicators.ema20 is not None and indicators.ema50 is not None:
+        ema_relation = _sign(indicators.ema20 - indicators.ema50)
+    rsi = None if indicators.rsi is None else int(indicators.rsi // rsi_band)
+    return (rsi, ema_relation, _sign(indicators.macd), indicators.support, indicators.resistance)
+
+
+def _grouped(integer: str, thousands: str) -> bool:
+    groups = integer.split(thousands)
+    return len(groups) == 1 or (len(groups[0]) <= 3 and all(len(group) == 3 for group in groups[1:]))
+
+
+def _readings(token: str) -> List[Tuple[float, str, str, int]]:
+    """
+    Possible (value, thousands separator, decimal separator, decimals) of a
+    number as written: '9.250' is 9250 in Indonesian and 9.25 in English
+    """
+    if '.' not in token and ',' not in token:
+        return [(float(token), '', '.', 0)]
+    readings = []
+    for decimal, thousands in (('.', ','), (',', '.')):
+        if token.count(decimal) == 1 and token.rfind(decimal) > token.rfind(thousands):
+            integer, fraction = token.split(decimal)
+            if _grouped(integer, thousands):
+                used = thousands if thousands in integer else ''
+                readings.append((float(integer.replace(thousands, '') + '.' + fraction), used, decimal, len(fraction)))
+        elif decimal not in token and _grouped(token, thousands):
+            readings.append((float(token.replace(thousands, '')), thousands, decimal, 0))
+    return readings
+
+
+def _render(value: float, thousands: str, decimal: str, decimals: int, signed: bool) -> str:
+    integer, _, fraction = f"{abs(value):,.{decimals}f}".partition('.')
+    text = integer.replace(',', thousands) + (decimal + fraction if fraction else '')
+    return ('-' if value < 0 else '+' if signed else '') + text
+
+
+def patch_report(report: str, old: IndicatorsData, new: IndicatorsData) -> str:
+    """
+    Replace numbers quoted from `old` indicators with the values of `new`
+
+    A number is patched when it equals an old value rounded to the number's own
+    precision, and is written back in the same style (separators, decimals,
+    sign). Integers under 100 (thresholds like RSI 30/70, counts) and numbers
+    matching a support/resistance level (unchanged by construction) are left alone.
+    """
+    pairs = []
+    for field in PATCHED_FIELDS:
+        before, after = getattr(old, field), getattr(new, field)
+        if before is not None and after is not None and before != after:
+            pairs.append((before, after))
+    if not pairs:
+        return report
+    levels = [old.support, old.resistance] + [level.price for level in old.support_levels + old.resistance_levels]
+    levels = [level for level in levels if level is not None]
+
+    def substitute(match: re.Match) -> str:
+        sign, digits = match.group(1), match.group(2)
+        if digits.isdigit() and len(digits.lstrip('0')) < 3:
+            return match.group(0)
+        for value, thousands, decimal, decimals in _readings(digits):
+            value = -value if sign == '-' else value
+            if any(round(level, decimals) == value for level in levels):
+                return match.group(0)
+            for before, after in pairs:
+                if round(before, decimals) == value:
+                    return _render(round(after, decimals), thousands, decimal, decimals, sign == '+')
+        return match.group(0)
+
+    return NUMBER.sub(substitute, report)
+
+
+class SimilarityCache:
+    """
+    Latest generated report per (ticker, bar date, prompt, indicator shape).
+
+    A request reuses the report when its indicators have the same shape (RSI
+    band, EMA20/EMA50 relation, MACD sign, support/resistance, and the same for
+    every weekly/monthly timeframe) and its price is within price_tolerance of
+    the price the report was written for. The numbers the report quotes are
+    patched to the current values. Entries live ttl seconds, so the narrative
+    is regenerated at least that often during the session.
+    """
+
+    def __init__(self, price_tolerance: float, rsi_band: float, ttl: int, max_entries: int):
+        self.price_tolerance = price_tolerance
+        self.rsi_band = rsi_band
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[str, IndicatorsData, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.price_misses = 0
+
+    def key(self, ticker: str, prompt_key: Hashable, indicators: IndicatorsData,
+            timeframes: Dict[str, IndicatorsData]) -> Tuple:
+        return (
+            ticker.upper(), prompt_key, _shape(indicators, self.rsi_band),
+            tuple((interval, _shape(data, self.rsi_band)) for interval, data in sorted(timeframes.items())),
+        )
+
+    def get(self, key: Hashable, indicators: IndicatorsData) -> Optional[str]:
+        """The stored report patched to `indicators`, or None if none is close enough"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            report, anchor, _ = entry
+            if not self._price_close(anchor.current_price, indicators.current_price):
+                self.price_misses += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return patch_report(report, anchor, indicators)
+
+    def _price_close(self, anchor: Optional[float], price: Optional[float]) -> bool:
+        if anchor is None or price is None or anchor == 0:
+            return anchor == price
+        return abs(price - anchor) / abs(anchor) <= self.price_tolerance
+
+    def put(self, key: Hashable, report: str, indicators: IndicatorsData) -> None:
+        """Remember a freshly generated report as the anchor for its shape"""
+        with self._lock:
+            self._entries[key] = (report, indicators, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "price_misses": self.price_misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+similar_reports = SimilarityCache(
+    price_tolerance=settings.REPORT_SIMILARITY_PRICE_TOLERANCE,
+    rsi_band=settings.REPORT_SIMILARITY_RSI_BAND,
+    ttl=settings.REPORT_SIMILARITY_TTL,
+    max_entries=settings.REPORT_CACHE_MEMORY_ENTRIES,
+)
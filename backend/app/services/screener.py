@@ -0,0 +1,202 @@
+"""
+Screener Service
+Precomputed indicator table over the IDX universe, filtered and ranked on request
+"""
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from backend.app.core.config import settings
+from backend.app.core import market_calendar
+from backend.app.core.executors import run_io
+from backend.app.core.singleflight import SingleFlight
+from backend.app.models.schema import ScreenRequest
+from backend.app.services.fetch_data import get_ohlcv_many
+from backend.app.services.indicators import align_frames, compute_indicators_batch
+
+logger = logging.getLogger(__name__)
+
+# Liquid large caps, used when neither SCREEN_UNIVERSE nor SCREEN_UNIVERSE_FILE is set
+DEFAULT_UNIVERSE = (
+    "ACES", "ADRO", "AKRA", "AMMN", "AMRT", "ANTM", "ARTO", "ASII", "BBCA", "BBNI",
+    "BBRI", "BBTN", "BMRI", "BRIS", "BRPT", "BUKA", "CPIN", "CTRA", "EMTK", "ESSA",
+    "EXCL", "GGRM", "GOTO", "HMSP", "HRUM", "ICBP", "INCO", "INDF", "INKP", "INTP",
+    "ISAT", "ITMG", "JPFA", "KLBF", "MAPI", "MBMA", "MDKA", "MEDC", "MTEL", "PGAS",
+    "PGEO", "PTBA", "SIDO", "SMGR", "SMRA", "TLKM", "TOWR", "TPIA", "UNTR", "UNVR",
+)
+
+# Bars of history behind each row (same window as /api/analyze)
+SCREEN_DAYS = 180
+
+# An EMA20/EMA50 crossover counts when it happened within this many bars
+CROSS_LOOKBACK = 3
+
+# Columns derived from the indicator table for screening
+DERIVED_COLUMNS = ['volume', 'volume_ratio', 'support_distance', 'resistance_distance', 'ema_cross']
+
+
+def load_universe() -> List[str]:
+    """Tickers to screen, from settings or the built-in default list"""
+    tickers = list(settings.SCREEN_UNIVERSE)
+    if settings.SCREEN_UNIVERSE_FILE:
+        path = Path(settings.SCREEN_UNIVERSE_FILE)
+        try:
+            for line in path.read_text().splitlines():
+                ticker = line.split('#')[0].strip()
+                if ticker:
+                    tickers.append(ticker)
+        except Exception as e:
+            logger.error(f"Unreadable screener universe file {path}: {str(e)}")
+    tickers = tickers or list(DEFAULT_UNIVERSE)
+    return list(dict.fromkeys(ticker.upper().replace('.JK', '') for ticker in tickers))
+
+
+def build_table(frames: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Compute the screener table for a set of OHLCV frames
+
+    Returns:
+        (table, as_of) where table is indexed by ticker with the IndicatorsData
+        columns plus DERIVED_COLUMNS, and as_of is the latest bar date
+    """
+    tickers, dates, arrays = align_frames(frames)
+    table = compute_indicators_batch(
+        arrays['close'], arrays['high'], arrays['low'], arrays['volume'], tickers=tickers,
+        cross_lookback=CROSS_LOOKBACK
+    )
+    if not tickers:
+        return table.reindex(columns=list(dict.fromkeys(list(table.columns) + DERIVED_COLUMNS))), None
+
+    price = table['current_price'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['volume'] = arrays['volume'][:, -1]
+        table['volume_ratio'] = table['volume'] / table['volume_avg']
+        table['support_distance'] = (price - table['support'].to_numpy()) / price * 100
+        table['resistance_distance'] = (table['resistance'].to_numpy() - price) / price * 100
+
+    return table, dates[-1].strftime('%Y-%m-%d')
+
+
+def screen(table: pd.DataFrame, criteria: ScreenRequest) -> pd.DataFrame:
+    """
+    Filter and rank the screener table
+
+    All filters are combined with AND; rows missing a filtered value are left out.
+
+    Returns:
+        Matching rows, sorted by criteria.sort_by (missing values last)
+    """
+    mask = np.ones(len(table), dtype=bool)
+
+    def at_least(column: str, bound: Optional[float]):
+        nonlocal mask
+        if bound is not None:
+            mask &= (table[column] >= bound).to_numpy()
+
+    def at_most(column: str, bound: Optional[float]):
+        nonlocal mask
+        if bound is not None:
+            mask &= (table[column] <= bound).to_numpy()
+
+    at_least('rsi', criteria.rsi_min)
+    at_most('rsi', criteria.rsi_max)
+    at_most('support_distance', criteria.support_within)
+    at_most('resistance_distance', criteria.resistance_within)
+    at_least('volume_ratio', criteria.volume_ratio_min)
+    at_least('price_change_7d', criteria.change_7d_min)
+    at_most('price_change_7d', criteria.change_7d_max)
+    at_least('price_change_30d', criteria.change_30d_min)
+    at_most('price_change_30d', criteria.change_30d_max)
+
+    if criteria.trend == "bullish":
+        mask &= (table['ema20'] > table['ema50']).to_numpy()
+    elif criteria.trend == "bearish":
+        mask &= (table['ema20'] < table['ema50']).to_numpy()
+
+    if criteria.cross == "golden":
+        mask &= (table['ema_cross'] > 0).to_numpy()
+    elif criteria.cross == "death":
+        mask &= (table['ema_cross'] < 0).to_numpy()
+
+    return table[mask].sort_values(
+        criteria.sort_by, ascending=criteria.order == "asc", na_position='last', kind='stable'
+    )
+
+
+class ScreenerTable:
+    """
+    Latest screener table for the universe.
+
+    The table is rebuilt from a batch OHLCV fetch plus one batched indicator
+    pass, then served from memory. Expiry follows the IDX calendar; an expired
+    table keeps being served while a rebuild runs in the background, so requests
+    never wait on the provider once the first build is done.
+    """
+
+    def __init__(self, refresh_ttl: int = 300):
+        self.refresh_ttl = refresh_ttl
+        self.table: Optional[pd.DataFrame] = None
+        self.as_of: Optional[str] = None
+        self.expires_at: Optional[datetime] = None
+        self.universe_size = 0
+        self.builds = 0
+        self.last_build_ms: Optional[float] = None
+        self._flight = SingleFlight("screener")
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get(self) -> pd.DataFrame:
+        """Current table, building it on first use and refreshing it in the background once expired"""
+        if self.table is None:
+            await self.refresh()
+        elif market_calendar.now_wib() >= self.expires_at:
+            self.refresh_in_background()
+        return self.table
+
+    async def refresh(self) -> None:
+        """Rebuild the table (concurrent callers share one build)"""
+        await self._flight.do("universe", self._build)
+
+    def refresh_in_background(self) -> None:
+        task = asyncio.create_task(self._refresh_quietly())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Screener refresh failed: {str(e)}")
+
+    async def _build(self) -> None:
+        started = time.perf_counter()
+        universe = load_universe()
+        frames = await get_ohlcv_many(universe, days=SCREEN_DAYS)
+        table, as_of = await run_io(build_table, frames)
+
+        self.table = table
+        self.as_of = as_of
+        self.universe_size = len(universe)
+        self.expires_at = market_calendar.data_expiry(session_ttl=self.refresh_ttl)
+        self.builds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"Screener table built for {len(table)}/{len(universe)} tickers "
+            f"as of {as_of} in {self.last_build_ms:.0f} ms"
+        )
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "rows": 0 if self.table is None else len(self.table),
+            "universe": self.universe_size,
+            "as_of": self.as_of,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "builds": self.builds,
+            "last_build_ms": self.last_build_ms,
+        }
+
+
+screener_table = ScreenerTable(refresh_ttl=settings.SCREEN_REFRESH_TTL)
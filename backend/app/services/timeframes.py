@@ -0,0 +1,84 @@
+"""
+Timeframes Service
+Weekly and monthly OHLCV bars resampled locally from cached daily bars
+"""
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from backend.app.models.schema import IndicatorsData
+from backend.app.services.indicators import compute_indicators
+
+# Supported intervals, from finest to coarsest
+INTERVALS = ("1d", "1wk", "1mo")
+
+INTERVAL_LABELS = {"1d": "harian", "1wk": "mingguan", "1mo": "bulanan"}
+
+# Daily bars fetched for an analysis up to each interval: enough weekly/monthly
+# bars behind EMA50 (about two years of weeks, five years of months)
+HISTORY_DAYS = {"1d": 180, "1wk": 730, "1mo": 1825}
+
+
+def intervals_up_to(interval: str) -> List[str]:
+    """Intervals analysed for a request: daily plus every coarser one up to `interval`"""
+    return list(INTERVALS[:INTERVALS.index(interval) + 1])
+
+
+def _period_keys(dates: pd.Series, interval: str) -> np.ndarray:
+    """Integer bucket per daily bar: Monday-based ISO week or calendar month (market-local)"""
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.to_numpy().astype('datetime64[D]')
+    if interval == "1wk":
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days.astype(np.int64) + 3) // 7
+    if interval == "1mo":
+        return days.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unsupported interval '{interval}'")
+
+
+def resample(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregate daily OHLCV bars into weekly or monthly bars
+
+    Each bar takes the first open, highest high, lowest low, last close and
+    summed volume of its period, and is dated by its last trading day, so the
+    current (still open) week or month is the last, partial bar.
+
+    Args:
+        df: Daily OHLCV DataFrame with a 'date' column, sorted by date
+        interval: '1d' (returned as is), '1wk' or '1mo'
+
+    Returns:
+        OHLCV DataFrame with the same columns
+    """
+    if interval == "1d" or df.empty:
+        return df
+
+    keys = _period_keys(df['date'], interval)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    ends = np.concatenate([starts[1:], [len(keys)]]) - 1
+
+    columns = {'date': df['date'].iloc[ends].reset_index(drop=True)}
+    columns['open'] = df['open'].to_numpy(dtype=np.float64)[starts]
+    columns['high'] = np.fmax.reduceat(df['high'].to_numpy(dtype=np.float64), starts)
+    columns['low'] = np.fmin.reduceat(df['low'].to_numpy(dtype=np.float64), starts)
+    columns['close'] = df['close'].to_numpy(dtype=np.float64)[ends]
+    if 'volume' in df.columns:
+        volume = df['volume'].to_numpy(dtype=np.float64)
+        columns['volume'] = np.add.reduceat(np.nan_to_num(volume), starts)
+    return pd.DataFrame(columns)
+
+
+def compute_timeframes(df: pd.DataFrame, intervals: Sequence[str], extras: Sequence[str] = ()) -> Dict[str, IndicatorsData]:
+    """
+    Indicators per coarser timeframe, all resampled from one daily frame
+
+    Args:
+        df: Daily OHLCV DataFrame covering HISTORY_DAYS of the coarsest interval
+        intervals: Intervals to compute ('1wk', '1mo')
+        extras: Extra registry indicators to fill in
+
+    Returns:
+        Dict of interval to IndicatorsData
+    """
+    return {interval: compute_indicators(resample(df, interval), extras=extras) for interval in intervals}
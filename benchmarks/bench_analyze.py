@@ -0,0 +1,140 @@
+"""
+Analyze Path Load Test
+Fires concurrent /api/analyze requests against the app in-process using the
+offline market data provider, so it runs on machines without network access.
+
+Usage:
+    python benchmarks/bench_analyze.py --requests 200 --concurrency 20 --tickers 50
+    python benchmarks/bench_analyze.py --llm   # call Gemini for real instead of a fake report
+    python benchmarks/bench_analyze.py --stream --llm-latency 8   # /api/analyze/stream, time to first report chunk
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MARKET_DATA_PROVIDER", "local")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from backend.app.main import app  # noqa: E402
+from backend.app.services.llm import format_data_for_llm  # noqa: E402
+
+
+async def fake_report(context):
+    """Builds the real prompt data but skips the Gemini call"""
+    format_data_for_llm(context)
+    await asyncio.sleep(FAKE_LLM_LATENCY)
+    return f"Laporan uji untuk {context.ticker}"
+
+
+async def fake_stream_report(context):
+    """fake_report as FAKE_STREAM_CHUNKS chunks spread over the same latency"""
+    format_data_for_llm(context)
+    for i in range(FAKE_STREAM_CHUNKS):
+        await asyncio.sleep(FAKE_LLM_LATENCY / FAKE_STREAM_CHUNKS)
+        yield f"Bagian {i + 1} laporan uji untuk {context.ticker}. "
+
+
+FAKE_LLM_LATENCY = 0.0
+FAKE_STREAM_CHUNKS = 10
+STREAM_PORT = 8765
+
+
+async def run(n_requests: int, concurrency: int, n_tickers: int, stream: bool = False):
+    tickers = [f"SYN{i:03d}" for i in range(n_tickers)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    first_content = []
+    failures = 0
+
+    if stream:
+        # ASGITransport buffers whole responses; streaming needs a real server
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STREAM_PORT, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        client_args = {"base_url": f"http://127.0.0.1:{STREAM_PORT}"}
+    else:
+        client_args = {"transport": httpx.ASGITransport(app=app), "base_url": "http://bench"}
+
+    async with httpx.AsyncClient(timeout=120, **client_args) as client:
+        async def one(i: int):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                body = {"ticker": tickers[i % n_tickers], "user_id": f"bench-{i}"}
+                # One simulated client address per request keeps the per-IP rate limiter out of the way
+                headers = {"X-Forwarded-For": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"}
+                if stream:
+                    async with client.stream("POST", "/api/analyze/stream", json=body, headers=headers) as response:
+                        ok = response.status_code == 200
+                        first = None
+                        async for line in response.aiter_lines():
+                            event = json.loads(line) if line else {}
+                            if event.get("event") == "report" and first is None:
+                                first = time.perf_counter() - started
+                                first_content.append(first)
+                            ok = ok and event.get("event") != "error"
+                else:
+                    response = await client.post("/api/analyze", json=body, headers=headers)
+                    ok = response.status_code == 200
+                latencies.append(time.perf_counter() - started)
+                if not ok:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(n_requests)])
+        elapsed = time.perf_counter() - started
+
+        metrics = (await client.get("/api/metrics")).json()
+
+    if stream:
+        server.should_exit = True
+        await serving
+
+    latencies.sort()
+    print(f"requests={n_requests} concurrency={concurrency} tickers={n_tickers} failures={failures}")
+    print(f"throughput={n_requests / elapsed:.1f} req/s  total={elapsed:.2f}s")
+    print(
+        f"latency ms: p50={statistics.median(latencies) * 1000:.1f} "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} "
+        f"max={latencies[-1] * 1000:.1f}"
+    )
+    if first_content:
+        first_content.sort()
+        print(
+            f"time to first report chunk ms: p50={statistics.median(first_content) * 1000:.1f} "
+            f"max={first_content[-1] * 1000:.1f}"
+        )
+    print(f"metrics: {metrics}")
+
+
+def main():
+    global FAKE_LLM_LATENCY
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--llm", action="store_true", help="Call Gemini instead of a fake report")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the fake report takes")
+    parser.add_argument("--stream", action="store_true", help="Use /api/analyze/stream and report time to first chunk")
+    args = parser.parse_args()
+
+    FAKE_LLM_LATENCY = args.llm_latency
+    if args.llm:
+        asyncio.run(run(args.requests, args.concurrency, args.tickers, args.stream))
+    else:
+        with patch("backend.app.routers.analyze.generate_report", fake_report), \
+                patch("backend.app.routers.analyze.stream_report", fake_stream_report):
+            asyncio.run(run(args.requests, args.concurrency, args.tickers, args.stream))
+
+
+if __name__ == "__main__":
+    main()
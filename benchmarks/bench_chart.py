@@ -0,0 +1,114 @@
+"""
+Chart Benchmark
+Compares the pyplot renderer (new figure, tight_layout and bbox_inches='tight'
+per chart, 150 dpi PNG) against the object-oriented template renderer, cold
+(template built for the chart) and warm (template reused, only line data
+swapped), then reports bytes, render time and upload time per output profile,
+and render time over longer histories (flat thanks to candle bucketing and LTTB).
+
+Usage:
+    python benchmarks/bench_chart.py --bars 180 --repeat 20 --uplink-mbps 10
+"""
+import argparse
+import io
+import sys
+import timeit
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+from backend.app.services import chart  # noqa: E402
+from backend.app.services.analysis_context import AnalysisContext  # noqa: E402
+from backend.app.services.market_data import LocalProvider  # noqa: E402
+
+
+def pyplot_chart(context):
+    """Reference: the previous pyplot renderer"""
+    dates, close = context.dates, context.close
+    fig, ax = plt.subplots(figsize=chart.FIGURE_SIZE)
+    ax.plot(dates, close, label='Harga Penutupan', color='#2E86AB', linewidth=2)
+    ax.plot(dates[-20:], close[-20:], color='#F24236', linewidth=2.5, alpha=0.8, label='20 Hari Terakhir')
+    ax.plot(dates, context.series('ema20'), label='EMA20', color='#FF9500', linewidth=1.5, linestyle='--', alpha=0.8)
+    ax.plot(dates, context.series('ema50'), label='EMA50', color='#9D4EDD', linewidth=1.5, linestyle='--', alpha=0.8)
+    ax.set_title(f'Analisis Teknikal - {context.ticker}', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Tanggal', fontsize=12)
+    ax.set_ylabel('Harga (Rp)', fontsize=12)
+    ax.legend(loc='best', fontsize=10)
+    ax.grid(True, alpha=0.3, linestyle=':')
+    fig.autofmt_xdate()
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def template_png(context):
+    """Template renderer with the reference's 150 dpi PNG output"""
+    return chart.generate_chart(context, "png150")
+
+
+def template_png_cold(context):
+    chart._templates.chart = None
+    return template_png(context)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Upload bandwidth for the upload estimate")
+    args = parser.parse_args()
+
+    # Same output as the pyplot reference, to isolate the renderer change
+    chart.CHART_PROFILES["png150"] = chart.ChartProfile(dpi=150, format="png", options={})
+
+    # Different tickers per call, as in production (the render cache aside)
+    contexts = []
+    for i in range(8):
+        df = LocalProvider.synthetic_history(f"S{i:04d}.JK", date.today()).tail(args.bars).reset_index(drop=True)
+        context = AnalysisContext(f"S{i:04d}", df)
+        context.series('ema20')
+        contexts.append(context)
+
+    def run(render):
+        for context in contexts:
+            render(context)
+
+    print(f"bars={args.bars} charts/run={len(contexts)}")
+    cases = [
+        ("pyplot + tight bbox", lambda: run(pyplot_chart)),
+        ("template png (cold)", lambda: run(template_png_cold)),
+        ("template png (warm)", lambda: run(template_png)),
+    ]
+    baseline = None
+    for name, fn in cases:
+        fn()  # warm up fonts and caches
+        per_chart = min(timeit.repeat(fn, number=1, repeat=args.repeat)) / len(contexts) * 1000
+        baseline = baseline or per_chart
+        print(f"{name:<24} {per_chart:8.1f} ms/chart  {baseline / per_chart:5.1f}x")
+
+    print(f"\nprofiles (upload at {args.uplink_mbps:g} Mbit/s)")
+    print(f"{'profile':<10} {'pixels':>10} {'bytes':>9} {'render':>10} {'upload':>10}")
+    for name, profile in chart.CHART_PROFILES.items():
+        size = len(chart.generate_chart(contexts[0], name))
+        render = min(timeit.repeat(lambda: run(lambda c: chart.generate_chart(c, name)), number=1, repeat=args.repeat))
+        render = render / len(contexts) * 1000
+        upload = size * 8 / (args.uplink_mbps * 1e6) * 1000
+        pixels = f"{round(chart.FIGURE_SIZE[0] * profile.dpi)}x{round(chart.FIGURE_SIZE[1] * profile.dpi)}"
+        print(f"{name:<10} {pixels:>10} {size:>9,} {render:7.1f} ms {upload:7.1f} ms")
+
+    print(f"\nhistory length ({chart.DEFAULT_PROFILE} profile)")
+    history = LocalProvider.synthetic_history("S0000.JK", date.today())
+    for bars in (180, 500, 1000, len(history)):
+        context = AnalysisContext("S0000", history.tail(bars).reset_index(drop=True))
+        render = min(timeit.repeat(lambda: chart.generate_chart(context), number=1, repeat=args.repeat)) * 1000
+        print(f"{bars:>6} bars {render:8.1f} ms/chart")
+
+
+if __name__ == "__main__":
+    main()
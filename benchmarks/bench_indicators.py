@@ -0,0 +1,87 @@
+"""
+Indicator Benchmark
+Compares the NumPy indicator kernel against the pandas implementation
+(ewm/rolling Series per indicator, scalars read back with iloc), and the
+batch table over a universe of tickers against a compute_indicators loop.
+
+Usage:
+    python benchmarks/bench_indicators.py --bars 180 --repeat 500 --universe 900
+"""
+import argparse
+import sys
+import timeit
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.app.services.indicators import (  # noqa: E402
+    calculate_ema, calculate_rsi, calculate_macd, find_support_resistance, compute_indicators,
+    align_frames, compute_indicators_batch
+)
+from backend.app.services.indicator_kernel import compute_kernel  # noqa: E402
+from backend.app.services.market_data import LocalProvider  # noqa: E402
+
+
+def pandas_indicators(df):
+    """Reference: the per-indicator pandas path"""
+    macd_data = calculate_macd(df)
+    return {
+        'ema20': float(calculate_ema(df, 20).iloc[-1]),
+        'ema50': float(calculate_ema(df, 50).iloc[-1]),
+        'rsi': float(calculate_rsi(df, 14).iloc[-1]),
+        'macd': float(macd_data['macd'].iloc[-1]),
+        'macd_signal': float(macd_data['signal'].iloc[-1]),
+        'macd_histogram': float(macd_data['histogram'].iloc[-1]),
+        **{k: v for k, v in find_support_resistance(df, window=20).items() if k in ('support', 'resistance')},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--universe", type=int, default=900)
+    args = parser.parse_args()
+
+    df = LocalProvider.synthetic_history("BBCA.JK", date.today()).tail(args.bars).reset_index(drop=True)
+    close, high, low = (df[c].to_numpy() for c in ('close', 'high', 'low'))
+
+    reference = pandas_indicators(df)
+    kernel = compute_kernel(close, high, low)
+    worst = max(abs(float(kernel[k]) - v) / max(abs(v), 1e-12) for k, v in reference.items())
+    print(f"bars={len(df)} max relative difference vs pandas: {worst:.2e}")
+
+    cases = [
+        ("pandas indicators", lambda: pandas_indicators(df)),
+        ("numpy kernel", lambda: compute_kernel(close, high, low)),
+        ("numpy kernel (wilder)", lambda: compute_kernel(close, high, low, wilder=True)),
+        ("compute_indicators", lambda: compute_indicators(df)),
+    ]
+    baseline = None
+    for name, fn in cases:
+        per_call = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat * 1000
+        baseline = baseline or per_call
+        print(f"{name:<24} {per_call:8.3f} ms/call  {baseline / per_call:5.1f}x")
+
+    frames = {
+        f"S{i:04d}.JK": LocalProvider.synthetic_history(f"S{i:04d}.JK", date.today()).tail(args.bars).reset_index(drop=True)
+        for i in range(args.universe)
+    }
+    tickers, _, arrays = align_frames(frames)
+    print(f"\nuniverse={len(tickers)} tickers x {arrays['close'].shape[1]} days")
+    cases = [
+        ("compute_indicators loop", lambda: [compute_indicators(df) for df in frames.values()]),
+        ("align_frames", lambda: align_frames(frames)),
+        ("compute_indicators_batch", lambda: compute_indicators_batch(
+            arrays['close'], arrays['high'], arrays['low'], arrays['volume'], tickers=tickers)),
+    ]
+    baseline = None
+    for name, fn in cases:
+        per_call = min(timeit.repeat(fn, number=1, repeat=3)) * 1000
+        baseline = baseline or per_call
+        print(f"{name:<24} {per_call:8.1f} ms/universe  {baseline / per_call:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
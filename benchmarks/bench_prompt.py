@@ -0,0 +1,122 @@
+"""
+Prompt Size Benchmark
+Compares the input size of the previous report prompt (system instruction
+pasted into the user prompt, indented JSON with full-precision floats and
+nulls) against the current one (system_instruction config field, compact JSON
+with rounded floats), for daily-only and daily+weekly+monthly requests with
+and without extra indicators, over synthetic tickers. Then compares a
+watchlist summarized with one report prompt per ticker against a single
+batched digest prompt (generate_digest).
+
+Tokens are estimated offline (every digit, punctuation mark, word and
+whitespace run counts as one token, close to how Gemini's tokenizer splits
+numeric JSON); pass --count-tokens to ask Gemini's countTokens API instead
+(needs GEMINI_API_KEY and network access).
+
+Usage:
+    python benchmarks/bench_prompt.py --tickers 50
+    python benchmarks/bench_prompt.py --tickers 5 --count-tokens
+    python benchmarks/bench_prompt.py --watchlists 5 10 20
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.app.core.config import settings  # noqa: E402
+from backend.app.services import llm, timeframes  # noqa: E402
+from backend.app.services.analysis_context import AnalysisContext  # noqa: E402
+from backend.app.services.market_data import LocalProvider  # noqa: E402
+
+TOKEN = re.compile(r'\d|[^\W\d_]+|\s+|[^\w\s]|_')
+
+CASES = (
+    ("harian", "1d", []),
+    ("harian + extra", "1d", ["bollinger", "atr", "stochastic", "adx"]),
+    ("bulanan", "1mo", []),
+    ("bulanan + extra", "1mo", ["bollinger", "atr", "stochastic", "adx"]),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(TOKEN.findall(text))
+
+
+def api_token_counter():
+    """Token counter using Gemini's countTokens API"""
+    from google import genai
+    client = genai.Client(api_key=settings.GEMINI_API_KEY)
+
+    def count(text: str) -> int:
+        return client.models.count_tokens(model=settings.GEMINI_MODEL, contents=text).total_tokens
+    return count
+
+
+def previous_prompt(context: AnalysisContext) -> str:
+    """The prompt as sent before: one user message, indented full-precision JSON"""
+    data = json.dumps(llm.prompt_data(context), indent=2, ensure_ascii=False)
+    return f"{llm.SYSTEM_INSTRUCTION}\n\n{llm.PROMPT_TEMPLATE.format(data=data)}"
+
+
+def current_prompt(context: AnalysisContext) -> str:
+    """System instruction plus user prompt: both are billed as input tokens"""
+    return f"{llm.SYSTEM_INSTRUCTION}\n\n{llm.ReportRequest(context).prompt}"
+
+
+def digest_prompt(contexts) -> str:
+    return f"{llm.SYSTEM_INSTRUCTION}\n\n{llm.DIGEST_TEMPLATE.format(data=llm.format_digest_data(contexts))}"
+
+
+def build_context(ticker: str, interval: str, extras) -> AnalysisContext:
+    df = LocalProvider.synthetic_history(f"{ticker}.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+    context = AnalysisContext(ticker, df)
+    context.indicators = context.with_extras(extras)
+    coarser = timeframes.intervals_up_to(interval)[1:]
+    if coarser:
+        context.timeframes = timeframes.compute_timeframes(df, coarser)
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--count-tokens", action="store_true", help="Count with Gemini's countTokens API")
+    parser.add_argument("--watchlists", type=int, nargs="+", default=[5, 10, 20], help="Watchlist sizes for the digest table")
+    args = parser.parse_args()
+
+    count = api_token_counter() if args.count_tokens else estimate_tokens
+    tickers = [f"SYN{i:03d}" for i in range(args.tickers)]
+    print(f"tickers={args.tickers} tokens={'countTokens API' if args.count_tokens else 'offline estimate'}")
+    print(f"{'case':<18}{'chars before':>14}{'chars after':>13}{'tokens before':>15}{'tokens after':>14}{'saved':>8}")
+    for label, interval, extras in CASES:
+        chars_before, chars_after, tokens_before, tokens_after = [], [], [], []
+        for ticker in tickers:
+            context = build_context(ticker, interval, extras)
+            before, after = previous_prompt(context), current_prompt(context)
+            chars_before.append(len(before))
+            chars_after.append(len(after))
+            tokens_before.append(count(before))
+            tokens_after.append(count(after))
+        saved = 1 - statistics.mean(tokens_after) / statistics.mean(tokens_before)
+        print(
+            f"{label:<18}{statistics.mean(chars_before):>14.0f}{statistics.mean(chars_after):>13.0f}"
+            f"{statistics.mean(tokens_before):>15.0f}{statistics.mean(tokens_after):>14.0f}{saved:>8.0%}"
+        )
+
+    # Input tokens and Gemini calls of a watchlist: one report per ticker vs one digest
+    print()
+    print(f"{'watchlist':<11}{'calls':>9}{'report tokens':>15}{'digest tokens':>15}{'saved':>8}")
+    for size in args.watchlists:
+        contexts = [build_context(f"WL{i:03d}", "1d", []) for i in range(size)]
+        reports = sum(count(current_prompt(context)) for context in contexts)
+        digest = count(digest_prompt(contexts))
+        print(f"{size:<11}{f'{size} -> 1':>9}{reports:>15}{digest:>15}{1 - digest / reports:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ from telegram.ext import (
 from bot.handlers.start import start_command
 from bot.handlers.analisa import analisa_command
 from bot.handlers.quota import kuota_command
+from bot.handlers.screen import screen_command
+from bot.handlers.watchlist import watchlist_command
 from bot.handlers.callbacks import handle_callback
 from bot.core.http_client import close_http_client
 
@@ -59,6 +61,8 @@ async def post_init(application: Application):
         commands = [
             BotCommand("start", "Mulai bot & bantuan"),
             BotCommand("analisa", "Analisa saham (e.g. /analisa BBCA)"),
+            BotCommand("screen", "Saring saham (e.g. /screen oversold)"),
+            BotCommand("watchlist", "Ringkasan banyak saham (e.g. /watchlist BBCA BBRI)"),
             BotCommand("kuota", "Cek sisa kuota & Info akun"),
         ]
         await application.bot.set_my_commands(commands)
@@ -91,6 +95,8 @@ def main():
     # Add handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("analisa", analisa_command))
+    application.add_handler(CommandHandler("screen", screen_command))
+    application.add_handler(CommandHandler("watchlist", watchlist_command))
     application.add_handler(CommandHandler("kuota", kuota_command))
     application.add_handler(CallbackQueryHandler(handle_callback))
     
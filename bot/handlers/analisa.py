@@ -2,15 +2,65 @@
 Analisa command handler
 Handles /analisa TICKER command
 """
-import os
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import json
+import time
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
 from bot.core.http_client import get_http_client, BASE_URL
 
+# Optional second argument -> /api/analyze interval
+INTERVALS = {
+    "harian": "1d", "daily": "1d", "1d": "1d",
+    "mingguan": "1wk", "weekly": "1wk", "1wk": "1wk",
+    "bulanan": "1mo", "monthly": "1mo", "1mo": "1mo",
+}
+
+TIMEFRAME_LABELS = {"1wk": "Mingguan", "1mo": "Bulanan"}
+
+# Seconds between edits of the processing message while the AI report streams in
+# (Telegram allows roughly one edit per second per chat)
+EDIT_INTERVAL = 1.5
+
+# Telegram message limit is 4096 characters
+MAX_MESSAGE_CHARS = 4000
+
+
+class ProgressiveMessage:
+    """
+    Message edited as streamed text arrives, at most once per EDIT_INTERVAL.
+
+    Intermediate edits are skipped rather than queued, so the message always
+    jumps to the latest text; a flood-control RetryAfter pauses edits instead
+    of failing the command.
+    """
+
+    def __init__(self, message: Message, interval: float = EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self._next_edit = 0.0
+        self._shown = None
+
+    async def update(self, text: str) -> None:
+        text = text[:MAX_MESSAGE_CHARS]
+        now = time.monotonic()
+        if text == self._shown or now < self._next_edit:
+            return
+        self._next_edit = now + self.interval
+        try:
+            await self.message.edit_text(text)
+            self._shown = text
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            self._next_edit = now + (retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else retry_after)
+        except BadRequest:
+            # e.g. "message is not modified"; the next edit catches up
+            pass
+
 
 async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Handle /analisa TICKER command
+    Handle /analisa TICKER [mingguan|bulanan] command
     
     Flow:
     1. Check quota
@@ -30,11 +80,19 @@ async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Parse ticker from command
     if not context.args or len(context.args) == 0:
         await update.message.reply_text(
-            "❌ Format: /analisa TICKER\nContoh: /analisa BBCA"
+            "❌ Format: /analisa TICKER [mingguan|bulanan]\nContoh: /analisa BBCA mingguan"
         )
         return
     
     ticker = context.args[0].upper().strip()
+    interval = "1d"
+    if len(context.args) > 1:
+        interval = INTERVALS.get(context.args[1].lower().strip())
+        if interval is None:
+            await update.message.reply_text(
+                "❌ Timeframe tidak dikenal. Pilihan: harian, mingguan, bulanan"
+            )
+            return
     
     try:
         client = get_http_client()
@@ -77,24 +135,50 @@ async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             json={"user_id": user_id}
         )
         
-        # Step 4: Call analyze endpoint
-        analyze_response = await client.post(
-            f"{BASE_URL}/api/analyze",
-            json={"ticker": ticker, "user_id": user_id}
-        )
+        # Step 4: Stream the analysis; the AI report is shown as it is written
+        data = None
+        ai_report = ""
+        async with client.stream(
+            "POST",
+            f"{BASE_URL}/api/analyze/stream",
+            json={"ticker": ticker, "user_id": user_id, "interval": interval, "chart_profile": "telegram"}
+        ) as analyze_response:
+            if analyze_response.status_code != 200:
+                await analyze_response.aread()
+                error_detail = analyze_response.json().get("detail", "Unknown error")
+                await processing_msg.edit_text(
+                    f"❌ Error: {error_detail[:200]}"
+                )
+                return
+            
+            progress = ProgressiveMessage(processing_msg)
+            async for line in analyze_response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "analysis":
+                    data = event["data"]
+                elif event["event"] == "report":
+                    ai_report += event["text"]
+                    await progress.update(f"🤖 Analisis AI {ticker} (sedang ditulis...)\n\n{ai_report}")
+                elif event["event"] == "done":
+                    ai_report = event["ai_report"]
+                elif event["event"] == "error":
+                    if event.get("status") == 503:
+                        await processing_msg.edit_text(
+                            "⚠️ Model AI sedang sibuk saat ini.\n\n"
+                            f"Silakan coba lagi dalam {event.get('retry_after', 'beberapa')} detik."
+                        )
+                    else:
+                        await processing_msg.edit_text(f"❌ Error: {event.get('detail', 'Unknown error')[:200]}")
+                    return
         
-        if analyze_response.status_code != 200:
-            error_detail = analyze_response.json().get("detail", "Unknown error")
-            await processing_msg.edit_text(
-                f"❌ Error: {error_detail[:200]}"
-            )
+        if data is None:
+            await processing_msg.edit_text("❌ Error: Respons analisis tidak lengkap")
             return
         
-        data = analyze_response.json()
-        
         # Step 5: Format and send results
         indicators = data.get("indicators", {})
-        ai_report = data.get("ai_report", "")
         
         # Format summary message
         price = indicators.get("current_price", 0)
@@ -146,6 +230,21 @@ async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if change_30d is not None:
             period_info += f" | 30 hari: {change_30d:+.2f}%"
         
+        # Weekly/monthly trend lines
+        timeframe_info = ""
+        for tf_interval, tf in data.get("timeframes", {}).items():
+            tf_ema20, tf_ema50, tf_rsi = tf.get("ema20"), tf.get("ema50"), tf.get("rsi")
+            if tf_ema20 and tf_ema50:
+                tf_trend = "Bullish" if tf_ema20 > tf_ema50 else "Bearish"
+            else:
+                tf_trend = "N/A"
+            line = f"\n• {TIMEFRAME_LABELS.get(tf_interval, tf_interval)}: {tf_trend}"
+            if tf_rsi is not None:
+                line += f" | RSI {tf_rsi:.0f}"
+            timeframe_info += line
+        if timeframe_info:
+            timeframe_info = "\n\n*Timeframe Besar*" + timeframe_info
+        
         # Sanitize AI Report for Telegram Legacy Markdown
         # 1. Replace ** with * (Gemini bold -> Telegram bold)
         ai_report = ai_report.replace("**", "*")
@@ -169,7 +268,7 @@ async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 *2) Momentum*
 • RSI: {rsi:.2f}{rsi_status}
 • {ema_relation}
-• MACD: {macd_signal}
+• MACD: {macd_signal}{timeframe_info}
 
 *3) Analisis AI*
 {ai_report}
@@ -195,17 +294,16 @@ async def analisa_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=reply_markup
         )
         
-        # Step 6: Send chart if available
-        chart_path = data.get("chart_path")
-        if chart_path and os.path.exists(chart_path):
+        # Step 6: Send chart if available (served by the backend, no shared disk needed)
+        chart_url = data.get("chart_url")
+        if chart_url:
             try:
-                with open(chart_path, 'rb') as chart_file:
+                chart_response = await client.get(f"{BASE_URL}{chart_url}")
+                if chart_response.status_code == 200:
                     await update.message.reply_photo(
-                        photo=chart_file,
+                        photo=chart_response.content,
                         caption=f"📊 Chart Teknikal {ticker}"
                     )
-                # Clean up chart file
-                os.remove(chart_path)
             except Exception as e:
                 # Just log error, don't spam user
                 print(f"Error sending chart: {e}")
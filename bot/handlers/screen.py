@@ -0,0 +1,106 @@
+"""
+Screen command handler
+Handles /screen PRESET [N] command
+"""
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot.core.http_client import get_http_client, BASE_URL
+
+# Preset name -> (description, /api/screen query params)
+PRESETS = {
+    "oversold": ("RSI di bawah 30", {"rsi_max": 30, "sort_by": "rsi", "order": "asc"}),
+    "overbought": ("RSI di atas 70", {"rsi_min": 70, "sort_by": "rsi", "order": "desc"}),
+    "golden": ("Golden cross EMA20/EMA50", {"cross": "golden", "sort_by": "volume_ratio"}),
+    "volume": ("Volume minimal 2x rata-rata", {"volume_ratio_min": 2, "sort_by": "volume_ratio"}),
+    "support": (
+        "Uptrend, harga dekat support (maks 3%)",
+        {"trend": "bullish", "support_within": 3, "sort_by": "support_distance", "order": "asc"}
+    ),
+    "breakout": (
+        "Dekat resistance (maks 2%) dengan volume 1.5x",
+        {"resistance_within": 2, "volume_ratio_min": 1.5, "sort_by": "resistance_distance", "order": "asc"}
+    ),
+    "momentum": (
+        "Uptrend, naik minimal 10% dalam 30 hari",
+        {"trend": "bullish", "change_30d_min": 10, "sort_by": "price_change_30d"}
+    ),
+}
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 30
+
+
+def _usage() -> str:
+    lines = ["❌ Format: /screen PRESET [JUMLAH]", "Contoh: /screen oversold 10", "", "*Preset:*"]
+    lines += [f"• `{name}` — {description}" for name, (description, _) in PRESETS.items()]
+    return "\n".join(lines)
+
+
+async def screen_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /screen PRESET [N] command
+
+    Returns the top N tickers of the universe for a preset filter.
+    Screening reads a precomputed table, so it does not use quota.
+    """
+    args = context.args or []
+    preset = args[0].lower().strip() if args else ""
+    if preset not in PRESETS:
+        await update.message.reply_text(_usage(), parse_mode='Markdown')
+        return
+
+    limit = DEFAULT_LIMIT
+    if len(args) > 1:
+        try:
+            limit = max(1, min(MAX_LIMIT, int(args[1])))
+        except ValueError:
+            await update.message.reply_text(_usage(), parse_mode='Markdown')
+            return
+
+    description, params = PRESETS[preset]
+
+    try:
+        client = get_http_client()
+        response = await client.get(
+            f"{BASE_URL}/api/screen",
+            params={**params, "limit": limit}
+        )
+
+        if response.status_code != 200:
+            await update.message.reply_text("⚠️ Server sibuk, coba lagi nanti.")
+            return
+
+        data = response.json()
+        results = data.get("results", [])
+        header = (
+            f"🔎 *SCREENER — {preset.upper()}*\n"
+            f"{description}\n"
+            f"Lolos: {data.get('matched', 0)} dari {data.get('universe', 0)} ticker "
+            f"(data {data.get('as_of') or '-'})\n"
+        )
+
+        if not results:
+            await update.message.reply_text(header + "\nTidak ada ticker yang cocok saat ini.", parse_mode='Markdown')
+            return
+
+        lines = []
+        for i, result in enumerate(results, 1):
+            indicators = result.get("indicators", {})
+            price = indicators.get("current_price") or 0
+            change = indicators.get("price_change_percent") or 0
+            rsi = indicators.get("rsi")
+            volume_ratio = result.get("volume_ratio")
+            line = f"{i}. *{result['ticker']}* Rp {price:,.0f} ({change:+.2f}%)"
+            if rsi is not None:
+                line += f" | RSI {rsi:.0f}"
+            if volume_ratio is not None:
+                line += f" | Vol {volume_ratio:.1f}x"
+            lines.append(line)
+
+        await update.message.reply_text(
+            header + "\n" + "\n".join(lines) + "\n\n🔧 Gunakan /analisa TICKER untuk analisa lengkap.",
+            parse_mode='Markdown'
+        )
+
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error: {str(e)[:300]}")
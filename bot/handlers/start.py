@@ -15,12 +15,19 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Selamat datang! Bot ini membantu Anda menganalisis saham Indonesia menggunakan AI.
 
 **Cara menggunakan:**
-`/analisa TICKER`
+`/analisa TICKER [mingguan|bulanan]`
 
 Contoh:
 `/analisa BBCA`
-`/analisa ASII`
-`/analisa MDLA`
+`/analisa ASII mingguan`
+`/analisa MDLA bulanan`
+
+Cari setup di seluruh bursa:
+`/screen oversold`
+`/screen golden 5`
+
+Ringkasan watchlist (1 kuota):
+`/watchlist BBCA BBRI TLKM`
 
 **Fitur:**
 • Analisis teknikal lengkap
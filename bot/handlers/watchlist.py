@@ -0,0 +1,99 @@
+"""
+Watchlist command handler
+Handles /watchlist TICKER1 TICKER2 ... command
+"""
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from bot.core.http_client import get_http_client, BASE_URL
+
+# Same limit as /api/digest
+MAX_TICKERS = 20
+
+SIGNAL_ICONS = {"Strong Buy": "🟢", "Buy on Weakness": "🟡", "Wait": "⚪", "Sell": "🔴"}
+TREND_ICONS = {"bullish": "📈", "bearish": "📉", "sideways": "➡️"}
+
+
+async def watchlist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle /watchlist TICKER1 TICKER2 ... command
+
+    Summarizes up to MAX_TICKERS tickers in one AI digest. The digest is a
+    single Gemini call, so it uses one quota like /analisa.
+    """
+    user_id = str(update.effective_user.id)
+    tickers = list(dict.fromkeys(arg.upper().strip() for arg in (context.args or []) if arg.strip()))
+    if not tickers or len(tickers) > MAX_TICKERS:
+        await update.message.reply_text(
+            f"❌ Format: /watchlist TICKER1 TICKER2 ... (maksimal {MAX_TICKERS} ticker)\n"
+            "Contoh: /watchlist BBCA BBRI TLKM ASII"
+        )
+        return
+
+    try:
+        client = get_http_client()
+
+        quota_response = await client.get(
+            f"{BASE_URL}/quota/check",
+            params={"user_id": user_id, "username": update.effective_user.username}
+        )
+        if quota_response.status_code != 200:
+            await update.message.reply_text("⚠️ Server sibuk, coba lagi nanti.")
+            return
+
+        quota_data = quota_response.json()
+        if not quota_data.get("ok") or quota_data.get("remaining", 0) <= 0:
+            keyboard = [[InlineKeyboardButton("🔝 Upgrade Plan", callback_data="upgrade")]]
+            await update.message.reply_text(
+                "❌ Kuota habis. Silakan upgrade plan Anda untuk melanjutkan.",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+            return
+
+        processing_msg = await update.message.reply_text(
+            f"⏳ Sedang merangkum {len(tickers)} saham...\nMohon tunggu sebentar."
+        )
+
+        await client.post(
+            f"{BASE_URL}/quota/decrement",
+            json={"user_id": user_id}
+        )
+
+        response = await client.post(
+            f"{BASE_URL}/api/digest",
+            json={"tickers": tickers, "user_id": user_id}
+        )
+        if response.status_code == 503:
+            await processing_msg.edit_text(
+                "⚠️ Model AI sedang sibuk saat ini.\n\n"
+                f"Silakan coba lagi dalam {response.headers.get('Retry-After', 'beberapa')} detik."
+            )
+            return
+        if response.status_code != 200:
+            error_detail = response.json().get("detail", "Unknown error")
+            await processing_msg.edit_text(f"❌ Error: {error_detail[:200]}")
+            return
+
+        data = response.json()
+        lines = []
+        for item in data.get("items", []):
+            indicators = item.get("indicators", {})
+            price = indicators.get("current_price") or 0
+            change = indicators.get("price_change_percent") or 0
+            # Legacy Markdown: keep the AI text from opening bold/italic spans
+            summary = item.get("summary", "").replace("*", "").replace("_", " ")
+            lines.append(
+                f"{TREND_ICONS.get(item.get('trend'), '')} *{item['ticker']}* Rp {price:,.0f} ({change:+.2f}%)\n"
+                f"{SIGNAL_ICONS.get(item.get('signal'), '')} {item.get('signal', '-')} — {summary}"
+            )
+
+        message = f"📋 *RINGKASAN WATCHLIST* (data {data.get('as_of') or '-'})\n\n" + "\n\n".join(lines)
+        missing = data.get("missing", [])
+        if missing:
+            message += f"\n\n⚠️ Tanpa data: {', '.join(missing)}"
+        message += "\n\n🔧 Gunakan /analisa TICKER untuk analisa lengkap."
+
+        await processing_msg.delete()
+        await update.message.reply_text(message, parse_mode='Markdown')
+
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error: {str(e)[:300]}")
@@ -4,6 +4,7 @@ from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 import sys
 import os
+import pandas as pd
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -45,5 +46,259 @@ class TestAPI(unittest.TestCase):
         self.assertTrue(data["ok"])
         self.assertEqual(data["remaining"], 3)
 
+    def test_metrics(self):
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("ohlcv_cache", data)
+        self.assertIn("fetch", data["singleflight"])
+        self.assertIn("queue_wait", data["llm"])
+        self.assertIn("prompt_tokens", data["llm_usage"])
+
+        response = self.client.get("/api/metrics/llm-usage", params={"ticker": "BBCA", "days": 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json()["days"], list)
+
+    @patch("backend.app.routers.analyze.get_ohlcv_many", new_callable=AsyncMock)
+    def test_batch_ohlcv(self, mock_many):
+        mock_many.return_value = {
+            "BBCA": pd.DataFrame({
+                'date': pd.date_range('2024-01-01', periods=2, tz='Asia/Jakarta'),
+                'open': [1.0, 2.0], 'high': [1.0, 2.0], 'low': [1.0, 2.0],
+                'close': [1.0, 2.0], 'volume': [10.0, 20.0]
+            })
+        }
+
+        response = self.client.post("/api/ohlcv/batch", json={"tickers": ["BBCA", "XXXX"], "days": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["data"]["BBCA"]["date"], ["2024-01-01", "2024-01-02"])
+        self.assertEqual(data["data"]["BBCA"]["close"], [1.0, 2.0])
+        self.assertEqual(data["missing"], ["XXXX"])
+
+    def test_batch_ohlcv_returns_requested_days(self):
+        import tempfile
+        from pathlib import Path
+        from backend.app.core.config import settings
+        from backend.app.services import ohlcv_store
+        from backend.app.services.market_data import get_provider
+        from backend.app.services.ohlcv_cache import ohlcv_cache
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(ohlcv_cache.clear)
+        self.addCleanup(get_provider.cache_clear)
+        ohlcv_cache.clear()
+        get_provider.cache_clear()
+
+        with patch.object(settings, "MARKET_DATA_PROVIDER", "local"), \
+                patch.object(settings, "MARKET_DATA_FIXTURES_DIR", ""), \
+                patch.object(ohlcv_store, "STORE_DIR", Path(tmp.name)):
+            for days in (5, 60):
+                response = self.client.post("/api/ohlcv/batch", json={"tickers": ["BBCA", "TLKM"], "days": days})
+                self.assertEqual(response.status_code, 200)
+                for series in response.json()["data"].values():
+                    self.assertEqual(len(series["date"]), days)
+
+    @patch("backend.app.routers.analyze.render_chart", new_callable=AsyncMock)
+    @patch("backend.app.routers.analyze.generate_report", new_callable=AsyncMock)
+    def test_daily_window_does_not_depend_on_interval(self, mock_report, mock_chart):
+        import tempfile
+        from pathlib import Path
+        from backend.app.core.config import settings
+        from backend.app.services import ohlcv_store
+        from backend.app.services.market_data import get_provider
+        from backend.app.services.ohlcv_cache import ohlcv_cache
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(ohlcv_cache.clear)
+        self.addCleanup(get_provider.cache_clear)
+        ohlcv_cache.clear()
+        get_provider.cache_clear()
+        mock_report.return_value = "laporan"
+        mock_chart.return_value = None
+
+        with patch.object(settings, "MARKET_DATA_PROVIDER", "local"), \
+                patch.object(settings, "MARKET_DATA_FIXTURES_DIR", ""), \
+                patch.object(ohlcv_store, "STORE_DIR", Path(tmp.name)):
+            # Longest history first, so every request reads the same stored bars
+            for interval in ("1mo", "1wk", "1d"):
+                response = self.client.post("/api/analyze", json={"ticker": "WNDW", "user_id": "1", "interval": interval})
+                self.assertEqual(response.status_code, 200)
+
+        *coarser, daily = [call.args[0] for call in mock_report.await_args_list]
+        for context in coarser:
+            self.assertEqual(list(context.dates), list(daily.dates))
+            self.assertEqual(context.indicators, daily.indicators)
+
+    @patch("backend.app.services.screener.get_ohlcv_many", new_callable=AsyncMock)
+    def test_screen(self, mock_many):
+        from datetime import date
+        from backend.app.services.market_data import LocalProvider
+        from backend.app.services.screener import screener_table
+        mock_many.return_value = {
+            ticker: LocalProvider.synthetic_history(ticker, date(2024, 6, 28)).tail(180).reset_index(drop=True)
+            for ticker in ["BBCA", "BBRI", "TLKM", "ASII"]
+        }
+        screener_table.table = None
+        self.addCleanup(setattr, screener_table, "table", None)
+
+        response = self.client.get("/api/screen", params={"sort_by": "rsi", "order": "asc", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["universe"], 4)
+        self.assertEqual(data["matched"], 4)
+        self.assertEqual(len(data["results"]), 2)
+        rsi = [result["indicators"]["rsi"] for result in data["results"]]
+        self.assertEqual(rsi, sorted(rsi))
+
+        # Served from the precomputed table
+        response = self.client.get("/api/screen", params={"rsi_max": 0})
+        self.assertEqual(response.json()["matched"], 0)
+        mock_many.assert_awaited_once()
+
+        self.assertEqual(self.client.get("/api/screen", params={"sort_by": "nope"}).status_code, 422)
+
+    def test_get_chart(self):
+        import tempfile
+        from backend.app.services.chart_store import ChartStore, chart_id
+        store = ChartStore(tempfile.mkdtemp(), max_bytes=1024)
+        chart = chart_id("BBCA", "2024-06-28")
+        store.put(chart, b"\x89PNG fake")
+
+        with patch("backend.app.routers.charts.chart_store", store):
+            response = self.client.get(f"/api/charts/{chart}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "image/png")
+            self.assertEqual(response.content, b"\x89PNG fake")
+            etag = response.headers["etag"]
+
+            response = self.client.get(f"/api/charts/{chart}", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+
+            self.assertEqual(self.client.get(f"/api/charts/{chart_id('TLKM')}").status_code, 404)
+            self.assertEqual(self.client.get("/api/charts/..%2Fsecret").status_code, 404)
+
+    @patch("backend.app.routers.analyze.render_chart", new_callable=AsyncMock)
+    @patch("backend.app.routers.analyze.update_indicators")
+    @patch("backend.app.routers.analyze.get_ohlcv", new_callable=AsyncMock)
+    def test_analyze_stream(self, mock_ohlcv, mock_indicators, mock_chart):
+        import json
+        from datetime import date
+        from backend.app.models.schema import IndicatorsData
+        from backend.app.services.llm_gateway import LLMBusy
+        from backend.app.services.market_data import LocalProvider
+        mock_ohlcv.return_value = LocalProvider.synthetic_history("STRM.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        mock_indicators.return_value = IndicatorsData(current_price=9250.0, rsi=55.0)
+        mock_chart.return_value = "3f2a9c0e5b7d41a68c1e2f4a9b0d7e6c"
+
+        async def report(context):
+            yield "- Tren "
+            yield "bullish"
+
+        async def busy(context):
+            raise LLMBusy("Antrean AI penuh.", retry_after=7)
+            yield
+
+        with patch("backend.app.routers.analyze.stream_report", report):
+            response = self.client.post("/api/analyze/stream", json={"ticker": "STRM", "user_id": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        events = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([event["event"] for event in events], ["analysis", "report", "report", "done"])
+        self.assertEqual(events[0]["data"]["indicators"]["current_price"], 9250.0)
+        self.assertEqual(events[0]["data"]["chart_url"], "/api/charts/3f2a9c0e5b7d41a68c1e2f4a9b0d7e6c")
+        self.assertNotIn("ai_report", events[0]["data"])
+        self.assertEqual(events[-1]["ai_report"], "- Tren bullish")
+
+        with patch("backend.app.routers.analyze.stream_report", busy):
+            response = self.client.post("/api/analyze/stream", json={"ticker": "STRM", "user_id": "1"})
+        events = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(events[-1], {"event": "error", "status": 503, "detail": "Antrean AI penuh.", "retry_after": 7})
+
+        response = self.client.post("/api/analyze/stream", json={"ticker": "STRM", "user_id": "1", "extra_indicators": ["nope"]})
+        self.assertEqual(response.status_code, 400)
+
+    @patch("backend.app.routers.analyze.render_chart", new_callable=AsyncMock)
+    @patch("backend.app.routers.analyze.update_indicators")
+    @patch("backend.app.routers.analyze.get_ohlcv", new_callable=AsyncMock)
+    def test_concurrent_streams_share_one_gemini_stream(self, mock_ohlcv, mock_indicators, mock_chart):
+        import asyncio
+        import json
+        from datetime import date
+        from unittest.mock import MagicMock
+        import httpx
+        from backend.app.models.schema import IndicatorsData
+        from backend.app.services import llm
+        from backend.app.services.market_data import LocalProvider
+        from backend.app.services.report_cache import ReportCache
+        mock_ohlcv.return_value = LocalProvider.synthetic_history("FANS.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        mock_indicators.return_value = IndicatorsData(current_price=9250.0, rsi=55.0)
+        mock_chart.return_value = None
+
+        def gemini_stream(**kwargs):
+            async def chunks():
+                for text in ("- Tren ", "bullish ", "kuat"):
+                    await asyncio.sleep(0.02)
+                    yield MagicMock(text=text, usage_metadata=None)
+            return chunks()
+
+        async def requests():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*[
+                    client.post("/api/analyze/stream", json={"ticker": "FANS", "user_id": str(i)})
+                    for i in range(5)
+                ])
+
+        with patch.object(llm, "report_cache", ReportCache(ttl=3600, max_entries=10)), \
+                patch.object(llm.settings, "REPORT_SIMILARITY", False), \
+                patch.object(llm.llm_gateway, "stream", side_effect=gemini_stream) as stream:
+            responses = asyncio.run(requests())
+
+        self.assertEqual(stream.call_count, 1)
+        for response in responses:
+            events = [json.loads(line) for line in response.text.splitlines()]
+            self.assertEqual("".join(event["text"] for event in events if event["event"] == "report"), "- Tren bullish kuat")
+            self.assertEqual(events[-1], {"event": "done", "ai_report": "- Tren bullish kuat"})
+
+    @patch("backend.app.routers.analyze.generate_digest", new_callable=AsyncMock)
+    @patch("backend.app.routers.analyze.update_indicators")
+    @patch("backend.app.routers.analyze.get_ohlcv_many", new_callable=AsyncMock)
+    def test_digest(self, mock_many, mock_indicators, mock_digest):
+        from datetime import date
+        from backend.app.models.schema import DigestEntry, IndicatorsData
+        from backend.app.services.llm_gateway import LLMBusy
+        from backend.app.services.market_data import LocalProvider
+        mock_many.return_value = {
+            ticker: LocalProvider.synthetic_history(f"{ticker}.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+            for ticker in ["DGA", "DGB", "DGC"]
+        }
+        mock_indicators.return_value = IndicatorsData(current_price=9250.0, rsi=55.0)
+        mock_digest.return_value = {
+            ticker: DigestEntry(ticker=ticker, trend="bullish", signal="Wait", summary="Tunggu breakout 9.500.")
+            for ticker in ["DGA", "DGB"]
+        }
+
+        response = self.client.post("/api/digest", json={"tickers": ["dga", "DGB", "DGC", "NODATA", "DGA"], "user_id": "1"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["as_of"], "2024-06-28")
+        self.assertEqual([item["ticker"] for item in data["items"]], ["DGA", "DGB"])
+        self.assertEqual(data["items"][0]["indicators"]["current_price"], 9250.0)
+        self.assertEqual(data["missing"], ["DGC", "NODATA"])
+        # One batched fetch and one digest call for the whole watchlist
+        mock_many.assert_awaited_once_with(["DGA", "DGB", "DGC", "NODATA"], days=180)
+        contexts = mock_digest.await_args.args[0]
+        self.assertEqual([context.ticker for context in contexts], ["DGA", "DGB", "DGC"])
+
+        mock_digest.side_effect = LLMBusy("Antrean AI penuh.", retry_after=7)
+        response = self.client.post("/api/digest", json={"tickers": ["DGA", "DGB"], "user_id": "1"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "7")
+
+        self.assertEqual(self.client.post("/api/digest", json={"tickers": ["NODATA"], "user_id": "1"}).status_code, 404)
+        self.assertEqual(self.client.post("/api/digest", json={"tickers": [f"T{i}" for i in range(21)], "user_id": "1"}).status_code, 422)
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,17 +1,54 @@
-
 import unittest
-from unittest.mock import patch, MagicMock
-import pandas as pd
-import numpy as np
-import sys
-import os
+from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from contextlib import aclosing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.app.services.indicators import calculate_rsi, calculate_macd, find_support_resistance
+from backend.app.core import market_calendar
+from backend.app.core.executors import BoundedExecutor
+from backend.app.core.singleflight import SingleFlight
+from backend.app.models.database import Base, LLMReport, LLMCall
+from backend.app.models.schema import IndicatorsData, PriceLevel, ScreenRequest
+from backend.app.services import indicator_kernel, indicator_registry, llm, ohlcv_store, timeframes
+from backend.app.services.analysis_context import AnalysisContext
+from backend.app.services.chart import generate_chart, context_chart_id, render_chart, lttb, bucket_bars, chart_data
+from backend.app.services.chart_store import ChartStore, chart_id, media_type
+from backend.app.services.fetch_data import get_ohlcv, get_ohlcv_many, trim_to_days
+from backend.app.services.indicator_state import update_indicators, load_state
+from backend.app.services.indicators import (
+    calculate_ema, calculate_rsi, calculate_macd, find_support_resistance, compute_indicators,
+    align_frames, compute_indicators_many, indicators_from_row, ema_cross, INDICATOR_FIELDS
+)
+from backend.app.services.llm import format_data_for_llm
+from backend.app.services.llm_gateway import LLMGateway, LLMBusy
+from backend.app.services.llm_usage import UsageLog
+from backend.app.services.market_data import LocalProvider
+from backend.app.services.ohlcv_cache import OHLCVCache, ohlcv_cache
 from backend.app.services.quota import decrement_quota
+from backend.app.services.report_cache import ReportCache, report_key
+from backend.app.services.report_similarity import SimilarityCache, patch_report
+from backend.app.services.screener import build_table, screen
+
 
 class TestIndicators(unittest.TestCase):
     def setUp(self):
@@ -47,10 +84,153 @@ class TestIndicators(unittest.TestCase):
     def test_support_resistance(self):
         levels = find_support_resistance(self.df)
         self.assertIsNotNone(levels['support'])
+        for zone in levels['support_levels']:
+            self.assertLess(zone['price'], self.df['close'].iloc[-1])
+            self.assertGreaterEqual(zone['touches'], 1)
         self.assertIsNotNone(levels['resistance'])
         # Resistance should generally be higher than support
         self.assertTrue(levels['resistance'] >= levels['support'])
 
+class TestIndicatorKernel(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.02, 180)))
+        self.df = pd.DataFrame({
+            'close': close,
+            'high': close * 1.01,
+            'low': close * 0.99,
+            'volume': rng.integers(1000, 5000, 180).astype(float)
+        })
+
+    def assert_matches_pandas(self, result, df):
+        macd_data = calculate_macd(df)
+        levels = find_support_resistance(df)
+        np.testing.assert_allclose(result['ema20'], calculate_ema(df, 20).iloc[-1], rtol=1e-9)
+        np.testing.assert_allclose(result['ema50'], calculate_ema(df, 50).iloc[-1], rtol=1e-9)
+        np.testing.assert_allclose(result['rsi'], calculate_rsi(df).iloc[-1], rtol=1e-9)
+        np.testing.assert_allclose(result['macd'], macd_data['macd'].iloc[-1], rtol=1e-7, atol=1e-9)
+        np.testing.assert_allclose(result['macd_signal'], macd_data['signal'].iloc[-1], rtol=1e-7, atol=1e-9)
+        np.testing.assert_allclose(result['support'], levels['support'], rtol=1e-12)
+        np.testing.assert_allclose(result['resistance'], levels['resistance'], rtol=1e-12)
+
+    def test_matches_pandas(self):
+        result = indicator_kernel.compute_kernel(
+            self.df['close'].values, self.df['high'].values, self.df['low'].values, series=True
+        )
+        self.assert_matches_pandas(result, self.df)
+        np.testing.assert_allclose(
+            result['rsi_series'], calculate_rsi(self.df).values, rtol=1e-9, equal_nan=True
+        )
+
+    def test_padded_rows_match_shorter_frames(self):
+        lengths = [180, 90, 35]
+        close = np.full((3, 180), np.nan)
+        high, low = close.copy(), close.copy()
+        for i, n in enumerate(lengths):
+            close[i, -n:] = self.df['close'].values[-n:]
+            high[i, -n:] = self.df['high'].values[-n:]
+            low[i, -n:] = self.df['low'].values[-n:]
+
+        result = indicator_kernel.compute_kernel(close, high, low)
+        for i, n in enumerate(lengths):
+            row = {name: values[i] for name, values in result.items()}
+            self.assert_matches_pandas(row, self.df.tail(n).reset_index(drop=True))
+
+    def test_wilder_rsi(self):
+        close = self.df['close'].values
+        delta = np.diff(close)
+        gains, losses = np.maximum(delta, 0), np.maximum(-delta, 0)
+        avg_gain, avg_loss = gains[:14].mean(), losses[:14].mean()
+        for g, l in zip(gains[14:], losses[14:]):
+            avg_gain = (avg_gain * 13 + g) / 14
+            avg_loss = (avg_loss * 13 + l) / 14
+        expected = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        rsi = indicator_kernel.rsi(close, wilder=True)[0]
+        np.testing.assert_allclose(rsi[-1], expected, rtol=1e-9)
+        self.assertTrue(np.isnan(rsi[13]))
+        self.assertFalse(np.isnan(rsi[14]))
+
+    def test_rolling_extreme(self):
+        x = np.random.default_rng(3).normal(size=(3, 50))
+        for window in (1, 4, 7, 50):
+            windows = np.lib.stride_tricks.sliding_window_view(x, window, axis=1)
+            np.testing.assert_array_equal(indicator_kernel._rolling_extreme(x, window, np.maximum), windows.max(axis=-1))
+            np.testing.assert_array_equal(indicator_kernel._rolling_extreme(x, window, np.minimum), windows.min(axis=-1))
+
+    def test_pivot_levels_cluster_touches(self):
+        # Range-bound between ~100 and ~120, currently mid-range
+        t = np.arange(120)
+        close = 110 + 10 * np.sin(t * 2 * np.pi / 20) + np.random.default_rng(5).normal(0, 0.2, 120)
+        close[-1] = 110.0
+        levels = indicator_kernel.pivot_levels(close, close, close)
+
+        self.assertAlmostEqual(levels['support'][0], 100, delta=1.5)
+        self.assertAlmostEqual(levels['resistance'][0], 120, delta=1.5)
+        self.assertGreaterEqual(levels['support_touches'][0, 0], 5)
+        self.assertGreaterEqual(levels['resistance_touches'][0, 0], 5)
+
+    def test_pivot_levels_padded_rows_and_fallback(self):
+        close, high, low = (self.df[c].values for c in ('close', 'high', 'low'))
+        padded = np.full((2, 180), np.nan)
+        padded[0] = close
+        padded[1, -90:] = close[-90:]
+        result = indicator_kernel.pivot_levels(padded, np.where(np.isnan(padded), np.nan, np.r_[[high, high]]), np.where(np.isnan(padded), np.nan, np.r_[[low, low]]))
+        alone = indicator_kernel.pivot_levels(close[-90:], high[-90:], low[-90:])
+        for key, values in alone.items():
+            np.testing.assert_allclose(result[key][1], values[0], equal_nan=True)
+
+        # A straight rally has no swing highs above the close
+        rally = np.linspace(100, 200, 60)
+        levels = indicator_kernel.pivot_levels(rally, rally, rally)
+        self.assertTrue(np.isnan(levels['resistance_levels']).all())
+        self.assertAlmostEqual(levels['resistance'][0], 210.0)
+        self.assertAlmostEqual(levels['support'][0], rally[-40])
+
+    def test_compute_indicators_uses_kernel(self):
+        indicators = compute_indicators(self.df)
+        self.assertAlmostEqual(indicators.rsi, calculate_rsi(self.df).iloc[-1], places=6)
+        self.assertAlmostEqual(indicators.ema20, calculate_ema(self.df, 20).iloc[-1], places=6)
+        self.assertIsNone(compute_indicators(self.df.head(5)).rsi)
+
+
+class TestIndicatorBatch(unittest.TestCase):
+    def setUp(self):
+        end = date(2024, 6, 28)
+        self.frames = {
+            f"T{i}.JK": LocalProvider.synthetic_history(f"T{i}.JK", end).tail(n).reset_index(drop=True)
+            for i, n in enumerate([180, 120, 40, 5])
+        }
+
+    def test_rows_match_compute_indicators(self):
+        table = compute_indicators_many(self.frames)
+        self.assertEqual(list(table.index), list(self.frames))
+        for ticker, df in self.frames.items():
+            expected = compute_indicators(df).model_dump()
+            actual = indicators_from_row(table.loc[ticker]).model_dump()
+            for field in INDICATOR_FIELDS:
+                value = expected[field]
+                if value is None:
+                    self.assertIsNone(actual[field], f"{ticker} {field}")
+                else:
+                    self.assertAlmostEqual(actual[field], value, delta=abs(value) * 1e-9 + 1e-9, msg=f"{ticker} {field}")
+
+    def test_align_carries_close_over_missing_dates(self):
+        frames = dict(self.frames)
+        frames["T0.JK"] = frames["T0.JK"].drop(index=[100, 101]).reset_index(drop=True)
+        tickers, dates, arrays = align_frames(frames)
+        self.assertEqual(len(dates), 180)
+        self.assertEqual(str(dates.tz), "Asia/Jakarta")
+        row = tickers.index("T0.JK")
+        carried = frames["T0.JK"]['close'].iloc[99]
+        np.testing.assert_array_equal(arrays['close'][row, 100:102], [carried, carried])
+        self.assertTrue(np.isnan(arrays['volume'][row, 100:102]).all())
+        self.assertTrue(np.isnan(arrays['close'][tickers.index("T3.JK"), :-5]).all())
+
+    def test_empty(self):
+        self.assertTrue(compute_indicators_many({}).empty)
+
+
 class TestQuotaService(unittest.IsolatedAsyncioTestCase):
     @patch('backend.app.services.quota.engine')
     async def test_decrement_quota_success(self, mock_engine):
@@ -82,5 +262,1153 @@ class TestQuotaService(unittest.IsolatedAsyncioTestCase):
         success = await decrement_quota("user123")
         self.assertFalse(success)
 
+def make_history(start, periods):
+    """Build a yfinance-style history frame (capitalized columns, Date index)"""
+    dates = pd.date_range(start=start, periods=periods, freq='B', tz='Asia/Jakarta', name='Date')
+    prices = np.linspace(100, 200, periods)
+    return pd.DataFrame({
+        'Open': prices,
+        'High': prices + 5,
+        'Low': prices - 5,
+        'Close': prices,
+        'Volume': np.full(periods, 1000.0),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0
+    }, index=dates)
+
+
+class TestOHLCVStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch.object(ohlcv_store, 'STORE_DIR', Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        ohlcv_cache.clear()
+        self.addCleanup(ohlcv_cache.clear)
+
+    @patch('backend.app.services.market_data.yf.Ticker')
+    async def test_incremental_fetch_appends_new_bars(self, mock_ticker):
+        history = make_history('2024-01-01', 130)
+        mock_ticker.return_value.history.return_value = history.iloc[:120]
+
+        df = await get_ohlcv("BBCA")
+        self.assertEqual(len(df), 120)
+        mock_ticker.return_value.history.assert_called_with(period="6mo")
+
+        # Provider returns the last stored (possibly partial) bar plus 10 new ones
+        mock_ticker.return_value.history.return_value = history.iloc[119:]
+        ohlcv_cache.clear()
+        df = await get_ohlcv("BBCA")
+
+        # Starts at the last completed bar, overlapping the possibly partial one
+        start = mock_ticker.return_value.history.call_args.kwargs['start']
+        self.assertEqual(start, history.index[118].strftime('%Y-%m-%d'))
+        self.assertEqual(len(df), 130)
+        self.assertListEqual(list(df.columns), ['date', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(df['date'].iloc[-1], history.index[-1])
+        self.assertTrue(df['date'].is_monotonic_increasing)
+
+        # Months later the store holds more than 6 months; the window stays 6 calendar months
+        mock_ticker.return_value.history.return_value = make_history(history.index[129], 60)
+        ohlcv_cache.clear()
+        df = await get_ohlcv("BBCA")
+        self.assertEqual(len(ohlcv_store.load_bars("BBCA.JK")), 189)
+        span = df['date'].iloc[-1] - df['date'].iloc[0]
+        self.assertLessEqual(span, pd.Timedelta(days=182))
+        self.assertGreater(span, pd.Timedelta(days=175))
+
+    @patch('backend.app.services.market_data.yf.Ticker')
+    async def test_provider_error_serves_stored_bars(self, mock_ticker):
+        history = make_history('2024-01-01', 120)
+        mock_ticker.return_value.history.return_value = history
+        await get_ohlcv("BBCA")
+
+        mock_ticker.return_value.history.side_effect = ConnectionError("provider down")
+        ohlcv_cache.clear()
+        df = await get_ohlcv("BBCA")
+        self.assertEqual(len(df), 120)
+        self.assertEqual(df['date'].iloc[-1], history.index[-1])
+
+    @patch('backend.app.services.market_data.yf.Ticker')
+    async def test_adjusted_history_is_backfilled(self, mock_ticker):
+        history = make_history('2024-01-01', 130)
+        mock_ticker.return_value.history.return_value = history.iloc[:120]
+        await get_ohlcv("BBCA")
+
+        # A 2:1 split: the provider now returns every price halved, overlap bar included
+        adjusted = history.copy()
+        adjusted[['Open', 'High', 'Low', 'Close']] /= 2
+        mock_ticker.return_value.history.side_effect = lambda start=None, period=None: \
+            adjusted.iloc[118:] if start is not None else adjusted
+        ohlcv_cache.clear()
+        df = await get_ohlcv("BBCA")
+
+        mock_ticker.return_value.history.assert_called_with(period="6mo")
+        self.assertEqual(len(df), 130)
+        np.testing.assert_allclose(df['close'].to_numpy(), adjusted['Close'].to_numpy())
+
+        # A revised partial last bar alone is not an adjustment
+        self.assertFalse(ohlcv_store.history_adjusted(
+            ohlcv_store.load_bars("BBCA.JK"), adjusted.iloc[129:].reset_index().rename(columns=str.lower).assign(close=1.0)
+        ))
+
+    @patch('backend.app.services.market_data.yf.download')
+    async def test_batch_fetch_splits_per_symbol(self, mock_download):
+        history = make_history('2024-01-01', 120)
+        mock_download.return_value = pd.concat({'BBCA.JK': history, 'TLKM.JK': history * 2}, axis=1)
+
+        frames = await get_ohlcv_many(["BBCA", "TLKM", "XXXX"])
+
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(sorted(frames), ["BBCA", "TLKM"])
+        self.assertListEqual(list(frames["TLKM"].columns), ['date', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertAlmostEqual(frames["TLKM"]['close'].iloc[-1], history['Close'].iloc[-1] * 2)
+        self.assertTrue(ohlcv_store.covers_period("BBCA.JK", "6mo"))
+
+        # Served from cache on the next call
+        frames = await get_ohlcv_many(["BBCA"])
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(len(frames["BBCA"]), 120)
+
+    def test_merge_replaces_partial_last_bar(self):
+        history = make_history('2024-01-01', 5).reset_index()
+        history.columns = history.columns.str.lower()
+        ohlcv_store.merge_bars("TLKM.JK", history, period="6mo")
+
+        revised = history.tail(1).copy()
+        revised['close'] = 999.0
+        bars = ohlcv_store.merge_bars("TLKM.JK", revised)
+
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(bars['close'][-1], 999.0)
+        self.assertTrue(ohlcv_store.covers_period("TLKM.JK", "6mo"))
+        self.assertFalse(ohlcv_store.covers_period("TLKM.JK", "1y"))
+
+class TestLocalProvider(unittest.IsolatedAsyncioTestCase):
+    def test_synthetic_history_is_stable(self):
+        today = LocalProvider.synthetic_history("BBCA.JK", date(2026, 3, 6))
+        later = LocalProvider.synthetic_history("BBCA.JK", date(2026, 3, 13))
+        other = LocalProvider.synthetic_history("BBRI.JK", date(2026, 3, 6))
+
+        self.assertListEqual(list(today.columns), ['date', 'open', 'high', 'low', 'close', 'volume'])
+        pd.testing.assert_frame_equal(today, later.iloc[:len(today)])
+        self.assertFalse(today['close'].equals(other['close']))
+        self.assertTrue((today['high'] >= today[['open', 'close']].max(axis=1)).all())
+        self.assertTrue((today['low'] <= today[['open', 'close']].min(axis=1)).all())
+
+    def test_reads_csv_fixture(self):
+        with tempfile.TemporaryDirectory() as fixtures:
+            pd.DataFrame({
+                'Date': ['2026-01-05', '2026-01-06'],
+                'Open': [1, 2], 'High': [1, 2], 'Low': [1, 2], 'Close': [1, 2], 'Volume': [5, 6]
+            }).to_csv(Path(fixtures) / "BBCA.csv", index=False)
+
+            df = LocalProvider(fixtures).history("BBCA.JK", start="2026-01-06")
+            self.assertEqual(len(df), 1)
+            self.assertEqual(df['close'].iloc[0], 2)
+            self.assertEqual(str(df['date'].dt.tz), 'Asia/Jakarta')
+
+    async def test_get_ohlcv_offline(self):
+        with tempfile.TemporaryDirectory() as store_dir, \
+                patch.object(ohlcv_store, 'STORE_DIR', Path(store_dir)), \
+                patch('backend.app.services.fetch_data.get_provider', return_value=LocalProvider()):
+            ohlcv_cache.clear()
+            df = await get_ohlcv("ANYTICKER")
+            ohlcv_cache.clear()
+        self.assertGreater(len(df), 100)
+        self.assertLessEqual(len(df), 180)
+
+
+class TestIndicatorState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch.object(ohlcv_store, 'STORE_DIR', Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(200).reset_index(drop=True)
+
+    def assertMatches(self, actual, expected, places=7):
+        for field, value in expected.model_dump().items():
+            if isinstance(value, list):
+                levels = getattr(actual, field)
+                self.assertEqual([level.touches for level in levels], [level['touches'] for level in value], field)
+                for level, expected_level in zip(levels, value):
+                    self.assertAlmostEqual(level.price, expected_level['price'], places=places, msg=field)
+            elif value is None:
+                self.assertIsNone(getattr(actual, field), field)
+            else:
+                self.assertAlmostEqual(getattr(actual, field), value, places=places, msg=field)
+
+    def test_incremental_update_matches_full_compute(self):
+        update_indicators("BBCA.JK", self.df.iloc[:150], days=180)
+        indicators = update_indicators("BBCA.JK", self.df.iloc[:170], days=180)
+        self.assertMatches(indicators, compute_indicators(self.df.iloc[:170]))
+
+        state = load_state("BBCA.JK", days=180)
+        self.assertEqual(state.pending[0], pd.Timestamp(self.df['date'].iloc[169]).value)
+
+    def test_partial_bar_is_revised(self):
+        update_indicators("BBCA.JK", self.df.iloc[:100], days=180)
+        revised = self.df.iloc[:100].copy()
+        revised.loc[99, 'close'] *= 1.03
+        indicators = update_indicators("BBCA.JK", revised, days=180)
+        self.assertMatches(indicators, compute_indicators(revised))
+
+    def test_gap_rebuilds_state(self):
+        update_indicators("BBCA.JK", self.df.iloc[:50], days=180)
+        later = self.df.iloc[120:].reset_index(drop=True)
+        indicators = update_indicators("BBCA.JK", later, days=180)
+        self.assertMatches(indicators, compute_indicators(later))
+
+    def test_windowed_values_follow_the_frame(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(400).reset_index(drop=True)
+        # Calendar-cut frames (about 125 bars) sliding one bar at a time, as served by get_ohlcv
+        for end in range(200, 401, 5):
+            frame = trim_to_days(df.iloc[:end], 180)
+            indicators = update_indicators("BBCA.JK", frame, days=180)
+        self.assertLess(len(frame), 179)
+
+        expected = compute_indicators(frame)
+        # EMAs span the whole history and only differ by their seed
+        recursive = ('ema20', 'ema50', 'macd', 'macd_signal', 'macd_histogram')
+        for field in recursive:
+            self.assertAlmostEqual(getattr(indicators, field), getattr(expected, field), delta=expected.current_price * 5e-3)
+        self.assertMatches(indicators, expected.model_copy(update={field: getattr(indicators, field) for field in recursive}))
+
+    @patch('backend.app.services.market_data.yf.Ticker')
+    def test_readjusted_history_rebuilds_state(self, mock_ticker):
+        history = self.df.set_index(pd.DatetimeIndex(self.df['date'], name='Date'))[['open', 'high', 'low', 'close', 'volume']]
+        history = history.rename(columns=str.capitalize)
+        mock_ticker.return_value.history.return_value = history.iloc[:150]
+        self.addCleanup(ohlcv_cache.clear)
+        ohlcv_cache.clear()
+        update_indicators("BBCA.JK", asyncio.run(get_ohlcv("BBCA")))
+
+        # A 1:5 split: every earlier price is divided by five, overlap bars included
+        adjusted = history.copy()
+        adjusted[['Open', 'High', 'Low', 'Close']] /= 5
+        mock_ticker.return_value.history.side_effect = lambda start=None, period=None: \
+            adjusted.loc[start:].iloc[:12] if start is not None else adjusted.iloc[:160]
+        ohlcv_cache.clear()
+        df = asyncio.run(get_ohlcv("BBCA"))
+        mock_ticker.return_value.history.assert_called_with(period="6mo")
+
+        self.assertMatches(update_indicators("BBCA.JK", df), compute_indicators(df))
+
+    def test_unchanged_frame_skips_write(self):
+        update_indicators("BBCA.JK", self.df, days=180)
+        with patch.object(ohlcv_store, 'save_json') as save:
+            update_indicators("BBCA.JK", self.df, days=180)
+        save.assert_not_called()
+
+    def test_sliding_window(self):
+        update_indicators("BBCA.JK", self.df.iloc[:180], days=180)
+        indicators = update_indicators("BBCA.JK", self.df.iloc[10:190], days=180)
+        expected = compute_indicators(self.df.iloc[10:190])
+        # Windowed values are exact; EMAs span the whole history and only differ by their seed
+        self.assertAlmostEqual(indicators.rsi, expected.rsi, places=7)
+        self.assertAlmostEqual(indicators.support, expected.support, places=7)
+        self.assertAlmostEqual(indicators.volume_avg, expected.volume_avg, places=7)
+        self.assertAlmostEqual(indicators.ema20, expected.ema20, delta=expected.ema20 * 1e-3)
+
+
+class TestScreener(unittest.TestCase):
+    def setUp(self):
+        end = date(2024, 6, 28)
+        self.frames = {
+            ticker: LocalProvider.synthetic_history(ticker, end).tail(180).reset_index(drop=True)
+            for ticker in ["BBCA", "BBRI", "TLKM", "ASII", "GOTO", "UNVR"]
+        }
+        self.table, self.as_of = build_table(self.frames)
+
+    def test_build_table(self):
+        self.assertEqual(self.as_of, "2024-06-28")
+        self.assertEqual(list(self.table.index), list(self.frames))
+        df = self.frames["BBCA"]
+        row = self.table.loc["BBCA"]
+        self.assertAlmostEqual(row['volume_ratio'], df['volume'].iloc[-1] / df['volume'].mean())
+        expected = compute_indicators(df)
+        self.assertAlmostEqual(row['support_distance'], (expected.current_price - expected.support) / expected.current_price * 100)
+
+        spread = (calculate_ema(df, 20) - calculate_ema(df, 50)).values[-4:]
+        expected_cross = 1.0 if spread[-1] > 0 and spread[:-1].min() <= 0 else -1.0 if spread[-1] < 0 and spread[:-1].max() >= 0 else 0.0
+        self.assertEqual(row['ema_cross'], expected_cross)
+
+    def test_ema_cross_reuses_kernel_series(self):
+        with patch.object(indicator_kernel, 'ema', wraps=indicator_kernel.ema) as ema:
+            table, _ = build_table(self.frames)
+        spans = [call.args[1] for call in ema.call_args_list]
+        self.assertEqual((spans.count(20), spans.count(50)), (1, 1))
+        np.testing.assert_array_equal(table['ema_cross'], self.table['ema_cross'])
+
+    def test_ema_cross(self):
+        spread = np.array([
+            [-1.0, -0.5, 0.2, 0.4],
+            [1.0, 0.5, -0.2, -0.4],
+            [1.0, 0.8, 0.5, 0.2],
+            [np.nan, np.nan, np.nan, np.nan],
+            [np.nan, np.nan, -0.1, 0.3],
+        ])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            np.testing.assert_array_equal(ema_cross(spread, 3), [1.0, -1.0, 0.0, 0.0, 1.0])
+            np.testing.assert_array_equal(ema_cross(spread[:, -1:], 3), np.zeros(5))
+
+    def test_filters_and_ranking(self):
+        result = screen(self.table, ScreenRequest(rsi_min=40, trend="bullish", sort_by="rsi", order="asc"))
+        expected = self.table[(self.table['rsi'] >= 40) & (self.table['ema20'] > self.table['ema50'])]
+        self.assertEqual(sorted(result.index), sorted(expected.index))
+        self.assertTrue(result['rsi'].is_monotonic_increasing)
+
+        self.assertEqual(len(screen(self.table, ScreenRequest())), len(self.table))
+        self.assertTrue(screen(self.table, ScreenRequest(volume_ratio_min=1e9)).empty)
+
+    def test_missing_values_are_filtered_out(self):
+        short = dict(self.frames, NEWS=self.frames["BBCA"].tail(10).reset_index(drop=True))
+        table, _ = build_table(short)
+        self.assertTrue(np.isnan(table.loc["NEWS", 'price_change_30d']))
+        self.assertNotIn("NEWS", screen(table, ScreenRequest(change_30d_min=-1000)).index)
+        self.assertEqual(screen(table, ScreenRequest(sort_by="price_change_30d")).index[-1], "NEWS")
+
+
+class TestIndicatorRegistry(unittest.TestCase):
+    def setUp(self):
+        self.df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        self.inputs = {column: self.df[column].to_numpy(dtype=np.float64) for column in ['close', 'high', 'low', 'volume']}
+
+    def evaluate(self, *names):
+        return indicator_registry.evaluate(dict(self.inputs), names)
+
+    def test_bollinger_matches_pandas(self):
+        bands = self.evaluate('bollinger')['bollinger']
+        middle = self.df['close'].rolling(20).mean()
+        std = self.df['close'].rolling(20).std(ddof=0)
+        np.testing.assert_allclose(bands['bb_middle'][0], middle, rtol=1e-9)
+        np.testing.assert_allclose(bands['bb_upper'][0], middle + 2 * std, rtol=1e-9)
+        np.testing.assert_allclose(bands['bb_lower'][0], middle - 2 * std, rtol=1e-9)
+
+    def test_atr_matches_wilder_loop(self):
+        atr = self.evaluate('atr')['atr'][0]
+        high, low, close = self.inputs['high'], self.inputs['low'], self.inputs['close']
+        tr = [high[0] - low[0]] + [
+            max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1])) for i in range(1, len(close))
+        ]
+        expected = np.full(len(close), np.nan)
+        expected[13] = np.mean(tr[:14])
+        for i in range(14, len(close)):
+            expected[i] = (expected[i - 1] * 13 + tr[i]) / 14
+        np.testing.assert_allclose(atr, expected, rtol=1e-9)
+
+    def test_stochastic_and_obv_match_pandas(self):
+        values = self.evaluate('stochastic', 'obv')
+        highest = self.df['high'].rolling(14).max()
+        lowest = self.df['low'].rolling(14).min()
+        k = 100 * (self.df['close'] - lowest) / (highest - lowest)
+        np.testing.assert_allclose(values['stochastic']['stoch_k'][0], k, rtol=1e-9)
+        np.testing.assert_allclose(values['stochastic']['stoch_d'][0], k.rolling(3).mean(), rtol=1e-9)
+
+        direction = np.sign(self.df['close'].diff()).fillna(0)
+        np.testing.assert_allclose(values['obv'][0], (direction * self.df['volume']).cumsum(), rtol=1e-9)
+
+    def test_shared_dependency_computed_once(self):
+        calls = []
+        original = indicator_registry.REGISTRY['true_range']
+        counted = indicator_registry.Indicator(
+            original.name, lambda *args: calls.append(1) or original.fn(*args),
+            original.depends, original.outputs, original.extra
+        )
+        with patch.dict(indicator_registry.REGISTRY, {'true_range': counted}):
+            values = self.evaluate('atr', 'adx')
+        self.assertEqual(len(calls), 1)
+        self.assertNotIn('bollinger', values)
+        adx = values['adx']['adx'][0]
+        self.assertTrue(np.all((adx[~np.isnan(adx)] >= 0) & (adx[~np.isnan(adx)] <= 100)))
+
+    def test_unknown_and_cycle_raise(self):
+        with self.assertRaises(ValueError):
+            self.evaluate('ichimoku')
+        cycle = {
+            'a': indicator_registry.Indicator('a', lambda b: b, ('b',), ('a',), True),
+            'b': indicator_registry.Indicator('b', lambda a: a, ('a',), ('b',), True),
+        }
+        with patch.dict(indicator_registry.REGISTRY, cycle):
+            with self.assertRaises(ValueError):
+                self.evaluate('a')
+
+    def test_padded_rows_match_single_ticker(self):
+        frames = {"BBCA": self.df, "TLKM": self.df.tail(120).reset_index(drop=True)}
+        table = compute_indicators_many(frames, extras=indicator_registry.available())
+        for ticker, frame in frames.items():
+            single = compute_indicators(frame, extras=indicator_registry.available())
+            for field in indicator_registry.extra_fields():
+                self.assertAlmostEqual(table.loc[ticker, field], getattr(single, field), places=6, msg=f"{ticker} {field}")
+
+    def test_compute_indicators_extras(self):
+        plain = compute_indicators(self.df)
+        self.assertTrue(all(getattr(plain, field) is None for field in indicator_registry.extra_fields()))
+
+        extended = compute_indicators(self.df, extras=['bollinger', 'vwap'])
+        self.assertIsNotNone(extended.bb_upper)
+        self.assertIsNotNone(extended.vwap)
+        self.assertIsNone(extended.atr)
+        self.assertEqual(extended.model_copy(update={'bb_upper': None, 'bb_middle': None, 'bb_lower': None, 'vwap': None}), plain)
+
+        context = AnalysisContext("BBCA", self.df)
+        self.assertEqual(context.with_extras(['bollinger', 'vwap']), extended)
+
+
+class TestTimeframes(unittest.TestCase):
+    def setUp(self):
+        self.df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(490).reset_index(drop=True)
+
+    def expected(self, freq):
+        grouped = self.df.groupby(self.df['date'].dt.tz_localize(None).dt.to_period(freq))
+        return grouped.agg(
+            date=('date', 'last'), open=('open', 'first'), high=('high', 'max'),
+            low=('low', 'min'), close=('close', 'last'), volume=('volume', 'sum')
+        ).reset_index(drop=True)
+
+    def test_resample_matches_pandas(self):
+        for interval, freq in (("1wk", "W-SUN"), ("1mo", "M")):
+            pd.testing.assert_frame_equal(timeframes.resample(self.df, interval), self.expected(freq), check_dtype=False)
+        self.assertIs(timeframes.resample(self.df, "1d"), self.df)
+
+    def test_partial_last_period(self):
+        # 2024-06-28 is a Friday: the last week ends there, the last month is June
+        weekly = timeframes.resample(self.df, "1wk")
+        self.assertEqual(weekly['date'].iloc[-1], self.df['date'].iloc[-1])
+        self.assertEqual(weekly['close'].iloc[-1], self.df['close'].iloc[-1])
+        self.assertTrue(weekly['date'].dt.dayofweek.iloc[:-1].le(4).all())
+
+    def test_compute_timeframes_and_prompt(self):
+        self.assertEqual(timeframes.intervals_up_to("1mo"), ["1d", "1wk", "1mo"])
+        result = timeframes.compute_timeframes(self.df, ["1wk", "1mo"])
+        self.assertEqual(result["1wk"], compute_indicators(timeframes.resample(self.df, "1wk")))
+        self.assertIsNotNone(result["1wk"].ema50)
+
+        context = AnalysisContext("BBCA", self.df.tail(180).reset_index(drop=True))
+        self.assertNotIn('timeframes', json.loads(format_data_for_llm(context)))
+        context.timeframes = result
+        data = json.loads(format_data_for_llm(context))
+        self.assertEqual(set(data['timeframes']), {"mingguan", "bulanan"})
+        self.assertEqual(data['timeframes']['mingguan']['RSI'], round(result["1wk"].rsi, 2))
+
+
+class TestChartStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = ChartStore(self.dir, max_bytes=250)
+
+    def test_put_get_and_reload(self):
+        chart = chart_id("BBCA", "2024-06-28", {"dpi": 150})
+        self.assertEqual(chart, chart_id("BBCA", "2024-06-28", {"dpi": 150}))
+        self.assertNotEqual(chart, chart_id("BBCA", "2024-06-28", {"dpi": 100}))
+        self.assertIsNone(self.store.get(chart))
+
+        self.store.put(chart, b"png")
+        self.assertTrue(self.store.exists(chart))
+        self.assertEqual(self.store.get(chart), b"png")
+        self.assertEqual(ChartStore(self.dir, max_bytes=250).get(chart), b"png")
+        self.assertIsNone(self.store.get("../../etc/passwd"))
+        with self.assertRaises(ValueError):
+            self.store.put("not-an-id", b"png")
+
+    def test_evicts_least_recently_used(self):
+        charts = [chart_id("T", i) for i in range(3)]
+        self.store.put(charts[0], b"a" * 100)
+        self.store.put(charts[1], b"b" * 100)
+        self.store.get(charts[0])
+        self.store.put(charts[2], b"c" * 100)
+
+        self.assertTrue(self.store.exists(charts[0]))
+        self.assertFalse(self.store.exists(charts[1]))
+        self.assertFalse(os.path.exists(self.store.path(charts[1])))
+        self.assertEqual(self.store.stats()["bytes"], 200)
+        self.assertEqual(self.store.stats()["evictions"], 1)
+
+    def test_memory_tier(self):
+        store = ChartStore(self.dir, max_bytes=1000, memory_bytes=150)
+        charts = [chart_id("T", i) for i in range(2)]
+        store.put(charts[0], b"a" * 100)
+        self.assertEqual(store.get(charts[0]), b"a" * 100)
+        store.put(charts[1], b"b" * 100)  # pushes charts[0] out of memory, not off disk
+
+        self.assertTrue(store.lookup(charts[1]))
+        self.assertTrue(store.lookup(charts[0]))
+        self.assertFalse(store.lookup(chart_id("T", 2)))
+        self.assertEqual(store.get(charts[0]), b"a" * 100)
+        stats = store.stats()
+        self.assertEqual((stats["memory_hits"], stats["disk_hits"], stats["misses"]), (2, 2, 1))
+        self.assertEqual(stats["memory_entries"], 1)
+
+    def test_sweep_enforces_disk_budget(self):
+        charts = [chart_id("T", i) for i in range(3)]
+        other = ChartStore(self.dir, max_bytes=10_000)
+        for i, chart in enumerate(charts):
+            other.put(chart, b"x" * 100)
+            os.utime(other.path(chart), (1000 + i, 1000 + i))
+        stale = Path(self.dir) / ".leftover.tmp"
+        stale.write_bytes(b"partial")
+        os.utime(stale, (1000, 1000))
+
+        self.assertEqual(self.store.sweep(), 2)
+        self.assertEqual(sorted(p.name for p in Path(self.dir).iterdir()), sorted(f"{c}.img" for c in charts[1:]))
+        self.assertEqual(self.store.stats()["bytes"], 200)
+
+    def test_sweep_does_not_block_readers(self):
+        store = ChartStore(self.dir, max_bytes=10_000, memory_bytes=10_000)
+        memory, disk = chart_id("MEM"), chart_id("DISK")
+        store.put(memory, b"m" * 10)
+        ChartStore(self.dir, max_bytes=10_000).put(disk, b"d" * 10)
+        scanning, release = threading.Event(), threading.Event()
+        scan = store._scan
+
+        def slow_scan():
+            scanning.set()
+            release.wait(5)
+            return scan()
+
+        with patch.object(store, "_scan", slow_scan):
+            sweeper = threading.Thread(target=store.sweep)
+            sweeper.start()
+            self.assertTrue(scanning.wait(5))
+            # Served while the sweep is still scanning the directory
+            results = []
+            reader = threading.Thread(target=lambda: results.extend(
+                [store.get(memory), store.get(disk), store.exists(disk)]
+            ))
+            reader.start()
+            reader.join(1)
+            self.assertFalse(reader.is_alive())
+            release.set()
+            sweeper.join(5)
+        self.assertEqual(results, [b"m" * 10, b"d" * 10, True])
+        self.assertEqual(store.stats()["sweeps"], 1)
+
+    def test_render_chart_skips_matplotlib_when_stored(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(60).reset_index(drop=True)
+        store = ChartStore(self.dir, max_bytes=1_000_000, memory_bytes=1_000_000)
+        render = AsyncMock(return_value=b"\x89PNG")
+
+        async def run():
+            with patch('backend.app.services.chart.chart_store', store), \
+                 patch('backend.app.services.chart.run_chart', render):
+                first = await render_chart(AnalysisContext("BBCA", df))
+                second = await render_chart(AnalysisContext("BBCA", df))
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+        render.assert_awaited_once()
+        self.assertEqual(store.get(first), b"\x89PNG")
+
+    def test_render_in_memory(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        context = AnalysisContext("BBCA", df)
+        png = generate_chart(context, "print")
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertEqual(Image.open(io.BytesIO(png)).size, (2800, 1600))
+        jpeg = generate_chart(context, "telegram")
+        self.assertEqual(media_type(jpeg), "image/jpeg")
+        self.assertEqual(Image.open(io.BytesIO(jpeg)).size, (1288, 736))
+        self.assertNotEqual(context_chart_id(context, "telegram"), context_chart_id(context, "web"))
+        self.assertEqual(context_chart_id(context), context_chart_id(AnalysisContext("bbca", df)))
+        self.assertNotEqual(context_chart_id(context), context_chart_id(AnalysisContext("BBCA", df.iloc[:-1])))
+
+    def test_lttb(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[:10] = np.nan
+        y[500] = 5.0  # spike must survive downsampling
+        keep = lttb(x, y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (10, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(500, keep)
+        np.testing.assert_array_equal(lttb(x[:50], y[:50], 100), np.arange(10, 50))
+
+    def test_candle_buckets(self):
+        np.testing.assert_array_equal(bucket_bars(180, 200), np.arange(180))
+        starts = bucket_bars(1001, 200)
+        self.assertLessEqual(len(starts), 200)
+        self.assertEqual(starts[0], 0)
+        self.assertEqual(len(set(np.diff(starts[1:]))), 1)  # equal buckets aligned to the last bar
+        self.assertEqual(starts[-1], 1001 - (starts[-1] - starts[-2]))
+
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(1000).reset_index(drop=True)
+        data = chart_data(AnalysisContext("BBCA", df), max_points=100)
+        self.assertEqual(len(data['x']), 100)
+        self.assertEqual(data['high'].max(), df['high'].max())
+        self.assertEqual(data['low'].min(), df['low'].min())
+        self.assertEqual(data['close'][-1], df['close'].iloc[-1])
+        self.assertEqual(data['open'][0], df['open'].iloc[0])
+        self.assertAlmostEqual(data['volume'].sum(), df['volume'].sum())
+        self.assertLessEqual(len(data['rsi'][0]), 100)
+
+    def test_template_reuse_is_stateless_and_thread_safe(self):
+        from concurrent.futures import ThreadPoolExecutor
+        contexts = [
+            AnalysisContext(ticker, LocalProvider.synthetic_history(f"{ticker}.JK", date(2024, 6, 28)).tail(bars).reset_index(drop=True))
+            for ticker, bars in (("BBCA", 180), ("TLKM", 40))
+        ]
+        first = [generate_chart(context) for context in contexts]
+        self.assertEqual([generate_chart(context) for context in contexts], first)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(list(pool.map(generate_chart, contexts * 2)), first * 2)
+
+
+class TestAnalysisContext(unittest.TestCase):
+    def setUp(self):
+        self.df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+
+    def test_series_and_indicators_match(self):
+        context = AnalysisContext("BBCA", self.df)
+        np.testing.assert_allclose(context.series('ema20'), calculate_ema(self.df, 20).values, rtol=1e-9)
+        np.testing.assert_allclose(context.series('ema50'), calculate_ema(self.df, 50).values, rtol=1e-9)
+        self.assertEqual(context.indicators, compute_indicators(self.df))
+
+    def test_kernel_runs_once(self):
+        context = AnalysisContext("BBCA", self.df)
+        with patch('backend.app.services.analysis_context.compute_kernel', wraps=indicator_kernel.compute_kernel) as kernel:
+            context.series('ema20')
+            context.series('ema50')
+            format_data_for_llm(context)
+        kernel.assert_called_once()
+
+    def test_seeded_indicators_and_pickle(self):
+        context = AnalysisContext("BBCA", self.df)
+        seeded = compute_indicators(self.df.tail(100))
+        context.indicators = seeded
+        data = json.loads(format_data_for_llm(context))
+        self.assertEqual(data['indicators']['RSI'], round(seeded.rsi, 2))
+        self.assertEqual(data['price']['highest_180d'], float(self.df['high'].max()))
+        self.assertEqual(data['volume']['current'], float(self.df['volume'].iloc[-1]))
+
+        context.series('ema20')
+        restored = pickle.loads(pickle.dumps(context))
+        self.assertIn('kernel', vars(restored))
+        np.testing.assert_array_equal(restored.series('ema20'), context.series('ema20'))
+
+
+class TestMarketCalendar(unittest.TestCase):
+    def wib(self, *args):
+        return market_calendar.MARKET_TZ.localize(datetime(*args))
+
+    def test_session_ttl(self):
+        moment = self.wib(2026, 3, 4, 10, 0)  # Wednesday
+        self.assertTrue(market_calendar.is_session_open(moment))
+        self.assertEqual(market_calendar.data_expiry(moment, 60), moment + timedelta(seconds=60))
+
+    def test_bar_settles_after_close(self):
+        # Post-trading and the delayed feed can still change the bar just after 16:00
+        moment = self.wib(2026, 3, 4, 16, 10)
+        self.assertFalse(market_calendar.is_session_open(moment))
+        self.assertEqual(market_calendar.data_expiry(moment, 60), moment + timedelta(seconds=60))
+        evening = self.wib(2026, 3, 4, 16, 30)
+        self.assertEqual(market_calendar.data_expiry(evening, 60), self.wib(2026, 3, 5, 9, 0))
+
+    def test_weekend_valid_until_monday_open(self):
+        saturday = self.wib(2026, 3, 7, 11, 0)
+        self.assertEqual(market_calendar.data_expiry(saturday), self.wib(2026, 3, 9, 9, 0))
+
+    def test_holiday_skipped(self):
+        evening = self.wib(2026, 8, 14, 17, 0)  # Friday; Monday Aug 17 is a holiday
+        self.assertEqual(market_calendar.next_open(evening), self.wib(2026, 8, 18, 9, 0))
+
+
+class TestOHLCVCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.frame = pd.DataFrame({'close': np.arange(100, dtype=float)})
+        self.size = int(self.frame.memory_usage(index=True, deep=True).sum())
+        self.moment = market_calendar.MARKET_TZ.localize(datetime(2026, 3, 4, 10, 0))
+
+    def test_lru_eviction_by_size(self):
+        cache = OHLCVCache(max_bytes=self.size * 2)
+        cache.put("A", self.frame, now=self.moment)
+        cache.put("B", self.frame, now=self.moment)
+        cache.get("A", now=self.moment)
+        cache.put("C", self.frame, now=self.moment)
+        self.assertIsNotNone(cache.get("A", now=self.moment))
+        self.assertIsNone(cache.get("B", now=self.moment))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    async def test_stale_while_revalidate(self):
+        cache = OHLCVCache(max_bytes=self.size * 4, session_ttl=60, max_stale=600)
+        cache.put("A", self.frame, now=self.moment)
+
+        frame, fresh = cache.get("A", now=self.moment + timedelta(seconds=120))
+        self.assertFalse(fresh)
+        self.assertIs(frame, self.frame)
+
+        refreshed = self.frame + 1
+        loader = AsyncMock(return_value=refreshed)
+        cache.revalidate("A", loader)
+        cache.revalidate("A", loader)
+        await asyncio.gather(*cache._tasks)
+        loader.assert_awaited_once()
+        self.assertIs(cache.get("A")[0], refreshed)
+
+        self.assertIsNone(cache.get("A", now=self.moment + timedelta(days=3650)))
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "report"
+
+        results = await asyncio.gather(*[flight.do("GOTO", work) for _ in range(5)])
+        self.assertEqual(results, ["report"] * 5)
+        self.assertEqual(calls, 1)
+        stats = flight.stats()
+        self.assertEqual(stats["executions"], 1)
+        self.assertEqual(stats["coalesced"], 4)
+        self.assertEqual(stats["callers_per_execution"], {"5": 1})
+
+        # Once finished, the next call runs again
+        await flight.do("GOTO", work)
+        self.assertEqual(calls, 2)
+
+    async def test_errors_reach_every_caller(self):
+        flight = SingleFlight("test-errors")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        results = await asyncio.gather(flight.do("X", fail), flight.do("X", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.stats()["executions"], 1)
+
+    async def test_stream_fans_chunks_out(self):
+        flight = SingleFlight("test-stream")
+        calls = 0
+
+        async def chunks():
+            nonlocal calls
+            calls += 1
+            for text in ("a", "b", "c"):
+                await asyncio.sleep(0.01)
+                yield text
+
+        async def read():
+            return [chunk async for chunk in flight.stream("K", chunks, join="".join)]
+
+        async def late():
+            await asyncio.sleep(0.015)  # after the first chunk
+            return await read()
+
+        async def plain():
+            await asyncio.sleep(0.015)
+            return await flight.do("K", lambda: asyncio.sleep(0, "other"))
+
+        results = await asyncio.gather(read(), late(), plain())
+        self.assertEqual(results, [["a", "b", "c"], ["a", "b", "c"], "abc"])
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats()["callers_per_execution"], {"3": 1})
+
+        # A stream joining a do() execution gets its result as one chunk
+        async def report():
+            await asyncio.sleep(0.01)
+            return "abc"
+
+        results = await asyncio.gather(flight.do("K", report), read())
+        self.assertEqual(results, ["abc", ["abc"]])
+
+    async def test_stream_errors_reach_every_subscriber(self):
+        flight = SingleFlight("test-stream-errors")
+
+        async def chunks():
+            yield "a"
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        async def read():
+            return [chunk async for chunk in flight.stream("K", chunks, join="".join)]
+
+        results = await asyncio.gather(read(), read(), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.stats()["executions"], 1)
+
+class TestBoundedExecutor(unittest.IsolatedAsyncioTestCase):
+    async def test_queue_depth_reported(self):
+        executor = BoundedExecutor("test-io", max_workers=1)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+
+        tasks = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        self.assertEqual(stats["in_flight"], 3)
+        self.assertEqual(stats["queue_depth"], 2)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(executor.stats()["queue_depth"], 0)
+        self.assertEqual(executor.stats()["completed"], 3)
+
+class FakeGemini:
+    """Stands in for genai.Client.aio: counts concurrent calls, fails on demand"""
+
+    def __init__(self, delay=0.02, failures=()):
+        self.models = self
+        self.delay = delay
+        self.failures = list(failures)
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            return contents
+        finally:
+            self.running -= 1
+
+
+class TestLLMGateway(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_is_bounded(self):
+        fake = FakeGemini()
+        gateway = LLMGateway(max_concurrency=2, max_queue=10, queue_timeout=5, request_timeout=5, client=fake)
+        results = await asyncio.gather(*[gateway.generate("m", f"p{i}") for i in range(6)])
+        self.assertEqual(results, [f"p{i}" for i in range(6)])
+        self.assertEqual(fake.max_running, 2)
+        stats = gateway.stats()
+        self.assertEqual((stats["admitted"], stats["completed"], stats["active"], stats["waiting"]), (6, 6, 0, 0))
+        self.assertGreater(stats["queue_wait"]["max_ms"], 0)
+        self.assertGreater(stats["latency"]["p50_ms"], 0)
+
+    async def test_full_queue_rejects_immediately(self):
+        gateway = LLMGateway(max_concurrency=1, max_queue=1, queue_timeout=5, request_timeout=5, client=FakeGemini(delay=0.2))
+        tasks = [asyncio.create_task(gateway.generate("m", "p")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        with self.assertRaises(LLMBusy) as raised:
+            await gateway.generate("m", "p")
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        await asyncio.gather(*tasks)
+        self.assertEqual(gateway.stats()["rejected"], 1)
+
+    async def test_queue_wait_times_out(self):
+        gateway = LLMGateway(max_concurrency=1, max_queue=5, queue_timeout=0.05, request_timeout=5, client=FakeGemini(delay=0.3))
+        first = asyncio.create_task(gateway.generate("m", "p"))
+        await asyncio.sleep(0.01)
+        with self.assertRaises(LLMBusy):
+            await gateway.generate("m", "p")
+        await first
+        self.assertEqual(gateway.stats()["timed_out"], 1)
+
+    async def test_overload_is_retried(self):
+        fake = FakeGemini(delay=0, failures=[Exception("503 UNAVAILABLE"), Exception("503 UNAVAILABLE")])
+        gateway = LLMGateway(max_concurrency=1, max_queue=0, queue_timeout=1, request_timeout=1, retry_delay=0.01, client=fake)
+        self.assertEqual(await gateway.generate("m", "p"), "p")
+        self.assertEqual((fake.calls, gateway.stats()["retries"]), (3, 2))
+
+        fake.failures = [Exception("503 UNAVAILABLE")] * 3
+        with self.assertRaises(LLMBusy):
+            await gateway.generate("m", "p")
+
+        fake.failures = [ValueError("400 INVALID_ARGUMENT")]
+        with self.assertRaises(ValueError):
+            await gateway.generate("m", "p")
+        self.assertEqual(gateway.stats()["failed"], 2)
+
+    async def test_stream(self):
+        fake = StreamingGemini(["- Tren ", "", "bullish"])
+        gateway = LLMGateway(max_concurrency=1, max_queue=0, queue_timeout=1, request_timeout=1, retry_delay=0.01, client=fake)
+        self.assertEqual([chunk.text async for chunk in gateway.stream("m", "p")], ["- Tren ", "", "bullish"])
+
+        # Overload before the first chunk is retried, the slot is freed after early exit
+        fake.failures = [Exception("503 UNAVAILABLE")]
+        async with aclosing(gateway.stream("m", "p")) as chunks:
+            async for chunk in chunks:
+                break
+        self.assertEqual(chunk.text, "- Tren ")
+        stats = gateway.stats()
+        self.assertEqual((stats["retries"], stats["active"], stats["completed"]), (1, 0, 1))
+
+def sqlite_sessions():
+    """Session factory over a fresh in-memory SQLite database with the llm_reports and llm_calls tables"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[LLMReport.__table__, LLMCall.__table__])
+    return sessionmaker(bind=engine)
+
+
+class TestReportCache(unittest.IsolatedAsyncioTestCase):
+    def test_key_covers_every_input(self):
+        base = ("BBCA", date(2024, 6, 28), '{"rsi": 50}', "gemini", "v1")
+        keys = {
+            report_key(*base),
+            report_key("BBRI", *base[1:]),
+            report_key(base[0], date(2024, 7, 1), *base[2:]),
+            report_key(*base[:2], '{"rsi": 51}', *base[3:]),
+            report_key(*base[:3], "gemini-pro", base[4]),
+            report_key(*base[:4], "v2"),
+        }
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(report_key(*base), report_key("bbca", *base[1:]))
+
+    async def test_memory_and_database_tiers(self):
+        cache = ReportCache(ttl=3600, max_entries=10, session_factory=sqlite_sessions())
+        key = report_key("BBCA", date(2024, 6, 28), "data", "gemini", "v1")
+        self.assertIsNone(await cache.get(key))
+        await cache.put(key, "BBCA", date(2024, 6, 28), "gemini", "v1", "laporan")
+        self.assertEqual(await cache.get(key), "laporan")
+
+        # Another worker (or a restart) finds it in the database and promotes it
+        cache.clear_memory()
+        self.assertEqual(await cache.get(key), "laporan")
+        self.assertEqual(await cache.get(key), "laporan")
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["db_hits"], stats["memory_hits"]), (1, 1, 2))
+
+    async def test_expired_and_other_versions_are_dropped(self):
+        sessions = sqlite_sessions()
+        expired = ReportCache(ttl=-1, max_entries=10, session_factory=sessions)
+        old_key = report_key("BBCA", date(2024, 6, 28), "data", "gemini", "v1")
+        await expired.put(old_key, "BBCA", date(2024, 6, 28), "gemini", "v1", "kedaluwarsa")
+        self.assertIsNone(await expired.get(old_key))
+
+        cache = ReportCache(ttl=3600, max_entries=10, session_factory=sessions)
+        for version in ("v1", "v2"):
+            key = report_key("BBRI", date(2024, 6, 28), "data", "gemini", version)
+            await cache.put(key, "BBRI", date(2024, 6, 28), "gemini", version, version)
+        self.assertEqual(cache.purge("gemini", "v2"), 2)
+        with sessions() as db:
+            self.assertEqual([row.prompt_version for row in db.query(LLMReport)], ["v2"])
+
+    async def test_database_errors_are_misses(self):
+        def broken():
+            raise ConnectionError("database down")
+
+        cache = ReportCache(ttl=3600, max_entries=10, session_factory=broken)
+        self.assertIsNone(await cache.get("k" * 64))
+        await cache.put("k" * 64, "BBCA", date(2024, 6, 28), "gemini", "v1", "laporan")
+        self.assertEqual(await cache.get("k" * 64), "laporan")
+        self.assertEqual(cache.stats()["db_errors"], 1)  # database skipped after the first error
+
+    async def test_generate_report_reuses_cached_report(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        response = MagicMock(text=" laporan ")
+        with patch.object(llm, "report_cache", ReportCache(ttl=3600, max_entries=10)), \
+                patch.object(llm.settings, "REPORT_SIMILARITY", False), \
+                patch.object(llm.llm_gateway, "generate", new=AsyncMock(return_value=response)) as generate:
+            self.assertEqual(await llm.generate_report(AnalysisContext("BBCA", df)), "laporan")
+            self.assertEqual(await llm.generate_report(AnalysisContext("BBCA", df)), "laporan")
+            self.assertEqual(generate.await_count, 1)
+
+            with patch.object(llm, "PROMPT_VERSION", "edited"):
+                await llm.generate_report(AnalysisContext("BBCA", df))
+            self.assertEqual(generate.await_count, 2)
+
+    async def test_stream_report_caches_full_report(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        cache = ReportCache(ttl=3600, max_entries=10)
+        with patch.object(llm, "report_cache", cache), \
+                patch.object(llm.settings, "REPORT_SIMILARITY", False), \
+                patch.object(llm.llm_gateway, "_client", StreamingGemini(["- Tren ", "bullish "])):
+            chunks = [text async for text in llm.stream_report(AnalysisContext("BBCA", df))]
+            self.assertEqual(chunks, ["- Tren ", "bullish "])
+            # Served whole from the cache the second time
+            chunks = [text async for text in llm.stream_report(AnalysisContext("BBCA", df))]
+            self.assertEqual(chunks, ["- Tren bullish"])
+
+    async def test_empty_reports_are_not_cached(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        cache = ReportCache(ttl=3600, max_entries=10)
+        with patch.object(llm, "report_cache", cache), \
+                patch.object(llm.settings, "REPORT_SIMILARITY", False):
+            for text in (None, "  "):
+                with patch.object(llm.llm_gateway, "generate", new=AsyncMock(return_value=MagicMock(text=text))):
+                    with self.assertRaisesRegex(Exception, llm.EMPTY_REPORT):
+                        await llm.generate_report(AnalysisContext("BBCA", df))
+
+            with patch.object(llm.llm_gateway, "_client", StreamingGemini([None, " ", "\n"])):
+                with self.assertRaisesRegex(Exception, llm.EMPTY_REPORT):
+                    async for _ in llm.stream_report(AnalysisContext("BBCA", df)):
+                        pass
+            self.assertIsNone(await llm.ReportRequest(AnalysisContext("BBCA", df)).cached())
+
+
+class StreamingGemini:
+    """genai.Client.aio stand-in for generate_content_stream"""
+
+    def __init__(self, chunks, failures=()):
+        self.models = self
+        self.chunks = chunks
+        self.failures = list(failures)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        if self.failures:
+            raise self.failures.pop(0)
+
+        async def chunks():
+            for text in self.chunks:
+                yield MagicMock(text=text)
+        return chunks()
+
+
+class TestReportSimilarity(unittest.IsolatedAsyncioTestCase):
+    OLD = IndicatorsData(
+        current_price=9250, price_change_percent=0.45, ema20=9100.5, ema50=8900, rsi=55.34, macd=12.3,
+        support=9000, resistance=9500, resistance_levels=[PriceLevel(price=9500, touches=3)]
+    )
+
+    def test_patch_report_numbers(self):
+        new = self.OLD.model_copy(update={
+            'current_price': 9275, 'price_change_percent': -0.27, 'ema20': 9101.2, 'rsi': 56.1, 'macd': 12.9
+        })
+        report = ("- Harga Rp9.250 (+0,45%), di atas EMA20 9.100,5 dan EMA50 8.900. RSI 55,3 (band 30-70).\n"
+                  "- Support 9.000, resistance 9.500: breakout ke 9.500 membuka jalan. MACD 12.3, harga 9,250.00.")
+        self.assertEqual(patch_report(report, self.OLD, new), (
+            "- Harga Rp9.275 (-0,27%), di atas EMA20 9.101,2 dan EMA50 8.900. RSI 56,1 (band 30-70).\n"
+            "- Support 9.000, resistance 9.500: breakout ke 9.500 membuka jalan. MACD 12.9, harga 9,275.00."))
+        self.assertEqual(patch_report(report, self.OLD, self.OLD), report)
+
+    def test_reuse_only_when_indicators_barely_changed(self):
+        cache = SimilarityCache(price_tolerance=0.005, rsi_band=10, ttl=60, max_entries=10)
+
+        def key(indicators):
+            return cache.key("BBCA", ("2024-06-28", "v1"), indicators, {})
+
+        cache.put(key(self.OLD), "Harga 9.250, RSI 55,3.", self.OLD)
+        close = self.OLD.model_copy(update={'current_price': 9280, 'rsi': 57.0})
+        self.assertEqual(key(close), key(self.OLD))
+        self.assertEqual(cache.get(key(close), close), "Harga 9.280, RSI 57,0.")
+
+        far = self.OLD.model_copy(update={'current_price': 9320})  # +0.76%
+        self.assertIsNone(cache.get(key(far), far))
+        for update in ({'rsi': 61.0}, {'ema20': 8800.0}, {'macd': -1.0}, {'resistance': 9600.0}):
+            self.assertNotEqual(key(self.OLD.model_copy(update=update)), key(self.OLD))
+        weekly = {"1wk": self.OLD}
+        self.assertNotEqual(cache.key("BBCA", ("2024-06-28", "v1"), self.OLD, weekly), key(self.OLD))
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["price_misses"], stats["hit_rate"]), (1, 1, 1, 0.5))
+
+        expired = SimilarityCache(price_tolerance=0.005, rsi_band=10, ttl=-1, max_entries=10)
+        expired.put(key(self.OLD), "laporan", self.OLD)
+        self.assertIsNone(expired.get(key(self.OLD), self.OLD))
+
+    async def test_generate_report_reuses_similar_report(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        moved = df.copy()
+        moved.loc[moved.index[-1], 'close'] *= 1.001
+        response = MagicMock(text="laporan")
+        with patch.object(llm, "report_cache", ReportCache(ttl=3600, max_entries=10)), \
+                patch.object(llm, "similar_reports", SimilarityCache(0.005, 10, 60, 10)), \
+                patch.object(llm.llm_gateway, "generate", new=AsyncMock(return_value=response)) as generate:
+            await llm.generate_report(AnalysisContext("BBCA", df))
+            self.assertEqual(await llm.generate_report(AnalysisContext("BBCA", moved)), "laporan")
+            self.assertEqual(generate.await_count, 1)
+            self.assertEqual(llm.similar_reports.stats()["hits"], 1)
+
+
+class TestLLMUsage(unittest.IsolatedAsyncioTestCase):
+    def test_compact_prompt(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        context = AnalysisContext("BBCA", df)
+        data = format_data_for_llm(context)
+        self.assertNotIn("\n", data)
+        self.assertNotIn(": ", data)
+        self.assertNotIn("null", data)
+        self.assertEqual(json.loads(data)['indicators']['EMA20'], round(context.indicators.ema20, 2))
+
+        request = llm.ReportRequest(context)
+        self.assertEqual(request.config.system_instruction, llm.SYSTEM_INSTRUCTION)
+        self.assertNotIn(llm.SYSTEM_INSTRUCTION, request.prompt)
+        self.assertIn(data, request.prompt)
+
+    async def test_usage_per_ticker_and_day(self):
+        log = UsageLog(session_factory=sqlite_sessions())
+        usage = SimpleNamespace(prompt_token_count=300, candidates_token_count=100, thoughts_token_count=20)
+        calls = [("bbca", usage, 1.0, None), ("BBCA", usage, 3.0, 0.4),
+                 ("BBRI", SimpleNamespace(prompt_token_count=250, candidates_token_count=None), 2.0, None)]
+        for ticker, call_usage, latency, first_chunk in calls:
+            log.record(ticker, "gemini", call_usage, latency=latency, first_chunk=first_chunk)
+            # One write at a time: the test database is a single shared SQLite connection
+            await asyncio.gather(*log._tasks)
+
+        summary = await log.summary()
+        self.assertEqual(summary["source"], "database")
+        self.assertEqual([row["ticker"] for row in summary["days"]], ["BBCA", "BBRI"])
+        bbca = summary["days"][0]
+        self.assertEqual((bbca["calls"], bbca["prompt_tokens"], bbca["output_tokens"], bbca["total_tokens"]), (2, 600, 240, 840))
+        self.assertEqual((bbca["avg_latency_ms"], bbca["max_latency_ms"]), (2000.0, 3000))
+        self.assertEqual([row["ticker"] for row in (await log.summary(ticker="bbri"))["days"]], ["BBRI"])
+        self.assertEqual(log.stats()["prompt_tokens"], 850)
+
+        # Without a database the same figures come from this process's totals
+        memory = UsageLog()
+        memory.record("BBCA", "gemini", usage, latency=1.0)
+        memory.record("BBCA", "gemini", usage, latency=3.0)
+        summary = await memory.summary(ticker="BBCA")
+        self.assertEqual(summary["source"], "memory")
+        self.assertEqual(summary["days"][0]["total_tokens"], 840)
+
+    async def test_generate_report_records_usage(self):
+        df = LocalProvider.synthetic_history("BBCA.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True)
+        response = MagicMock(text="laporan", usage_metadata=SimpleNamespace(prompt_token_count=310, candidates_token_count=90))
+        with patch.object(llm, "report_cache", ReportCache(ttl=3600, max_entries=10)), \
+                patch.object(llm.settings, "REPORT_SIMILARITY", False), \
+                patch.object(llm, "llm_usage", UsageLog()), \
+                patch.object(llm.llm_gateway, "generate", new=AsyncMock(return_value=response)):
+            await llm.generate_report(AnalysisContext("BBCA", df))
+            await llm.generate_report(AnalysisContext("BBCA", df))  # cached, no call
+            stats = llm.llm_usage.stats()
+        self.assertEqual((stats["calls"], stats["prompt_tokens"], stats["output_tokens"]), (1, 310, 90))
+
+
+class TestDigest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.contexts = [
+            AnalysisContext(ticker, LocalProvider.synthetic_history(f"{ticker}.JK", date(2024, 6, 28)).tail(180).reset_index(drop=True))
+            for ticker in ["BBCA", "BBRI", "TLKM"]
+        ]
+
+    async def test_one_call_for_the_watchlist(self):
+        entries = [
+            {"ticker": "bbca", "trend": "bullish", "signal": "Buy on Weakness", "summary": "Pullback ke 9.400."},
+            {"ticker": "BBRI.JK", "trend": "sideways", "signal": "Wait", "summary": "Tunggu breakout."},
+            {"ticker": "ASII", "trend": "bearish", "signal": "Sell", "summary": "Bukan bagian watchlist."},
+        ]
+        response = MagicMock(text=json.dumps(entries), usage_metadata=SimpleNamespace(prompt_token_count=900, candidates_token_count=150))
+        with patch.object(llm, "report_cache", ReportCache(ttl=3600, max_entries=10)), \
+                patch.object(llm, "llm_usage", UsageLog()), \
+                patch.object(llm.llm_gateway, "generate", new=AsyncMock(return_value=response)) as generate:
+            digest = await llm.generate_digest(self.contexts)
+            self.assertEqual(list(digest), ["BBCA", "BBRI"])  # TLKM left out by the model
+            self.assertEqual((digest["BBCA"].ticker, digest["BBRI"].signal), ("BBCA", "Wait"))
+
+            call = generate.await_args.kwargs
+            self.assertEqual(call["config"].system_instruction, llm.SYSTEM_INSTRUCTION)
+            self.assertEqual(call["config"].response_mime_type, "application/json")
+            data = json.loads(llm.format_digest_data(self.contexts))
+            self.assertEqual([item["ticker"] for item in data], ["BBCA", "BBRI", "TLKM"])
+            self.assertNotIn("levels", data[0])
+            self.assertNotIn(llm.SYSTEM_INSTRUCTION, call["contents"])
+            self.assertEqual(call["contents"].count("STRICT CONSTRAINTS"), 1)
+            self.assertEqual(llm.llm_usage.stats()["prompt_tokens"], 900)
+
+            # Same watchlist and bars: served from the report cache
+            self.assertEqual(list(await llm.generate_digest(self.contexts)), ["BBCA", "BBRI"])
+            self.assertEqual(generate.await_count, 1)
+
+            response.text = '[{"ticker": "BBCA"}]'
+            with self.assertRaises(Exception):
+                await llm.generate_digest(self.contexts[:1])
+
 if __name__ == '__main__':
     unittest.main()